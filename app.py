@@ -1,10 +1,32 @@
-from flask import Flask, g, request, jsonify, render_template, redirect, url_for, flash, session
+from flask import Flask, g, request, jsonify, render_template, redirect, url_for, flash, session, Response, stream_with_context
+from flask import before_render_template, template_rendered
+import click
 import mysql.connector
 from mysql.connector import Error
 import config
+import auth
+import bulk_purchase
+import commission_ledger
+import fare_calendar
+import flight_import
+import flight_search
+import itinerary_search
+import metrics
+import pagination
+import query_profiler
+import report_jobs
+import sales_export
+import sales_rollup
+import seat_inventory
+import spending_ledger
+from customer_picker import picker as customer_picker
+from db_pool import ReplicaRouter
+from flight_catalog import catalog
+from leaderboard import leaderboards
+from status_cache import flight_status_cache
 from datetime import datetime, timedelta
-import hashlib
 import logging
+import time
 import uuid
 
 # Set up logging
@@ -14,18 +36,127 @@ app = Flask(__name__)
 app.secret_key = 'Pan America'
 app.config.from_object(config)
 
-# Function to connect to the database
+# Shared connection pool; connections are opened lazily on first borrow
+db_router = ReplicaRouter.from_config(app.config)
+db_pool = db_router.primary
+
+# Routes that write, or must read what they just wrote, always use the primary; the
+# rest read from a replica when MYSQL_REPLICAS is set
+PRIMARY_ENDPOINTS = {
+    'register_customer', 'register_agent', 'register_staff', 'login',
+    'purchase_ticket', 'purchase_ticket_agent', 'purchase_tickets_agent_api',
+    'create_flight', 'import_flights', 'change_flight_status', 'add_airplane', 'add_airport',
+    'grant_permission', 'add_booking_agent', 'refresh_reports',
+}
+
+# In-memory flight catalog serving the search routes
+catalog.configure(
+    db_pool,
+    ttl=app.config.get('FLIGHT_CATALOG_TTL', 300),
+    enabled=app.config.get('FLIGHT_CATALOG_ENABLED', True),
+)
+
+# Per-statement timings for /admin/query_stats and the slow-query log
+query_profiler.profiler.configure(app.config)
+
+# Password hashing cost and staff role caching
+auth.configure(app.config)
+
+# Booking agent commission rate, recorded on each sale
+commission_ledger.configure(app.config)
+
+# Sliding-window top-K rankings for the agent and staff report pages
+leaderboards.configure(
+    ttl=app.config.get('LEADERBOARD_TTL', 60),
+    max_owners=app.config.get('LEADERBOARD_MAX_OWNERS', 1000),
+)
+
+# Per-agent customer lists for the purchase form's customer lookup
+customer_picker.configure(
+    ttl=app.config.get('CUSTOMER_PICKER_TTL', 60),
+    max_agents=app.config.get('CUSTOMER_PICKER_MAX_AGENTS', 1000),
+)
+
+# Background refreshes of precomputed report snapshots
+report_jobs.runner.configure(app.config)
+report_jobs.runner.register('staff_reports', sales_rollup.staff_report, sales_rollup.airlines)
+
+# Short-lived cache for /flight_status polling
+flight_status_cache.configure(
+    ttl=app.config.get('FLIGHT_STATUS_CACHE_TTL', 10),
+    enabled=app.config.get('FLIGHT_STATUS_CACHE_ENABLED', True),
+)
+
+def reads_from_replica():
+    # A session that just wrote keeps reading from the primary until replicas have caught up
+    return (bool(request) and request.endpoint not in PRIMARY_ENDPOINTS
+            and session.get('db_primary_until', 0) < time.time())
+
+# Re-read a flight this process just wrote into its catalog. The write is already
+# committed, so a failure here is logged, not reported as a failed write; the
+# catalog's TTL reload picks the flight up instead.
+def refresh_catalog(db, airline_name, flight_num):
+    try:
+        catalog.refresh(db, airline_name, flight_num)
+    except Error as e:
+        logging.error(f"Flight catalog refresh of {airline_name} {flight_num} failed: {e}")
+
+# Function to borrow a database connection for the current request
 def get_db():
     if 'db' not in g:
-        g.db = mysql.connector.connect(
-            host=app.config['MYSQL_HOST'],
-            user=app.config['MYSQL_USER'],
-            password=app.config['MYSQL_PASSWORD'],
-            database=app.config['MYSQL_DB'],
-            port=app.config['MYSQL_PORT']
-        )
+        started = time.perf_counter()
+        g.db_pool, conn = db_router.acquire(read_only=reads_from_replica())
+        metrics.db_connect.observe(time.perf_counter() - started)
+        # Wrapped so every statement is timed and attributed to the current route
+        g.db = query_profiler.profiler.wrap(conn, (request.endpoint or request.path) if request else 'cli')
     return g.db
 
+# Request metrics for /metrics; unmatched URLs share one label so 404 scans cannot add series
+@app.before_request
+def start_request_metrics():
+    g.metrics_endpoint = request.endpoint or 'unmatched'
+    g.request_started = time.perf_counter()
+    metrics.requests_in_flight.inc(g.metrics_endpoint)
+
+@app.after_request
+def record_request_metrics(response):
+    if 'request_started' in g:
+        metrics.request_duration.observe(
+            time.perf_counter() - g.request_started, g.metrics_endpoint, request.method, str(response.status_code)
+        )
+    return response
+
+# Read-your-writes: after a write route has used the database (purchase_ticket buys on a
+# GET), send this session's reads to the primary for DB_READ_YOUR_WRITES_SECONDS so it
+# never sees a replica from before its own change
+@app.after_request
+def stick_to_primary_after_write(response):
+    if (db_router.replicas and request.endpoint in PRIMARY_ENDPOINTS and 'db' in g
+            and response.status_code < 400):
+        session['db_primary_until'] = time.time() + app.config.get('DB_READ_YOUR_WRITES_SECONDS', 10)
+    return response
+
+@app.teardown_request
+def finish_request_metrics(exception):
+    if 'metrics_endpoint' in g:
+        metrics.requests_in_flight.dec(g.metrics_endpoint)
+
+# Time every render_template call
+@before_render_template.connect_via(app)
+def start_template_timer(sender, template, context, **extra):
+    g.setdefault('template_started', []).append(time.perf_counter())
+
+@template_rendered.connect_via(app)
+def record_template_time(sender, template, context, **extra):
+    started = g.get('template_started')
+    if started:
+        metrics.template_render.observe(time.perf_counter() - started.pop(), template.name or 'string')
+
+metrics.registry.gauge_callback(
+    'db_pool_connections', "Pooled connections by state", 'state',
+    lambda: {state: sum(pool.stats()[state] for pool in db_router.pools()) for state in ('open', 'idle', 'in_use')}
+)
+
 # Route for home page
 @app.route('/')
 def home():
@@ -41,50 +172,137 @@ def search_flights():
     if not source_city and not destination_city and not date:
         return jsonify({"error": "At least one parameter (source_city, destination_city, or date) is required"}), 400
 
+    after = request.args.get('after')
     try:
-        conn = get_db()
-        cursor = conn.cursor(dictionary=True)
+        after = pagination.decode_cursor(after) if after else None
+    except ValueError as err:
+        return jsonify({"error": str(err)}), 400
 
-        # Build the query dynamically based on available parameters
-        query = """
-            SELECT f.airline_name, f.flight_num, f.departure_airport, f.departure_time, 
-                   f.arrival_airport, f.arrival_time, f.status, f.price
-            FROM flight f
-            JOIN airport dep_airport ON f.departure_airport = dep_airport.airport_name
-            JOIN airport arr_airport ON f.arrival_airport = arr_airport.airport_name
-            WHERE 1=1
-        """
-        params = []
+    try:
+        # Cities are resolved to airport sets up front so the query can use the flight indexes
+        db = get_db()
 
-        # Add conditions based on the provided parameters
-        if source_city:
-            query += " AND dep_airport.airport_city = %s"
-            params.append(source_city)
+        # ?format=jsonl streams every match as JSON lines instead of returning one page
+        if request.args.get('format') == 'jsonl':
+            return Response(
+                stream_with_context(flight_search.stream_flights(db, source_city, destination_city, date)),
+                mimetype='application/x-ndjson'
+            )
+
+        # One keyset page; the cursor for the next page is returned in the X-Next-Cursor header
+        flights, next_cursor = flight_search.search_page(
+            db, source_city, destination_city, date, after=after,
+            limit=pagination.page_size(request.args.get('limit'))
+        )
 
-        if destination_city:
-            query += " AND arr_airport.airport_city = %s"
-            params.append(destination_city)
+        if not flights:
+            return jsonify({"message": "No flights found."}), 200
 
-        if date:
-            query += " AND DATE(f.departure_time) = %s"
-            params.append(date)
+        response = jsonify(flights)
+        if next_cursor:
+            response.headers['X-Next-Cursor'] = next_cursor
+            next_url = url_for('search_flights', **dict(request.args.items(), after=next_cursor))
+            response.headers['Link'] = f'<{next_url}>; rel="next"'
+        return response, 200
 
+    except ValueError:
+        return jsonify({"error": "Invalid date, expected YYYY-MM-DD"}), 400
+    except mysql.connector.Error as err:
+        return jsonify({"error": str(err)}), 500
 
-        query += " ORDER BY f.departure_time;"
+# Direct flights and connections with up to two stops between two cities (or airports),
+# for a first departure on the given day, from the in-memory flight catalog
+@app.route('/search_connections', methods=['GET'])
+def search_connections():
+    source = request.args.get('source_city')
+    destination = request.args.get('destination_city')
+    if not source or not destination or not request.args.get('date'):
+        return jsonify({"error": "source_city, destination_city and date are required"}), 400
+    if not catalog.enabled:
+        return jsonify({"error": "Connection search needs the flight catalog (FLIGHT_CATALOG_ENABLED)"}), 503
 
-        # Execute the query with the dynamic parameters
-        cursor.execute(query, tuple(params))
+    try:
+        day = datetime.strptime(request.args['date'], "%Y-%m-%d").date()
+        max_stops = int(request.args.get('max_stops', itinerary_search.MAX_STOPS))
+        min_layover = timedelta(minutes=int(request.args.get(
+            'min_layover', itinerary_search.DEFAULT_MIN_LAYOVER.total_seconds() // 60)))
+        max_layover = timedelta(minutes=int(request.args.get(
+            'max_layover', itinerary_search.DEFAULT_MAX_LAYOVER.total_seconds() // 60)))
+    except ValueError:
+        return jsonify({"error": "date must be YYYY-MM-DD; max_stops, min_layover and max_layover "
+                                 "(minutes) must be whole numbers"}), 400
+    sort = request.args.get('sort', 'duration')
+    if not 0 <= max_stops <= itinerary_search.MAX_STOPS:
+        return jsonify({"error": f"max_stops must be between 0 and {itinerary_search.MAX_STOPS}"}), 400
+    if not timedelta(0) <= min_layover <= max_layover <= itinerary_search.MAX_LAYOVER:
+        return jsonify({"error": "Layovers must satisfy 0 <= min_layover <= max_layover <= 1440 minutes"}), 400
+    if sort not in itinerary_search.SORT_ORDERS:
+        return jsonify({"error": f"sort must be one of {', '.join(itinerary_search.SORT_ORDERS)}"}), 400
 
-        flights = cursor.fetchall()
-        conn.close()
+    try:
+        db = get_db()
+        origins = flight_search.airports.resolve(db, source)
+        destinations = flight_search.airports.resolve(db, destination)
+    except mysql.connector.Error as err:
+        return jsonify({"error": str(err)}), 500
+    if not origins or not destinations:
+        return jsonify({"message": "No flights found."}), 200
 
-        if not flights:
-            return jsonify({"message": "No flights found."}), 200
+    try:
+        # A cold catalog loads from MySQL on first use
+        itineraries = itinerary_search.find_itineraries(
+            origins, destinations, day, max_stops, min_layover, max_layover, sort,
+            limit=pagination.page_size(request.args.get('limit'), default=20)
+        )
+    except mysql.connector.Error as err:
+        return jsonify({"error": str(err)}), 500
+    if not itineraries:
+        return jsonify({"message": "No flights found."}), 200
+    return jsonify([itinerary.as_dict() for itinerary in itineraries]), 200
 
-        return jsonify(flights), 200
+# Cheapest fare and number of flights per day between two cities, for picking a date
+@app.route('/fare_calendar', methods=['GET'])
+def fare_calendar_view():
+    source_city = request.args.get('source_city')
+    destination_city = request.args.get('destination_city')
+    if not source_city or not destination_city:
+        return jsonify({"error": "source_city and destination_city are required"}), 400
 
+    try:
+        start_date = request.args.get('start_date')
+        start_date = datetime.strptime(start_date, "%Y-%m-%d").date() if start_date else datetime.now().date()
+        days = int(request.args.get('days', fare_calendar.DEFAULT_DAYS))
+    except ValueError:
+        return jsonify({"error": "start_date must be YYYY-MM-DD and days a whole number"}), 400
+    if not 1 <= days <= fare_calendar.MAX_DAYS:
+        return jsonify({"error": f"days must be between 1 and {fare_calendar.MAX_DAYS}"}), 400
+
+    try:
+        calendar = fare_calendar.fares(get_db(), source_city, destination_city, start_date, days)
     except mysql.connector.Error as err:
         return jsonify({"error": str(err)}), 500
+    return jsonify({"source_city": source_city, "destination_city": destination_city, "days": calendar}), 200
+
+# Airport and city suggestions for the search forms, as the user types
+@app.route('/autocomplete', methods=['GET'])
+def autocomplete():
+    term = request.args.get('q', '').strip()
+    kinds = ('city', 'airport') if request.args.get('type') not in ('city', 'airport') else (request.args['type'],)
+    if not term:
+        return jsonify([]), 200
+
+    try:
+        # Answered from memory; a connection is only borrowed to (re)load the airports
+        db = None if flight_search.airports.fresh() else get_db()
+        suggestions = flight_search.airports.suggest(
+            db, term, limit=min(pagination.page_size(request.args.get('limit'), default=10), 50), kinds=kinds
+        )
+    except mysql.connector.Error as err:
+        return jsonify({"error": str(err)}), 500
+    response = jsonify(suggestions)
+    # The same prefix is asked for by every user typing it; browsers may reuse the answer
+    response.headers['Cache-Control'] = 'public, max-age=300'
+    return response, 200
 
 # Route to view flight status
 @app.route('/flight_status', methods=['GET'])
@@ -94,26 +312,28 @@ def flight_status():
 
     if not flight_num or not date:
         return jsonify({"error": "Missing parameters"}), 400
+    try:
+        int(flight_num)
+    except ValueError:
+        return jsonify({"error": "Invalid flight_num, expected a whole number"}), 400
 
     try:
-        conn = get_db()
-        cursor = conn.cursor(dictionary=True)
-        cursor.execute("""
-            SELECT f.airline_name, f.flight_num, f.departure_airport, f.departure_time, 
-                   f.arrival_airport, f.arrival_time, f.status, f.price
-            FROM flight f
-            WHERE f.flight_num = %s 
-              AND (DATE(f.departure_time) = %s OR DATE(f.arrival_time) = %s);
-        """, (flight_num, date, date))
-
-        flight_status = cursor.fetchone()
-        conn.close()
+        # Polls are answered from the status cache; a matching If-None-Match gets a 304
+        flight_status, etag = flight_status_cache.get(
+            flight_num, date, lambda: flight_search.find_flight_status(get_db(), flight_num, date)
+        )
 
         if not flight_status:
-            return jsonify({"message": "Flight not found."}), 200
-
-        return jsonify(flight_status), 200
-
+            response = jsonify({"message": "Flight not found."})
+        else:
+            response = jsonify(flight_status)
+        response.set_etag(etag)
+        response.cache_control.public = True
+        response.cache_control.max_age = flight_status_cache.ttl
+        return response.make_conditional(request)
+
+    except ValueError:
+        return jsonify({"error": "Invalid date, expected YYYY-MM-DD"}), 400
     except mysql.connector.Error as err:
         return jsonify({"error": str(err)}), 500
 
@@ -121,9 +341,6 @@ def flight_status():
 def register():
     return render_template('register.html')
 
-def hash_password(password):
-    return hashlib.md5(password.encode()).hexdigest()
-
 @app.route('/register_customer', methods=['POST'])
 def register_customer():
     # Collect customer details from the form
@@ -144,7 +361,7 @@ def register_customer():
     logging.debug(f"Received data: {name}, {email}, {building_number}, {street}, {city}, {state}, {phone}, {passport_number}, {passport_expiration}, {passport_country}, {date_of_birth}")
     
     # Hash the password
-    hashed_password = hash_password(password)
+    hashed_password = auth.hash_password(password)
 
     # Debug: Print the hashed password (make sure to not log sensitive info like password in production)
     logging.debug(f"Hashed password: {hashed_password}")
@@ -194,7 +411,7 @@ def register_agent():
     booking_agent_id = request.form.get('agent_id')
 
     # Hash the password
-    hashed_password = hash_password(password)
+    hashed_password = auth.hash_password(password)
 
     # Save the booking agent details to the database
     try:
@@ -230,7 +447,7 @@ def register_staff():
     airline_name = request.form.get('staff_airline')
 
     # Hash the password
-    hashed_password = hash_password(password)
+    hashed_password = auth.hash_password(password)
 
     try:
         db = get_db()
@@ -268,169 +485,116 @@ def register_staff():
         cursor.close()
 
 
-def check_login(username, password, user_type):
-    # Hash the password with MD5
-    password_hash = hash_password(password)
-    logging.debug(f"while login Hashed password: {password_hash}")
-    # Connect to database
-    db = get_db()
-    cursor = db.cursor(dictionary=True)
-    
-    # Query to check if the user exists with the given username, password, and user type
-    if user_type == "airline_staff":
-        query = """
-            SELECT * FROM airline_staff
-            WHERE username = %s AND password = %s
-        """
-    else:
-        query = """
-            SELECT * FROM {} 
-            WHERE email = %s AND password = %s
-        """.format(user_type)
-    
-    cursor.execute(query, (username, password_hash))
-    
-    user = cursor.fetchone()
-    cursor.close()
-    
-    return user  # Returns user if exists, else None
+@app.route('/login', methods=['GET', 'POST'])
+def login():
+    if request.method == 'POST':
+        username = request.form['username']
+        password = request.form['password']
+        user_type = request.form['user_type']
 
-def check_user_exists(username, user_type):
-    db = get_db()  # Get the DB connection
-    cursor = db.cursor(dictionary=True)
-    
-    try:
+        # Authenticate user: one query returns the password hash and, for staff, roles and airline
+        try:
+            user = auth.authenticate(get_db(), username, password, user_type)
+        except auth.LoginFailed as e:
+            flash(str(e), "danger")
+            return render_template('login.html')
+        except Error as e:
+            logging.error(f"An error occurred during login: {e}")
+            flash(f"An error occurred: {e}", "danger")
+            return render_template('login.html')
+
+        # Successful login: start session
+        session['username'] = username
+        session['user_type'] = user_type
+
+        flash("Login successful!", "success")
+
+        # Redirect to user home page based on user type
         if user_type == 'customer':
-            cursor.execute("SELECT * FROM customer WHERE email = %s", (username,))
+            return redirect(url_for('customer_home'))
         elif user_type == 'booking_agent':
-            cursor.execute("SELECT * FROM booking_agent WHERE email = %s", (username,))
+            return redirect(url_for('agent_home'))
         elif user_type == 'airline_staff':
-            cursor.execute("SELECT * FROM airline_staff WHERE username = %s", (username,))
-        else:
-            return False  # Invalid user_type
-
-        user = cursor.fetchone()  # Fetch one result
-        return user is not None
-    finally:
-        cursor.close()  # Close the cursor after the query
+            # Store roles in session as a list
+            session['roles'] = user['roles']
+            session['airline'] = user['airline']
+            return redirect(url_for('staff_home'))
 
+    # If GET request or failed login, show login page
+    return render_template('login.html')
 
-def check_password(username, password, user_type):
-    # Get the database connection from g
+# Start this process's report job workers on its first request, not at import, so
+# CLI commands do not start them
+@app.before_request
+def start_report_jobs():
+    report_jobs.runner.ensure_started()
+
+# Keep staff roles current, so permissions granted by an Admin apply without a new login
+@app.before_request
+def refresh_staff_roles():
+    if session.get('user_type') != 'airline_staff' or 'username' not in session:
+        return
+    username = session['username']
+    try:
+        staff = auth.role_cache.get(username, lambda: auth.load_staff(get_db(), username))
+    except Error as e:
+        # Keep the roles from login rather than failing every request
+        logging.error(f"Could not refresh roles for {username}: {e}")
+        return
+    if staff is not None and session.get('roles') != staff[0]:
+        session['roles'] = staff[0]
+
+# Serve one keyset page of a listing: HTML by default, ?format=json for a JSON page
+# with its next_cursor, or ?format=jsonl to stream every row as JSON lines
+def paged_listing(query, params, order_columns, render, **url_args):
     db = get_db()
+    output = request.args.get('format')
+
+    if output == 'jsonl':
+        return Response(stream_with_context(pagination.stream_jsonl(db, query, params, order_columns)),
+                        mimetype='application/x-ndjson')
 
-    # Use the connection to create a cursor and perform the query
-    cursor = db.cursor(dictionary=True)
-    
     try:
-        if user_type == 'customer':
-            query = "SELECT password FROM customer WHERE email = %s"
-            cursor.execute(query, (username,))
-        elif user_type == 'booking_agent':
-            query = "SELECT password FROM booking_agent WHERE email = %s"
-            cursor.execute(query, (username,))
-        elif user_type == 'airline_staff':
-            query = "SELECT password FROM airline_staff WHERE username = %s"
-            cursor.execute(query, (username,))
-        else:
-            return False  # Invalid user_type
+        rows, next_cursor = pagination.fetch_page(
+            db, query, params, order_columns,
+            after=request.args.get('after'), limit=pagination.page_size(request.args.get('limit'))
+        )
+    except ValueError as e:
+        if output == 'json':
+            return jsonify({"error": str(e)}), 400
+        flash(str(e))
+        return redirect(url_for(request.endpoint, **request.view_args, **url_args))
 
-        # Fetch one result
-        user = cursor.fetchone()
+    if output == 'json':
+        return jsonify({"items": rows, "next_cursor": next_cursor}), 200
 
-        if user:
-            # In a real application, you should use a secure method like bcrypt to check hashed passwords
-            return user['password'] == password
-        return False
-    finally:
-        cursor.close()  # Always close the cursor after use
+    next_url = None
+    if next_cursor:
+        next_url = url_for(request.endpoint, **request.view_args, **url_args,
+                           after=next_cursor, limit=request.args.get('limit'))
+    return render(rows, next_url)
 
 
-@app.route('/login', methods=['GET', 'POST'])
-def login():
-    if request.method == 'POST':
-        username = request.form['username']
-        password = request.form['password']
-        user_type = request.form['user_type']
-        
-        # Authenticate user
-        user = check_login(username, password, user_type)
-        
-        if user:
-            # Successful login: start session
-            session['username'] = username
-            session['user_type'] = user_type
-            
-            flash("Login successful!", "success")
-            
-            # Redirect to user home page based on user type
-            if user_type == 'customer':
-                return redirect(url_for('customer_home'))
-            elif user_type == 'booking_agent':
-                return redirect(url_for('agent_home'))
-
-            elif user_type == 'airline_staff':
-                db = get_db()
-                cursor = db.cursor()
-                
-                permission_query = """
-                        SELECT permission
-                        FROM permission
-                        WHERE username = %s
-                    """
-                cursor.execute(permission_query, (username,))
-                permissions = cursor.fetchall()
-                
-                airline_query = """
-                        SELECT airline_name 
-                        FROM airline_staff
-                        WHERE username = %s
-                    """
-                cursor.execute(airline_query, (username,))
-                airlines = cursor.fetchall()
-                airline = airlines[0]
-
-                # Store roles in session as a list
-                session['roles'] = [perm[0] for perm in permissions]
-                session['airline'] = airline[0]
-                return redirect(url_for('staff_home'))
-        else:
-            # Unsuccessful login - provide detailed error message
-            # Check if the username exists
-            if not check_user_exists(username, user_type):
-                flash("User does not exist. Please check your username and user type.", "danger")
-            # Check if the password is incorrect
-            elif not check_password(username, password, user_type):
-                flash("Incorrect password. Please try again.", "danger")
-            # If no specific reason, general login failure message
-            else:
-                flash("Invalid username, password, or user type", "danger")
-    
-    # If GET request or failed login, show login page
-    return render_template('login.html')
-
 @app.route('/customer_home')
 def customer_home():
     if 'username' in session and session.get('user_type') == 'customer':
-        # Example: Fetch upcoming flights for the customer
-        db = get_db()
-        cursor = db.cursor(dictionary=True)
+        # Fetch upcoming flights for the customer, one page at a time
         customer_email = session.get('username')
         query = """
-                SELECT f.airline_name, f.flight_num, f.departure_airport, f.departure_time, f.arrival_airport, f.arrival_time
+                SELECT f.airline_name, f.flight_num, f.departure_airport, f.departure_time, f.arrival_airport, f.arrival_time,
+                       p.ticket_id
                 FROM purchases p
                 JOIN ticket t ON p.ticket_id = t.ticket_id
                 JOIN flight f ON t.airline_name = f.airline_name AND t.flight_num = f.flight_num
                 WHERE p.customer_email = %s
-                ORDER BY f.departure_time
             """
-        cursor.execute(query, (customer_email,))
-        flights = cursor.fetchall()
-        
-        cursor.close()
-        
+
         # Render customer home page template with any flashed messages and upcoming flights
-        return render_template('customer_home.html', upcoming_flights=flights)
+        return paged_listing(
+            query, (customer_email,), pagination.FLIGHT_ORDER + ('p.ticket_id',),
+            lambda flights, next_url: render_template('customer_home.html', upcoming_flights=flights,
+                                                      next_url=next_url)
+        )
     else:
         return redirect(url_for('login'))
 
@@ -461,54 +625,47 @@ def view_purchases():
         return redirect(url_for('login'))
 
     user_type = session.get('user_type')
-    db = get_db()
-    cursor = db.cursor(dictionary=True)
+    order = ('flight.departure_time', 'flight.airline_name', 'flight.flight_num', 'purchases.ticket_id')
 
-    purchases = []
-    try:
-        if user_type == 'customer':
-            # Query for customers to view their own purchases
-            query = """
-            SELECT purchases.ticket_id, purchases.purchase_date,
-                   flight.airline_name, flight.flight_num, flight.departure_time, flight.arrival_time,
-                   flight.departure_airport, flight.arrival_airport, flight.price, flight.status
-            FROM purchases
-            JOIN ticket ON purchases.ticket_id = ticket.ticket_id
-            JOIN flight ON ticket.flight_num = flight.flight_num AND ticket.airline_name = flight.airline_name
-            WHERE purchases.customer_email = %s
-            """
-            cursor.execute(query, (session['username'],))
-        elif user_type == 'booking_agent':
-            # Query for booking agents to view purchases for their customers
-            query = """
-            SELECT purchases.ticket_id, purchases.customer_email, purchases.purchase_date,
-                   flight.airline_name, flight.flight_num, flight.departure_time, flight.arrival_time,
-                   flight.departure_airport, flight.arrival_airport, flight.price, flight.status,
-                   customer.name AS customer_name, customer.phone_number
-            FROM purchases
-            JOIN ticket ON purchases.ticket_id = ticket.ticket_id
-            JOIN flight ON ticket.flight_num = flight.flight_num AND ticket.airline_name = flight.airline_name
-            JOIN customer ON purchases.customer_email = customer.email
-            WHERE purchases.booking_agent_id = %s
-            """
-            cursor.execute(query, (session['agent_id'],))  # agent_id is stored in the session
-        else:
-            flash("User type not recognized.")
-            return redirect(url_for('login'))
-
-        purchases = cursor.fetchall()
-    except Exception as e:
-        flash(f"Error retrieving purchases: {e}")
-    finally:
-        cursor.close()
-
-    # Render the appropriate template based on the user type
     if user_type == 'customer':
-        return render_template('view_customer_purchases.html', purchases=purchases)
+        # Query for customers to view their own purchases
+        query = """
+        SELECT purchases.ticket_id, purchases.purchase_date,
+               flight.airline_name, flight.flight_num, flight.departure_time, flight.arrival_time,
+               flight.departure_airport, flight.arrival_airport, flight.price, flight.status
+        FROM purchases
+        JOIN ticket ON purchases.ticket_id = ticket.ticket_id
+        JOIN flight ON ticket.flight_num = flight.flight_num AND ticket.airline_name = flight.airline_name
+        WHERE purchases.customer_email = %s
+        """
+        template = 'view_customer_purchases.html'
     elif user_type == 'booking_agent':
-        return render_template('view_agent_purchases.html', purchases=purchases)
+        # Query for booking agents to view purchases for their customers
+        query = """
+        SELECT purchases.ticket_id, purchases.customer_email, purchases.purchase_date,
+               flight.airline_name, flight.flight_num, flight.departure_time, flight.arrival_time,
+               flight.departure_airport, flight.arrival_airport, flight.price, flight.status,
+               customer.name AS customer_name, customer.phone_number
+        FROM purchases
+        JOIN ticket ON purchases.ticket_id = ticket.ticket_id
+        JOIN flight ON ticket.flight_num = flight.flight_num AND ticket.airline_name = flight.airline_name
+        JOIN customer ON purchases.customer_email = customer.email
+        WHERE purchases.booking_agent_email = %s
+        """
+        template = 'view_agent_purchases.html'
+    else:
+        flash("User type not recognized.")
+        return redirect(url_for('login'))
 
-    return redirect(url_for('login'))
+    try:
+        # Render the appropriate template based on the user type
+        return paged_listing(
+            query, (session['username'],), order,
+            lambda purchases, next_url: render_template(template, purchases=purchases, next_url=next_url)
+        )
+    except Error as e:
+        flash(f"Error retrieving purchases: {e}")
+        return render_template(template, purchases=[])
 
 @app.route('/view_commission', methods=['GET', 'POST'])
 def view_commission():
@@ -536,25 +693,8 @@ def view_commission():
         end_date = datetime.strptime(end_date, "%Y-%m-%d").date()
 
     try:
-        db = get_db()
-        cursor = db.cursor()
-        
-        # Query to calculate total commission, average commission per ticket, and total tickets sold
-        commission_query = """
-            SELECT 
-                SUM(f.price * 0.1) AS total_commission,
-                AVG(f.price * 0.1) AS avg_commission_per_ticket,
-                COUNT(p.ticket_id) AS total_tickets_sold
-            FROM purchases p
-            JOIN ticket t ON p.ticket_id = t.ticket_id
-            JOIN flight f ON t.airline_name = f.airline_name AND t.flight_num = f.flight_num
-            WHERE p.booking_agent_email = %s
-            AND p.purchase_date BETWEEN %s AND %s
-        """
-        cursor.execute(commission_query, (booking_agent_email, start_date, end_date))
-        commission_data = cursor.fetchone()
-        logging.debug("commission_data:", commission_data)
-        # Render the commission data
+        # Two lookups on the agent's running commission totals, whatever the range
+        commission_data = commission_ledger.agent_summary(get_db(), booking_agent_email, start_date, end_date)
         return render_template(
             'view_commission.html',
             commission_data=commission_data,
@@ -565,8 +705,6 @@ def view_commission():
     except Error as e:
         logging.error(f"An error occurred while fetching commission data: {e}")
         flash(f"An error occurred: {e}")
-    finally:
-        cursor.close()
 
     return render_template('view_commission.html')
 
@@ -577,134 +715,109 @@ def logout():
     #flash("You have been logged out", "info")
     return redirect(url_for('login'))
 
-# Close the database connection after each request
+# Return the database connection to the pool after each request
 @app.teardown_appcontext
 def close_db(exception):
     db = g.pop('db', None)
+    if isinstance(db, query_profiler.ProfiledConnection):
+        db.finish()
+        metrics.request_sql.observe(db.sql_seconds, db.route)
+        metrics.request_sql_statements.inc(db.route, amount=db.statements)
+        db = db.raw
     if db is not None:
-        db.close()
+        g.pop('db_pool', db_pool).release(db)
+
+# Prometheus text exposition of the request, template, connection and SQL metrics.
+# Set METRICS_TOKEN to require "Authorization: Bearer <token>" from the scraper.
+@app.route('/metrics', methods=['GET'])
+def metrics_endpoint():
+    token = app.config.get('METRICS_TOKEN')
+    if token and request.headers.get('Authorization') != f"Bearer {token}":
+        return jsonify({"error": "Unauthorized access."}), 403
+    return Response(metrics.registry.expose(), mimetype='text/plain; version=0.0.4')
+
+# Connection pool statistics for monitoring
+@app.route('/admin/pool_stats', methods=['GET'])
+def pool_stats():
+    if session.get('user_type') != "airline_staff" or 'Admin' not in session.get('roles', []):
+        return jsonify({"error": "Unauthorized access."}), 403
+    return jsonify(db_router.stats()), 200
+
+# Query profiler statistics per statement fingerprint; ?reset=1 clears them after reading
+@app.route('/admin/query_stats', methods=['GET'])
+def query_stats():
+    if session.get('user_type') != "airline_staff" or 'Admin' not in session.get('roles', []):
+        return jsonify({"error": "Unauthorized access."}), 403
+    report = query_profiler.profiler.report(limit=pagination.page_size(request.args.get('limit')))
+    if request.args.get('reset'):
+        query_profiler.profiler.reset()
+    return jsonify({"slow_query_ms": query_profiler.profiler.slow_ms, "queries": report}), 200
+
+# Report refresh jobs: this process's workers and the latest jobs (all airlines for Admins)
+@app.route('/admin/report_jobs', methods=['GET'])
+def report_job_status():
+    if session.get('user_type') != "airline_staff":
+        return jsonify({"error": "Unauthorized access."}), 403
+    owner = None if 'Admin' in session.get('roles', []) else session.get('airline')
+    try:
+        recent = report_jobs.jobs(get_db(), owner, limit=pagination.page_size(request.args.get('limit')))
+    except Error as e:
+        return jsonify({"error": str(e)}), 500
+    return jsonify({"runner": report_jobs.runner.status(), "jobs": recent}), 200
 
 @app.route('/my_flights', methods=['GET'])
 def view_my_flights():
-    # Fetch logged-in user's email
-    agent_email = None
-    customer_email = None
-    staff_name = None
     user_type = session.get('user_type')
-    
-    
-    if user_type == "customer":
-        logging.debug("view flights customer")
-        customer_email = session.get('username')
-        
-        
-    if user_type == "booking_agent":
+    username = session.get('username')
+
+    # Default: Show upcoming flights by joining `purchases`, `ticket`, and `flight` tables
+    purchased_flights = """
+        SELECT f.airline_name, f.flight_num, f.departure_airport, f.departure_time, f.arrival_airport, f.arrival_time,
+               p.ticket_id
+        FROM purchases p
+        JOIN ticket t ON p.ticket_id = t.ticket_id
+        JOIN flight f ON t.airline_name = f.airline_name AND t.flight_num = f.flight_num
+    """
+
+    if username and user_type == "booking_agent":
         logging.debug("view flights booking_agent")
-        agent_email = session.get('username')
-        
-    if user_type == "airline_staff":
-        staff_name = session.get('username')
+        query = purchased_flights + " WHERE p.booking_agent_email = %s"
+        order = pagination.FLIGHT_ORDER + ('p.ticket_id',)
+        empty_message = "Hi Agent, you have no upcoming flights."
+    elif username and user_type == "customer":
+        logging.debug("view flights customer")
+        query = purchased_flights + " WHERE p.customer_email = %s"
+        order = pagination.FLIGHT_ORDER + ('p.ticket_id',)
+        empty_message = "Dear Customer, you have no upcoming flights."
+    elif username and user_type == "airline_staff":
         logging.debug("view flights airline_staff")
-    
-    #session.get('username')
-    if agent_email:
-        try:
-            db = get_db()
-            cursor = db.cursor()
-
-            # Default: Show upcoming flights by joining `purchases`, `ticket`, and `flight` tables
-            query = """
-                SELECT f.airline_name, f.flight_num, f.departure_airport, f.departure_time, f.arrival_airport, f.arrival_time
-                FROM purchases p
-                JOIN ticket t ON p.ticket_id = t.ticket_id
-                JOIN flight f ON t.airline_name = f.airline_name AND t.flight_num = f.flight_num
-                WHERE p.booking_agent_email = %s
-                ORDER BY f.departure_time
-            """
-            cursor.execute(query, (agent_email,))
-            
-            
-            flights = cursor.fetchall()
-
-            # Check if no flights were found
-            logging.debug("Fetched FLights:", flights)
-            if not flights:
-                flash("Hi Agent, you have no upcoming flights.")
-            
-            return render_template('my_flights.html', flights=flights)
-        
-        except Error as e:
-            logging.error(f"An error occurred: {e}")
-            flash(f"An error occurred: {e}")
-            return redirect(url_for('home'))  # Redirect to home page or some other page
-        
-        finally:
-            cursor.close()
-            
-
-    elif customer_email:
-        try:
-            db = get_db()
-            cursor = db.cursor()
-
-            # Default: Show upcoming flights by joining `purchases`, `ticket`, and `flight` tables
-            query = """
-                SELECT f.airline_name, f.flight_num, f.departure_airport, f.departure_time, f.arrival_airport, f.arrival_time
-                FROM purchases p
-                JOIN ticket t ON p.ticket_id = t.ticket_id
-                JOIN flight f ON t.airline_name = f.airline_name AND t.flight_num = f.flight_num
-                WHERE p.customer_email = %s
-                ORDER BY f.departure_time
-            """
-            cursor.execute(query, (customer_email,))
-            flights = cursor.fetchall()
-
-            # Check if no flights were found
-            if not flights:
-                flash("Dear Customer, you have no upcoming flights.")
-            
-            return render_template('my_flights.html', flights=flights)
-        
-        except Error as e:
-            logging.error(f"An error occurred: {e}")
-            flash(f"An error occurred: {e}")
-            return redirect(url_for('home'))  # Redirect to home page or some other page
-        
-        finally:
-            cursor.close()
-    elif staff_name:
-        try:
-            db = get_db()
-            cursor = db.cursor()
-
-            # Default: Show upcoming flights by joining `purchases`, `ticket`, and `flight` tables
-            query = """
-                SELECT f.airline_name, f.flight_num, f.departure_airport, f.departure_time, f.arrival_airport, f.arrival_time
-                FROM airline_staff a
-                JOIN flight f ON a.airline_name = f.airline_name
-                WHERE a.username = %s
-                ORDER BY f.departure_time
-            """
-            cursor.execute(query, (staff_name,))
-            flights = cursor.fetchall()
-
-            # Check if no flights were found
-            if not flights:
-                flash(f"Dear Airline Staff {staff_name}, you have no upcoming flights.")
-            
-            return render_template('my_flights.html', flights=flights)
-        
-        except Error as e:
-            logging.error(f"An error occurred: {e}")
-            flash(f"An error occurred: {e}")
-            return redirect(url_for('home'))  # Redirect to home page or some other page
-        
-        finally:
-            cursor.close()
+        query = """
+            SELECT f.airline_name, f.flight_num, f.departure_airport, f.departure_time, f.arrival_airport, f.arrival_time
+            FROM airline_staff a
+            JOIN flight f ON a.airline_name = f.airline_name
+            WHERE a.username = %s
+        """
+        order = pagination.FLIGHT_ORDER
+        empty_message = f"Dear Airline Staff {username}, you have no upcoming flights."
     else:
         flash("Please log in to view your flights.")
         return redirect(url_for('login'))
 
+    def render(rows, next_url):
+        # Check if no flights were found
+        if not rows and not request.args.get('after'):
+            flash(empty_message)
+        # my_flights.html indexes flights by position
+        flights = [tuple(row.values()) for row in rows]
+        return render_template('my_flights.html', flights=flights, next_url=next_url)
+
+    try:
+        return paged_listing(query, (username,), order, render)
+    except Error as e:
+        logging.error(f"An error occurred: {e}")
+        flash(f"An error occurred: {e}")
+        return redirect(url_for('home'))  # Redirect to home page or some other page
+
 
 @app.route('/search_flights_customer', methods=['GET', 'POST'])
 def search_flights_customer():
@@ -715,24 +828,17 @@ def search_flights_customer():
 
         try:
             db = get_db()
-            cursor = db.cursor()
-
-            query = """
-                SELECT * FROM flight
-                WHERE departure_airport LIKE %s AND arrival_airport LIKE %s
-                AND departure_time >= %s
-            """
-            cursor.execute(query, (f"%{source}%", f"%{destination}%", date))
-            available_flights = cursor.fetchall()
+            available_flights = flight_search.find_flights_by_airport(db, source, destination, date)
+            availability = seat_inventory.availability.remaining(db, [flight[:2] for flight in available_flights])
             
             logging.debug("found available_flights:", available_flights)
-            return render_template('search_flights.html', flights=available_flights)
+            return render_template('search_flights.html', flights=available_flights, availability=availability)
 
+        except ValueError:
+            flash("Please provide a valid departure date.")
         except Error as e:
             logging.error(f"An error occurred: {e}")
             flash(f"An error occurred: {e}")
-        finally:
-            cursor.close()
 
     return render_template('search_flights.html')
 
@@ -743,34 +849,18 @@ def purchase_ticket(airline_name, flight_num):
 
     if customer_email:
         try:
-            db = get_db()
-            cursor = db.cursor()
+            # Ticket, purchase and report rollups are written in one transaction
+            bulk_purchase.purchase_tickets(get_db(), [(customer_email, airline_name, flight_num, 1)])
 
-            # Insert the ticket into the ticket table to get ticket_id
-            ticket_query = """
-                INSERT INTO ticket (airline_name, flight_num)
-                VALUES (%s, %s)
-            """
-            cursor.execute(ticket_query, (airline_name, flight_num))
-            ticket_id = cursor.lastrowid  # Get the generated ticket_id
-            
-            # Insert the purchase into the purchases table
-            purchase_query = """
-                INSERT INTO purchases (ticket_id, customer_email, purchase_date)
-                VALUES (%s, %s, %s)
-            """
-            cursor.execute(purchase_query, (ticket_id, customer_email, datetime.now().date()))
-            db.commit()
-            
             flash('Ticket purchased successfully!')
             return redirect(url_for('view_my_flights'))
 
+        except (seat_inventory.SeatsUnavailable, seat_inventory.FlightNotFound) as e:
+            flash(str(e))
+            return redirect(url_for('search_flights_customer'))
         except Error as e:
             logging.error(f"An error occurred: {e}")
             flash(f"An error occurred: {e}")
-            db.rollback()  # Rollback in case of error
-        finally:
-            cursor.close()
 
     flash("Please log in to purchase a ticket.")
     return redirect(url_for('login'))
@@ -799,25 +889,24 @@ def search_flights_agent():
             """
             cursor.execute(agent_airline_query, (booking_agent_email,))
             agent_airline = cursor.fetchone()
+            cursor.fetchall()  # Consume the rest of the result before the search runs its own query
 
             if agent_airline:
                 airline_name = agent_airline[0]
 
-                # Query to search for flights based on source, destination, date, and airline
-                search_query = """
-                    SELECT * FROM flight
-                    WHERE airline_name = %s
-                    AND departure_airport LIKE %s
-                    AND arrival_airport LIKE %s
-                    AND DATE(departure_time) = %s
-                """
-                cursor.execute(search_query, (airline_name, f"%{source}%", f"%{destination}%", date))
-                available_flights = cursor.fetchall()
-                return render_template('search_flights_agent.html', flights=available_flights)
+                # Search for flights based on source, destination, date, and airline
+                available_flights = flight_search.find_flights_by_airport(
+                    db, source, destination, date, airline_name=airline_name, same_day=True
+                )
+                availability = seat_inventory.availability.remaining(db, [flight[:2] for flight in available_flights])
+                return render_template('search_flights_agent.html', flights=available_flights,
+                                       availability=availability)
 
             else:
                 flash("Booking agent airline information not found.")
 
+        except ValueError:
+            flash("Please provide a valid departure date.")
         except Error as e:
             logging.error(f"An error occurred during flight search: {e}")
             flash(f"An error occurred: {e}")
@@ -837,89 +926,105 @@ def purchase_ticket_agent(airline_name, flight_num):
 
     if request.method == 'POST':
         customer_emails = request.form.getlist('customer_emails')  # Selected customer emails
-        num_tickets = int(request.form.get('num_tickets', 1))  # Number of tickets to purchase
+        num_tickets = request.form.get('num_tickets', 1)  # Number of tickets to purchase
 
         try:
-            db = get_db()
-            cursor = db.cursor()
-
-            for _ in range(num_tickets):
-                # Insert the ticket for the flight
-                ticket_query = """
-                    INSERT INTO ticket (airline_name, flight_num)
-                    VALUES (%s, %s)
-                """
-                cursor.execute(ticket_query, (airline_name, flight_num))
-                ticket_id = cursor.lastrowid  # Get the generated ticket_id
-
-                # Insert the purchase record for each selected customer
-                for customer_email in customer_emails:
-                    purchase_query = """
-                        INSERT INTO purchases (ticket_id, customer_email, booking_agent_email, purchase_date)
-                        VALUES (%s, %s, %s, %s)
-                    """
-                    cursor.execute(purchase_query, (ticket_id, customer_email, booking_agent_email, datetime.now().date()))
-
-            db.commit()
+            if not customer_emails:
+                raise bulk_purchase.PurchaseError("Please select at least one customer.")
+            # Each selected customer gets num_tickets tickets, all bought in one batched transaction;
+            # the form goes through the same checks as the JSON API
+            lines = bulk_purchase.parse_lines({'lines': [
+                {'customer_email': customer_email, 'airline_name': airline_name, 'flight_num': flight_num,
+                 'count': num_tickets}
+                for customer_email in customer_emails
+            ]}, app.config.get('BULK_PURCHASE_MAX_TICKETS', 500))
+            bulk_purchase.purchase_tickets(get_db(), lines, booking_agent_email)
             flash(f'Tickets purchased successfully for {len(customer_emails)} customers!')
             return redirect(url_for('view_my_flights'))
 
+        except (bulk_purchase.PurchaseError, seat_inventory.FlightNotFound, seat_inventory.SeatsUnavailable) as e:
+            flash(str(e))
         except Error as e:
             logging.error(f"An error occurred: {e}")
             flash(f"An error occurred: {e}")
-            db.rollback()
-        finally:
-            cursor.close()
 
-    # Retrieve list of customers for agent to select
+    # Customers are looked up from the page as the agent types (see /api/agent_customers)
+    return render_template('purchase_ticket_agent.html', airline_name=airline_name, flight_num=flight_num)
+
+# Customers for the agent purchase form whose email starts with q: the agent's own
+# customers first, most recent purchase first, then everyone else
+@app.route('/api/agent_customers', methods=['GET'])
+def agent_customers():
+    if 'username' not in session or session.get('user_type') != 'booking_agent':
+        return jsonify({"error": "Please log in as a booking agent."}), 401
+
     try:
-        db = get_db()
-        cursor = db.cursor()
-        cursor.execute("SELECT email FROM customer")
-        customers = cursor.fetchall()
-    except Error as e:
-        logging.error(f"An error occurred while fetching customers: {e}")
-        flash(f"An error occurred: {e}")
-        customers = []
-    finally:
-        cursor.close()
+        customers, next_cursor = customer_picker.search(
+            get_db(), session['username'], request.args.get('q', ''), after=request.args.get('after'),
+            limit=pagination.page_size(request.args.get('limit'), default=20)
+        )
+    except ValueError as err:
+        return jsonify({"error": str(err)}), 400
+    except mysql.connector.Error as err:
+        return jsonify({"error": str(err)}), 500
+    return jsonify({"customers": customers, "next_cursor": next_cursor}), 200
 
-    return render_template('purchase_ticket_agent.html', airline_name=airline_name, flight_num=flight_num, customers=customers)
+# JSON API for booking agents buying many tickets at once
+@app.route('/api/purchase_tickets_agent', methods=['POST'])
+def purchase_tickets_agent_api():
+    if 'username' not in session or session.get('user_type') != 'booking_agent':
+        return jsonify({"error": "Please log in as a booking agent."}), 401
+
+    try:
+        lines = bulk_purchase.parse_lines(
+            request.get_json(silent=True), app.config.get('BULK_PURCHASE_MAX_TICKETS', 500)
+        )
+        ticket_ids = bulk_purchase.purchase_tickets(get_db(), lines, session['username'])
+        return jsonify({"ticket_ids": ticket_ids}), 201
+
+    except bulk_purchase.PurchaseError as err:
+        return jsonify({"error": str(err)}), 400
+    except seat_inventory.FlightNotFound as err:
+        return jsonify({"error": str(err)}), 404
+    except seat_inventory.SeatsUnavailable as err:
+        return jsonify({"error": str(err)}), 409
+    except mysql.connector.Error as err:
+        logging.error(f"Bulk purchase failed: {err}")
+        return jsonify({"error": str(err)}), 500
 
 @app.route('/track_spending', methods=['GET'])
 def track_spending():
     customer_email = session.get('username')
-    
-    if customer_email:
-        try:
-            db = get_db()
-            cursor = db.cursor()
-
-            # Query to calculate the total money spent per month in the past year
-            query = """
-                SELECT SUM(f.price) AS total_spent, MONTH(f.departure_time) AS month
-                FROM purchases p
-                JOIN ticket t ON p.ticket_id = t.ticket_id
-                JOIN flight f ON t.airline_name = f.airline_name AND t.flight_num = f.flight_num
-                WHERE p.customer_email = %s AND f.departure_time >= CURDATE() - INTERVAL 1 YEAR
-                GROUP BY MONTH(f.departure_time)
-            """
-            cursor.execute(query, (customer_email,))
-            spending_data = cursor.fetchall()
-            logging.debug("Fetched spending_data: %s", spending_data)
-            
-            # Render the data for the chart
-            return render_template('track_spending.html', spending_data=spending_data)
-
-        except Error as e:
-            logging.error(f"An error occurred: {e}")
-            flash(f"An error occurred: {e}")
-        finally:
-            cursor.close()
-    else:
+    if not customer_email:
         flash("Please log in to track your spending.")
         return redirect(url_for('login'))
 
+    # Any date range; by default this month and the eleven before it
+    today = datetime.now().date()
+    try:
+        start_date = request.args.get('start_date')
+        start_date = (datetime.strptime(start_date, "%Y-%m-%d").date() if start_date else
+                      spending_ledger.add_months(today, 1 - spending_ledger.DEFAULT_MONTHS))
+        end_date = request.args.get('end_date')
+        end_date = datetime.strptime(end_date, "%Y-%m-%d").date() if end_date else today
+    except ValueError:
+        flash("Dates must be in YYYY-MM-DD format.")
+        return redirect(url_for('track_spending'))
+    if start_date > end_date:
+        flash("The start date must not be after the end date.")
+        return redirect(url_for('track_spending'))
+
+    spending_data = []
+    try:
+        spending_data = spending_ledger.monthly_spending(get_db(), customer_email, start_date, end_date, today)
+    except Error as e:
+        logging.error(f"An error occurred: {e}")
+        flash(f"An error occurred: {e}")
+
+    return render_template('track_spending.html', spending_data=spending_data,
+                           total_spent=sum(row['total_spent'] for row in spending_data),
+                           start_date=start_date, end_date=end_date)
+
 @app.route('/view_top_customers', methods=['GET'])
 def view_top_customers():
     if 'username' not in session:
@@ -927,48 +1032,18 @@ def view_top_customers():
         return redirect(url_for('login'))
     
     booking_agent_email = session['username']
-    
-    # Calculate date ranges
-    six_months_ago = datetime.now().date() - timedelta(days=180)
-    one_year_ago = datetime.now().date() - timedelta(days=365)
 
     try:
         db = get_db()
-        cursor = db.cursor()
 
-        # Query for top customers by tickets bought in the past 6 months
-        tickets_query = """
-            SELECT p.customer_email, COUNT(p.ticket_id) AS tickets_bought
-            FROM purchases p
-            JOIN ticket t ON p.ticket_id = t.ticket_id
-            WHERE p.booking_agent_email = %s
-            AND p.purchase_date >= %s
-            GROUP BY p.customer_email
-            ORDER BY tickets_bought DESC
-            LIMIT 5
-        """
-        cursor.execute(tickets_query, (booking_agent_email, six_months_ago))
-        top_customers_by_tickets = cursor.fetchall()
-
-        # Query for top customers by commission received in the last year
-        commission_query = """
-            SELECT p.customer_email, SUM(f.price * 0.1) AS total_commission
-            FROM purchases p
-            JOIN ticket t ON p.ticket_id = t.ticket_id
-            JOIN flight f ON t.airline_name = f.airline_name AND t.flight_num = f.flight_num
-            WHERE p.booking_agent_email = %s
-            AND p.purchase_date >= %s
-            GROUP BY p.customer_email
-            ORDER BY total_commission DESC
-            LIMIT 5
-        """
-        cursor.execute(commission_query, (booking_agent_email, one_year_ago))
-        top_customers_by_commission = cursor.fetchall()
+        # Top customers by tickets bought in the past 6 months
+        top_customers_by_tickets = leaderboards.top(
+            db, 'agent_customers_by_tickets', booking_agent_email, months=6, limit=5)
+
+        # Top customers by commission received in the last year
+        top_customers_by_commission = leaderboards.top(
+            db, 'agent_customers_by_commission', booking_agent_email, months=12, limit=5)
 
-        # Render the results in the template
-        
-        logging.debug('top_customers_by_tickets', top_customers_by_tickets)
-        logging.debug("top_customers_by_commission", top_customers_by_commission)
         return render_template(
             'view_top_customers.html',
             top_customers_by_tickets=top_customers_by_tickets,
@@ -978,8 +1053,6 @@ def view_top_customers():
     except Error as e:
         logging.error(f"An error occurred while fetching top customers: {e}")
         flash(f"An error occurred: {e}")
-    finally:
-        cursor.close()
 
     return render_template('view_top_customers.html')
 
@@ -1003,22 +1076,27 @@ def view_my_flights_staff():
             return redirect(url_for('login'))
         
         airline_name = airline[0]
+        cursor.fetchall()
 
-        # Get date range from the form or default values
-        start_date = request.form.get('start_date', datetime.now().date())
-        end_date = request.form.get('end_date', (datetime.now() + timedelta(days=30)).date())
+        # Get date range from the form or default values; later pages carry it in the query string
+        start_date = request.values.get('start_date') or str(datetime.now().date())
+        end_date = request.values.get('end_date') or str((datetime.now() + timedelta(days=30)).date())
 
         # Query flights for the staff's airline within the specified date range
         query = """
-            SELECT * FROM flight
-            WHERE airline_name = %s
-              AND departure_time BETWEEN %s AND %s
+            SELECT * FROM flight f
+            WHERE f.airline_name = %s
+              AND f.departure_time BETWEEN %s AND %s
         """
-        cursor.execute(query, (airline_name, start_date, end_date))
-        flights = cursor.fetchall()
 
-        logging.debug(f"Found Staff Flights: {flights}")
-        return render_template('my_flights_staff.html', flights=flights)
+        def render(rows, next_url):
+            # my_flights_staff.html indexes flights by position
+            flights = [tuple(row.values()) for row in rows]
+            logging.debug(f"Found Staff Flights: {flights}")
+            return render_template('my_flights_staff.html', flights=flights, next_url=next_url)
+
+        return paged_listing(query, (airline_name, start_date, end_date), pagination.FLIGHT_ORDER, render,
+                             start_date=start_date, end_date=end_date)
 
     except Error as e:
         logging.error(f"An error occurred while retrieving flights: {e}")
@@ -1056,7 +1134,13 @@ def create_flight():
                 VALUES (%(airline_name)s, %(flight_num)s, %(departure_airport)s, %(arrival_airport)s, %(departure_time)s, %(arrival_time)s, %(price)s, %(status)s, %(airplane_id)s)
             """
             cursor.execute(query, flight_data)
+
+            # Seat counter for the new flight, sized from its airplane
+            seat_inventory.create(cursor, flight_data['airline_name'], flight_data['flight_num'])
+            fare_calendar.record_flights(cursor, flight_data['airline_name'], [flight_data['flight_num']])
             db.commit()
+            flight_status_cache.invalidate(flight_data['flight_num'])
+            refresh_catalog(db, flight_data['airline_name'], flight_data['flight_num'])
             flash("Flight created successfully!")
             return redirect(url_for('view_my_flights'))
 
@@ -1070,6 +1154,50 @@ def create_flight():
     return render_template('create_flight.html')
 
 
+# Import a timetable from a CSV or JSON file (see flight_import.py for the columns).
+# Form uploads get the report as a page, JSON requests as JSON.
+@app.route('/import_flights', methods=['GET', 'POST'])
+def import_flights():
+    if 'username' not in session or "airline_staff" != session.get('user_type') or 'Admin' not in session.get('roles'):
+        flash("Unauthorized access. Only Admins can import flights.")
+        return redirect(url_for('staff_home'))
+
+    if request.method == 'GET':
+        return render_template('import_flights.html', fields=flight_import.IMPORT_FIELDS, report=None)
+
+    wants_json = request.is_json or request.accept_mimetypes.best == 'application/json'
+    upload = request.files.get('schedule')
+    try:
+        if request.is_json:
+            rows = flight_import.json_rows(request.get_json(silent=True))
+        elif upload and upload.filename:
+            file_format = 'json' if upload.filename.lower().endswith('.json') else 'csv'
+            rows = flight_import.read_rows(upload.stream, file_format)
+        else:
+            raise flight_import.ScheduleFileError("Choose a CSV or JSON file to import")
+
+        skip_invalid = request.values.get('skip_invalid') in ('1', 'true', 'on')
+        report, records = flight_import.import_flights(get_db(), session['airline'], rows, skip_invalid)
+    except flight_import.ScheduleFileError as e:
+        if wants_json:
+            return jsonify({"error": str(e)}), 400
+        flash(str(e))
+        return redirect(url_for('import_flights'))
+    except Error as e:
+        logging.error(f"Flight import failed: {e}")
+        if wants_json:
+            return jsonify({"error": str(e)}), 500
+        flash(f"An error occurred: {e}")
+        return redirect(url_for('import_flights'))
+
+    catalog.add_new(records)
+    for flight_num in {record.flight_num for record in records}:
+        flight_status_cache.invalidate(flight_num)
+
+    if wants_json:
+        return jsonify(report), 200 if report['imported'] or not report['errors'] else 422
+    return render_template('import_flights.html', fields=flight_import.IMPORT_FIELDS, report=report)
+
 @app.route('/change_flight_status/<int:flight_num>', methods=['GET', 'POST'])
 def change_flight_status(flight_num):
     if 'username' not in session or session.get('user_type') != "airline_staff" or 'Operator' not in session.get('roles'):
@@ -1088,7 +1216,11 @@ def change_flight_status(flight_num):
                 WHERE flight_num = %s AND airline_name = %s
             """
             cursor.execute(query, (new_status, flight_num, session.get('airline')))
+            # A cancelled flight leaves the fare calendar, a reinstated one returns
+            fare_calendar.refresh_flight(cursor, session.get('airline'), flight_num)
             db.commit()
+            flight_status_cache.invalidate(flight_num)
+            refresh_catalog(db, session.get('airline'), flight_num)
             flash("Flight status updated successfully!")
             return redirect(url_for('view_my_flights'))
         except Error as e:
@@ -1141,6 +1273,7 @@ def add_airplane():
             """
             cursor.execute(query, airplane_data)
             db.commit()
+            flight_import.airplanes.invalidate(session['airline'])
             flash("Airplane added successfully!")
             return redirect(url_for('add_airplane'))
         except Error as e:
@@ -1174,6 +1307,7 @@ def add_airport():
             """
             cursor.execute(query, airport_data)
             db.commit()
+            flight_search.airports.add(airport_data['airport_name'], airport_data['city'])
             flash("Airport added successfully!")
             return redirect(url_for('staff_home'))
         except Error as e:
@@ -1193,66 +1327,21 @@ def view_booking_agents():
 
     try:
         db = get_db()
-        cursor = db.cursor(dictionary=True)
+        airline_name = session['airline']
 
-        # Top 5 booking agents by tickets sold in the past month (excluding NULL booking_agent_email)
-        cursor.execute("""
-            SELECT booking_agent_email, COUNT(*) AS tickets_sold
-            FROM ticket
-            NATURAL JOIN purchases
-            WHERE purchase_date >= DATE_SUB(CURDATE(), INTERVAL 1 MONTH)
-            AND booking_agent_email IS NOT NULL
-            GROUP BY booking_agent_email
-            ORDER BY tickets_sold DESC
-            LIMIT 5
-        """)
-        top_agents_month = cursor.fetchall()
-
-        # Top 5 booking agents by tickets sold in the past year (excluding NULL booking_agent_email)
-        cursor.execute("""
-            SELECT booking_agent_email, COUNT(*) AS tickets_sold
-            FROM ticket
-            NATURAL JOIN purchases
-            WHERE purchase_date >= DATE_SUB(CURDATE(), INTERVAL 1 YEAR)
-            AND booking_agent_email IS NOT NULL
-            GROUP BY booking_agent_email
-            ORDER BY tickets_sold DESC
-            LIMIT 5
-        """)
-        top_agents_year = cursor.fetchall()
-
-        # Top 5 booking agents by commission earned in the past year (excluding NULL booking_agent_email)
-        commission_rate = 0.05  # 5% commission
-
-        cursor.execute("""
-            SELECT 
-                p.booking_agent_email, 
-                COUNT(*) AS tickets_sold,
-                SUM(f.price) AS total_sales,
-                SUM(f.price) * %s AS commission_earned
-            FROM 
-                ticket t
-            JOIN purchases p ON t.ticket_id = p.ticket_id
-            JOIN flight f ON t.airline_name = f.airline_name AND t.flight_num = f.flight_num
-            WHERE 
-                p.purchase_date >= DATE_SUB(CURDATE(), INTERVAL 1 YEAR)
-            AND p.booking_agent_email IS NOT NULL
-            GROUP BY 
-                p.booking_agent_email
-            ORDER BY 
-                commission_earned DESC
-            LIMIT 5
-        """, (commission_rate,))
-        
-        top_agents_commission = cursor.fetchall()
-        logging.debug("COMMISION", top_agents_commission)
+        # Top 5 booking agents by tickets sold in the past month, from the sliding-window leaderboards
+        top_agents_month = leaderboards.top(db, 'agents_by_tickets', airline_name, months=1, limit=5)
+
+        # Top 5 booking agents by tickets sold in the past year
+        top_agents_year = leaderboards.top(db, 'agents_by_tickets', airline_name, months=12, limit=5)
+
+        # Top 5 booking agents by commission earned in the past year, at the rates recorded on each sale
+        top_agents_commission = leaderboards.top(db, 'agents_by_commission', airline_name, months=12, limit=5)
 
     except Error as e:
         logging.error(f"An error occurred: {e}")
         flash(f"An error occurred: {e}")
         return redirect(url_for('staff_home'))
-    finally:
-        cursor.close()
 
     return render_template('view_booking_agents.html', 
                            top_agents_month=top_agents_month,
@@ -1270,16 +1359,9 @@ def view_frequent_customers():
         db = get_db()
         cursor = db.cursor(dictionary=True)
 
-        # Most frequent customer in the last year
-        cursor.execute("""
-            SELECT customer_email, COUNT(*) AS flights_taken
-            FROM ticket NATURAL JOIN purchases NATURAL JOIN flight
-            WHERE airline_name = %s AND departure_time >= DATE_SUB(CURDATE(), INTERVAL 1 YEAR)
-            GROUP BY customer_email
-            ORDER BY flights_taken DESC
-            LIMIT 1
-        """, (session['airline'],))
-        most_frequent_customer = cursor.fetchone()
+        # Most frequent customer on flights departing since a year ago
+        top_customers = leaderboards.top(db, 'customers_by_flights', session['airline'], months=12, limit=1)
+        most_frequent_customer = top_customers[0] if top_customers else None
 
         # Fetch all flights for a specific customer
         customer_email = request.args.get('customer_email')
@@ -1309,84 +1391,72 @@ def view_reports():
         flash("Unauthorized access.")
         return redirect(url_for('login'))
 
-    tickets_sold_data = []
-    last_month_revenue = []
-    last_year_revenue = []
+    report = {'tickets_sold_data': [], 'last_month_revenue': [], 'last_year_revenue': []}
+    computed_at = None
 
     try:
         db = get_db()
-        cursor = db.cursor(dictionary=True)
+        airline_name = session['airline']
+
+        # The default datasets come from the latest snapshot; a stale one is refreshed in the background
+        report, computed_at = report_jobs.runner.snapshot(db, 'staff_reports', airline_name)
 
-        # Handle form inputs for date range
+        # Tickets sold for a chosen date range are a short read of the daily sales rollups
         start_date = request.form.get('start_date')
         end_date = request.form.get('end_date')
-        logging.debug(f"start_date: {start_date}, end_date: {end_date}")
-
-        # Query: Total tickets sold (with optional date range)
         if start_date and end_date:
-            query = """
-                SELECT DATE(purchase_date) AS sale_date, COUNT(*) AS tickets_sold
-                FROM ticket
-                NATURAL JOIN purchases
-                WHERE purchase_date BETWEEN %s AND %s
-                GROUP BY sale_date
-                ORDER BY sale_date
-            """
-            cursor.execute(query, (start_date, end_date))
-        else:
-            # Default: Last year
-            query = """
-                SELECT DATE_FORMAT(purchase_date, '%%Y-%%m') AS month, COUNT(*) AS tickets_sold
-                FROM ticket
-                NATURAL JOIN purchases
-                WHERE purchase_date >= DATE_SUB(CURDATE(), INTERVAL 1 YEAR)
-                GROUP BY month
-                ORDER BY month
-            """
-            cursor.execute(query)
-        tickets_sold_data = cursor.fetchall()
-
-        # Query: Revenue comparison for last month
-        cursor.execute("""
-            SELECT 
-                IF(booking_agent_email IS NULL, 'Direct Sales', 'Indirect Sales') AS sale_type,
-                SUM(f.price) AS revenue
-            FROM 
-                ticket t
-            JOIN purchases p ON t.ticket_id = p.ticket_id
-            JOIN flight f ON t.airline_name = f.airline_name AND t.flight_num = f.flight_num
-            WHERE p.purchase_date >= DATE_SUB(CURDATE(), INTERVAL 1 MONTH)
-            GROUP BY sale_type
-        """)
-        last_month_revenue = cursor.fetchall()
-
-        # Query: Revenue comparison for last year
-        cursor.execute("""
-            SELECT 
-                IF(booking_agent_email IS NULL, 'Direct Sales', 'Indirect Sales') AS sale_type,
-                SUM(f.price) AS revenue
-            FROM 
-                ticket t
-            JOIN purchases p ON t.ticket_id = p.ticket_id
-            JOIN flight f ON t.airline_name = f.airline_name AND t.flight_num = f.flight_num
-            WHERE p.purchase_date >= DATE_SUB(CURDATE(), INTERVAL 1 YEAR)
-            GROUP BY sale_type
-        """)
-        last_year_revenue = cursor.fetchall()
+            report = dict(report, tickets_sold_data=sales_rollup.tickets_by_day(db, airline_name,
+                                                                                 start_date, end_date))
 
     except Error as e:
         logging.error(f"Database error occurred: {e}")
         flash(f"An error occurred while retrieving data. Please try again.")
         return redirect(url_for('staff_home'))
-    finally:
-        if 'cursor' in locals():
-            cursor.close()
 
     # Render the results on the reports page
-    return render_template('view_reports.html', 
-                           tickets_sold_data=tickets_sold_data,
-                           last_month_revenue=last_month_revenue,
-                           last_year_revenue=last_year_revenue)
+    return render_template('view_reports.html', computed_at=computed_at, **report)
+
+# Queue an immediate refresh of the airline's report snapshot
+@app.route('/view_reports/refresh', methods=['POST'])
+def refresh_reports():
+    if 'username' not in session or session.get('user_type') != "airline_staff":
+        flash("Unauthorized access.")
+        return redirect(url_for('login'))
+    try:
+        report_jobs.enqueue(get_db(), 'staff_reports', session['airline'])
+        flash("The reports are being refreshed; reload the page in a moment.")
+    except Error as e:
+        logging.error(f"Could not queue a report refresh: {e}")
+        flash("Could not queue a report refresh. Please try again.")
+    return redirect(url_for('view_reports'))
+
+# Download the airline's ticket sales for a date range as CSV or Parquet, streamed
+# from the database in chunks so the export's size does not matter
+@app.route('/export_sales', methods=['GET'])
+def export_sales():
+    if 'username' not in session or session.get('user_type') != "airline_staff":
+        return jsonify({"error": "Unauthorized access."}), 401
+
+    airline_name = session['airline']
+    try:
+        start_date = datetime.strptime(request.args.get('start_date', ''), "%Y-%m-%d").date()
+        end_date = datetime.strptime(request.args.get('end_date', ''), "%Y-%m-%d").date()
+    except ValueError:
+        return jsonify({"error": "start_date and end_date are required, in YYYY-MM-DD format"}), 400
+    if start_date > end_date:
+        return jsonify({"error": "start_date must not be after end_date"}), 400
+
+    try:
+        content_type, extension, body = sales_export.export(get_db(), airline_name, start_date, end_date,
+                                                            request.args.get('format', 'csv'))
+    except sales_export.ExportError as e:
+        return jsonify({"error": str(e)}), 400
+    except mysql.connector.Error as err:
+        return jsonify({"error": str(err)}), 500
+
+    filename = f"sales-{airline_name}-{start_date}-{end_date}.{extension}".replace(' ', '_')
+    return Response(stream_with_context(body), mimetype=content_type,
+                    headers={'Content-Disposition': f'attachment; filename="{filename}"'})
 
 @app.route('/view_top_destinations', methods=['GET', 'POST'])
 def view_top_destinations():
@@ -1396,40 +1466,18 @@ def view_top_destinations():
 
     try:
         db = get_db()
-        cursor = db.cursor(dictionary=True)
+        airline_name = session['airline']
 
-        # Top 3 most popular destinations in the last 3 months
-        cursor.execute("""
-            SELECT f.arrival_airport AS destination, COUNT(*) AS tickets_sold
-            FROM ticket t
-            JOIN purchases p ON t.ticket_id = p.ticket_id
-            JOIN flight f ON t.airline_name = f.airline_name AND t.flight_num = f.flight_num
-            WHERE p.purchase_date >= CURDATE() - INTERVAL 3 MONTH
-            GROUP BY f.arrival_airport
-            ORDER BY tickets_sold DESC
-            LIMIT 3;
-        """)
-        top_destinations_3months = cursor.fetchall()
+        # Top 3 most popular destinations in the last 3 months, from the sliding-window leaderboards
+        top_destinations_3months = leaderboards.top(db, 'destinations', airline_name, months=3, limit=3)
 
         # Top 3 most popular destinations in the last year
-        cursor.execute("""
-            SELECT f.arrival_airport AS destination, COUNT(*) AS tickets_sold
-            FROM ticket t
-            JOIN purchases p ON t.ticket_id = p.ticket_id
-            JOIN flight f ON t.airline_name = f.airline_name AND t.flight_num = f.flight_num
-            WHERE p.purchase_date >= CURDATE() - INTERVAL 1 YEAR
-            GROUP BY f.arrival_airport
-            ORDER BY tickets_sold DESC
-            LIMIT 3;
-        """)
-        top_destinations_year = cursor.fetchall()
+        top_destinations_year = leaderboards.top(db, 'destinations', airline_name, months=12, limit=3)
 
     except Error as e:
         logging.error(f"An error occurred: {e}")
         flash(f"An error occurred: {e}")
         return redirect(url_for('staff_home'))
-    finally:
-        cursor.close()
 
     return render_template('view_top_destinations.html', 
                            top_destinations_3months=top_destinations_3months,
@@ -1481,6 +1529,7 @@ def grant_permission():
                     """, (permission_id, staff_username, new_permission))
 
                 db.commit()
+                auth.role_cache.invalidate(staff_username)
                 flash(f"Permission for {staff_username} has been updated to {new_permission}.")
             else:
                 flash(f"Staff with username {staff_username} not found.")
@@ -1539,7 +1588,7 @@ def add_booking_agent():
                 cursor.execute("""
                     INSERT INTO booking_agent (booking_agent_id, email, password, airline)
                     VALUES (%s, %s, %s, %s)
-                """, (agent_id, agent_email, agent_password, airline_name))
+                """, (agent_id, agent_email, auth.hash_password(agent_password), airline_name))
 
                 db.commit()
                 flash(f"Booking agent with email {agent_email} and ID {agent_id} has been added to your airline.")
@@ -1554,5 +1603,80 @@ def add_booking_agent():
 
 
 
+# Rebuild the staff report rollups and the commission and spending ledgers from the purchase history
+@app.cli.command('rebuild-rollups')
+@click.option('--start', help="First purchase date to rebuild (YYYY-MM-DD), default: all history")
+@click.option('--end', help="Last purchase date to rebuild (YYYY-MM-DD), default: today")
+def rebuild_rollups_command(start, end):
+    db = get_db()
+    # The staff rollups read agent commission from the commission ledger, so it goes first
+    commission_ledger.rebuild(db, start, end)
+    sales_rollup.rebuild(db, start, end)
+    spending_ledger.rebuild(db, start and datetime.strptime(start, "%Y-%m-%d").date(),
+                            end and datetime.strptime(end, "%Y-%m-%d").date())
+    leaderboards.clear()
+    click.echo("Sales rollups, commission and spending ledgers rebuilt.")
+
+
+# Recompute the fare calendar from the flight table, e.g. after prices were changed in SQL
+@app.cli.command('rebuild-fare-calendar')
+def rebuild_fare_calendar_command():
+    fare_calendar.rebuild(get_db())
+    click.echo("Fare calendar rebuilt.")
+
+
+# Import a timetable file for an airline; see flight_import.py for the columns
+@app.cli.command('import-flights')
+@click.argument('airline_name')
+@click.argument('schedule', type=click.File('rb'))
+@click.option('--format', 'file_format', type=click.Choice(['csv', 'json']),
+              help="File format, default: from the file extension")
+@click.option('--skip-invalid', is_flag=True, help="Import the valid rows even if some rows are invalid")
+def import_flights_command(airline_name, schedule, file_format, skip_invalid):
+    file_format = file_format or ('json' if schedule.name.lower().endswith('.json') else 'csv')
+    try:
+        rows = flight_import.read_rows(schedule, file_format)
+        report, records = flight_import.import_flights(get_db(), airline_name, rows, skip_invalid)
+    except flight_import.ScheduleFileError as e:
+        raise click.ClickException(str(e))
+    for error in report['errors']:
+        click.echo(f"Row {error['row']}: {error['error']}", err=True)
+    if not report['imported']:
+        raise click.ClickException(f"Nothing imported: {len(report['errors'])} of {report['rows']} rows are invalid")
+    click.echo(f"Imported {report['flights']} flights from {report['rows']} rows.")
+
+
+# Write an airline's ticket sales for a date range to a CSV or Parquet file, or CSV to stdout
+@app.cli.command('export-sales')
+@click.argument('airline_name')
+@click.option('--start', required=True, help="First purchase date (YYYY-MM-DD)")
+@click.option('--end', required=True, help="Last purchase date (YYYY-MM-DD)")
+@click.option('--format', 'output', type=click.Choice(sorted(sales_export.FORMATS)), default='csv',
+              show_default=True)
+@click.option('--output', 'path', default='-', help="File to write, default: stdout")
+def export_sales_command(airline_name, start, end, output, path):
+    try:
+        content_type, extension, body = sales_export.export(get_db(), airline_name, start, end, output)
+    except sales_export.ExportError as e:
+        raise click.ClickException(str(e))
+    if output == 'parquet' and path == '-':
+        raise click.ClickException("Parquet output needs a file; pass --output")
+    with click.open_file(path, 'wb' if output == 'parquet' else 'w') as out:
+        for chunk in body:
+            out.write(chunk)
+
+
+# Run report refresh jobs in a dedicated process; set REPORT_JOB_WORKERS = 0 for the web processes
+@app.cli.command('report-worker')
+@click.option('--threads', default=1, show_default=True, help="Jobs this process runs at once")
+def report_worker_command(threads):
+    report_jobs.runner.start(threads)
+    click.echo(f"Report worker {report_jobs.runner.worker_name} running {threads} thread(s).")
+    try:
+        report_jobs.runner.join()
+    except KeyboardInterrupt:
+        report_jobs.runner.stop()
+
+
 if __name__ == '__main__':
     app.run(debug=True)
\ No newline at end of file
@@ -0,0 +1,216 @@
+"""ASGI variant of the public JSON endpoints /search_flights and /flight_status.
+
+Serve it with any ASGI server, e.g.
+
+    uvicorn async_api:app --workers 1
+
+Requests are parsed and answered on the event loop; the lookups themselves
+run flight_search's shared query logic on a thread-offload pool. A call
+borrows a pooled connection only if it falls through to MySQL, and holds it
+for the rest of the call. Hundreds of requests can be
+in flight in one process while only ASYNC_API_THREADS of them touch MySQL
+(or the flight catalog) at a time.
+"""
+import asyncio
+import datetime
+import json
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+from urllib.parse import parse_qs, urlencode
+
+from mysql.connector import Error
+from werkzeug.http import http_date, parse_etags
+
+import config
+import flight_search
+import pagination
+from db_pool import ConnectionPool
+from flight_catalog import catalog
+from status_cache import flight_status_cache
+
+
+# Settings read from config.py, with defaults:
+#   ASYNC_API_THREADS       lookups running against MySQL at once (32)
+#   ASYNC_API_MAX_IN_FLIGHT requests admitted before new ones wait (1000)
+settings = {name: getattr(config, name) for name in dir(config) if name.isupper()}
+THREADS = settings.get('ASYNC_API_THREADS', 32)
+MAX_IN_FLIGHT = settings.get('ASYNC_API_MAX_IN_FLIGHT', 1000)
+
+# One connection per offload thread, so a lookup that needs one never waits on the pool
+db_pool = ConnectionPool.from_config({**settings, 'DB_POOL_SIZE': THREADS, 'DB_POOL_MAX_OVERFLOW': 0})
+executor = ThreadPoolExecutor(max_workers=THREADS, thread_name_prefix='async-api')
+
+catalog.configure(
+    db_pool,
+    ttl=settings.get('FLIGHT_CATALOG_TTL', 300),
+    enabled=settings.get('FLIGHT_CATALOG_ENABLED', True),
+)
+flight_status_cache.configure(
+    ttl=settings.get('FLIGHT_STATUS_CACHE_TTL', 10),
+    enabled=settings.get('FLIGHT_STATUS_CACHE_ENABLED', True),
+)
+
+def _json_default(value):
+    # Same encoding as Flask's jsonify, so both tiers return identical bodies
+    if isinstance(value, datetime.date):
+        return http_date(value)
+    if isinstance(value, Decimal):
+        return str(value)
+    raise TypeError(f"Cannot serialize {type(value).__name__}")
+
+
+class _LazyConnection:
+    # Borrows a pooled connection on first use, so a lookup answered from the flight
+    # catalog or the caches never takes one or pays for its ping
+
+    def __init__(self):
+        self.conn = None
+
+    def __getattr__(self, name):
+        if self.conn is None:
+            self.conn = db_pool.acquire()
+        return getattr(self.conn, name)
+
+
+def _with_connection(lookup, *args, **kwargs):
+    # Runs on an offload thread
+    db = _LazyConnection()
+    try:
+        return lookup(db, *args, **kwargs)
+    finally:
+        if db.conn is not None:
+            db_pool.release(db.conn)
+
+
+class JSONResponse:
+    def __init__(self, body, status=200, headers=None):
+        # Flask's jsonify sorts keys and ends the body with a newline; 304s have no body
+        self.body = b'' if status == 304 else (
+            json.dumps(body, default=_json_default, sort_keys=True, separators=(',', ':')) + '\n').encode()
+        self.status = status
+        self.headers = dict(headers or {})
+
+    async def send(self, send):
+        headers = []
+        if self.status != 304:
+            headers += [(b'content-type', b'application/json'),
+                        (b'content-length', str(len(self.body)).encode())]
+        headers += [(name.lower().encode(), value.encode()) for name, value in self.headers.items()]
+        await send({'type': 'http.response.start', 'status': self.status, 'headers': headers})
+        await send({'type': 'http.response.body', 'body': self.body})
+
+
+class AsyncAPI:
+    """Minimal ASGI application routing the two lookup endpoints."""
+
+    def __init__(self):
+        self.routes = {
+            '/search_flights': self.search_flights,
+            '/flight_status': self.flight_status,
+        }
+        self._in_flight = None
+
+    async def offload(self, lookup, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(executor, lambda: _with_connection(lookup, *args, **kwargs))
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self.lifespan(receive, send)
+            return
+        if scope['type'] != 'http':
+            return
+
+        if self._in_flight is None:
+            self._in_flight = asyncio.Semaphore(MAX_IN_FLIGHT)
+
+        handler = self.routes.get(scope['path'])
+        if handler is None:
+            response = JSONResponse({"error": "Not found"}, 404)
+        elif scope['method'] != 'GET':
+            response = JSONResponse({"error": "Method not allowed"}, 405, {'Allow': 'GET'})
+        else:
+            args = {key: values[0] for key, values in parse_qs(scope['query_string'].decode()).items()}
+            async with self._in_flight:
+                try:
+                    response = await handler(scope, args)
+                except Error as err:
+                    response = JSONResponse({"error": str(err)}, 500)
+        await response.send(send)
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                executor.shutdown(wait=True)
+                db_pool.close_all()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def search_flights(self, scope, args):
+        source_city = args.get('source_city')
+        destination_city = args.get('destination_city')
+        date = args.get('date')  # expecting format YYYY-MM-DD
+
+        if not source_city and not destination_city and not date:
+            return JSONResponse(
+                {"error": "At least one parameter (source_city, destination_city, or date) is required"}, 400)
+
+        after = args.get('after')
+        try:
+            after = pagination.decode_cursor(after) if after else None
+        except ValueError as err:
+            return JSONResponse({"error": str(err)}, 400)
+
+        try:
+            flights, next_cursor = await self.offload(
+                flight_search.search_page, source_city, destination_city, date, after=after,
+                limit=pagination.page_size(args.get('limit'))
+            )
+        except ValueError:
+            return JSONResponse({"error": "Invalid date, expected YYYY-MM-DD"}, 400)
+
+        if not flights:
+            return JSONResponse({"message": "No flights found."})
+
+        headers = {}
+        if next_cursor:
+            headers['X-Next-Cursor'] = next_cursor
+            headers['Link'] = f'<{scope["path"]}?{urlencode(dict(args, after=next_cursor))}>; rel="next"'
+        return JSONResponse(flights, headers=headers)
+
+    async def flight_status(self, scope, args):
+        flight_num = args.get('flight_num')
+        date = args.get('date')  # expecting format YYYY-MM-DD
+
+        if not flight_num or not date:
+            return JSONResponse({"error": "Missing parameters"}, 400)
+        try:
+            int(flight_num)
+        except ValueError:
+            return JSONResponse({"error": "Invalid flight_num, expected a whole number"}, 400)
+
+        # Fresh cache hits are answered on the event loop without a thread hop
+        cached = flight_status_cache.peek(flight_num, date) if flight_status_cache.enabled else None
+        if cached is None:
+            try:
+                cached = await self.offload(
+                    lambda db: flight_status_cache.get(
+                        flight_num, date, lambda: flight_search.find_flight_status(db, flight_num, date))
+                )
+            except ValueError:
+                return JSONResponse({"error": "Invalid date, expected YYYY-MM-DD"}, 400)
+        flight_status, etag = cached
+
+        headers = {'ETag': f'"{etag}"', 'Cache-Control': f'public, max-age={flight_status_cache.ttl}'}
+        request_headers = dict(scope['headers'])
+        if parse_etags(request_headers.get(b'if-none-match', b'').decode('latin-1')).contains(etag):
+            return JSONResponse(None, 304, headers)
+        if not flight_status:
+            return JSONResponse({"message": "Flight not found."}, headers=headers)
+        return JSONResponse(flight_status, headers=headers)
+
+
+app = AsyncAPI()
@@ -0,0 +1,204 @@
+import base64
+import hashlib
+import hmac
+import logging
+import os
+import threading
+import time
+
+from mysql.connector import Error
+
+
+# scrypt cost settings, read from config.py by configure():
+#   AUTH_SCRYPT_N  CPU/memory cost, a power of two (2**14)
+#   AUTH_SCRYPT_R  block size (8)
+#   AUTH_SCRYPT_P  parallelism (1)
+# One hash needs about 128 * N * R bytes; time candidates with
+# python -m benchmarks.kdf_bench before raising them. AUTH_ROLE_CACHE_TTL
+# (60) is how long staff roles are cached between permission checks.
+KDF_DEFAULTS = {
+    'AUTH_SCRYPT_N': 2 ** 14,
+    'AUTH_SCRYPT_R': 8,
+    'AUTH_SCRYPT_P': 1,
+}
+SALT_BYTES = 16
+KEY_BYTES = 32
+
+_kdf = {'n': KDF_DEFAULTS['AUTH_SCRYPT_N'], 'r': KDF_DEFAULTS['AUTH_SCRYPT_R'], 'p': KDF_DEFAULTS['AUTH_SCRYPT_P']}
+
+# Everything login needs about a user in one round-trip: the stored hash and,
+# for staff, the airline and every permission
+LOGIN_QUERIES = {
+    'customer': """
+        SELECT email AS username, password, NULL AS airline_name, NULL AS roles
+        FROM customer WHERE email = %s
+    """,
+    'booking_agent': """
+        SELECT email AS username, password, NULL AS airline_name, NULL AS roles
+        FROM booking_agent WHERE email = %s
+    """,
+    'airline_staff': """
+        SELECT s.username, s.password, s.airline_name, GROUP_CONCAT(p.permission) AS roles
+        FROM airline_staff s
+        LEFT JOIN permission p ON p.username = s.username
+        WHERE s.username = %s
+        GROUP BY s.username, s.password, s.airline_name
+    """,
+}
+
+PASSWORD_UPDATES = {
+    'customer': "UPDATE customer SET password = %s WHERE email = %s",
+    'booking_agent': "UPDATE booking_agent SET password = %s WHERE email = %s",
+    'airline_staff': "UPDATE airline_staff SET password = %s WHERE username = %s",
+}
+
+
+class LoginFailed(ValueError):
+    """Unknown user or wrong password; the message is shown to the user."""
+
+
+def configure(config):
+    for key, default in KDF_DEFAULTS.items():
+        _kdf[key.rsplit('_', 1)[-1].lower()] = config.get(key, default)
+    role_cache.ttl = config.get('AUTH_ROLE_CACHE_TTL', 60)
+
+
+def _b64(raw):
+    return base64.b64encode(raw).decode().rstrip('=')
+
+
+def _unb64(text):
+    return base64.b64decode(text + '=' * (-len(text) % 4))
+
+
+def _scrypt(password, salt, n, r, p):
+    # OpenSSL refuses to allocate more than maxmem, so size it from the cost
+    return hashlib.scrypt(password.encode(), salt=salt, n=n, r=r, p=p,
+                          maxmem=256 * r * (n + p + 2), dklen=KEY_BYTES)
+
+
+def hash_password(password, n=None, r=None, p=None):
+    """Salted scrypt hash encoded as scrypt$N$r$p$salt$key."""
+    n, r, p = n or _kdf['n'], r or _kdf['r'], p or _kdf['p']
+    salt = os.urandom(SALT_BYTES)
+    return f"scrypt${n}${r}${p}${_b64(salt)}${_b64(_scrypt(password, salt, n, r, p))}"
+
+
+def verify_password(password, stored):
+    """Check a password against a scrypt hash or a legacy unsalted MD5 digest."""
+    if not stored:
+        return False
+    if stored.startswith('scrypt$'):
+        try:
+            _, n, r, p, salt, key = stored.split('$')
+            expected = _unb64(key)
+            actual = _scrypt(password, _unb64(salt), int(n), int(r), int(p))
+        except ValueError:
+            return False
+        return hmac.compare_digest(actual, expected)
+    return hmac.compare_digest(hashlib.md5(password.encode()).hexdigest(), stored)
+
+
+def needs_rehash(stored):
+    """True for MD5 digests and scrypt hashes made with other cost settings."""
+    return not (stored or '').startswith(f"scrypt${_kdf['n']}${_kdf['r']}${_kdf['p']}$")
+
+
+def _roles(value):
+    return sorted(value.split(',')) if value else []
+
+
+def authenticate(db, username, password, user_type):
+    """Verify a login with one query and return the user's session data.
+
+    Returns {'username', 'user_type', 'airline', 'roles'}; raises LoginFailed.
+    Legacy or outdated hashes are upgraded to the current settings on success.
+    """
+    query = LOGIN_QUERIES.get(user_type)
+    if query is None:
+        raise LoginFailed("Invalid username, password, or user type")
+
+    cursor = db.cursor(dictionary=True)
+    try:
+        cursor.execute(query, (username,))
+        user = cursor.fetchone()
+        cursor.fetchall()
+    finally:
+        cursor.close()
+
+    if user is None:
+        raise LoginFailed("User does not exist. Please check your username and user type.")
+    if not verify_password(password, user['password']):
+        raise LoginFailed("Incorrect password. Please try again.")
+
+    if needs_rehash(user['password']):
+        _upgrade_hash(db, user_type, username, password)
+
+    roles = _roles(user['roles'])
+    if user_type == 'airline_staff':
+        role_cache.put(username, roles, user['airline_name'])
+    return {'username': username, 'user_type': user_type, 'airline': user['airline_name'], 'roles': roles}
+
+
+def _upgrade_hash(db, user_type, username, password):
+    cursor = db.cursor()
+    try:
+        cursor.execute(PASSWORD_UPDATES[user_type], (hash_password(password), username))
+        db.commit()
+    except Error as e:
+        # The old hash still works, so a failed upgrade must not fail the login
+        db.rollback()
+        logging.warning(f"Could not upgrade password hash for {username}: {e}")
+    finally:
+        cursor.close()
+
+
+def load_staff(db, username):
+    """(roles, airline_name) for a staff member, or None if they no longer exist."""
+    cursor = db.cursor(dictionary=True)
+    try:
+        cursor.execute(LOGIN_QUERIES['airline_staff'], (username,))
+        user = cursor.fetchone()
+        cursor.fetchall()
+    finally:
+        cursor.close()
+    if user is None:
+        return None
+    return _roles(user['roles']), user['airline_name']
+
+
+class RoleCache:
+    """Staff roles and airline by username, refreshed every ttl seconds.
+
+    grant_permission invalidates the staff member it changes, so their next
+    request picks up the new roles without logging in again; other worker
+    processes catch up within the TTL.
+    """
+
+    def __init__(self, ttl=60):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = {}
+
+    def put(self, username, roles, airline_name):
+        with self._lock:
+            self._entries[username] = (roles, airline_name, time.monotonic())
+
+    def get(self, username, load):
+        """(roles, airline_name), calling load() on a miss; None if load() finds nobody."""
+        entry = self._entries.get(username)
+        if entry is not None and time.monotonic() - entry[2] <= self.ttl:
+            return entry[0], entry[1]
+        loaded = load()
+        if loaded is None:
+            self.invalidate(username)
+            return None
+        self.put(username, *loaded)
+        return loaded
+
+    def invalidate(self, username):
+        with self._lock:
+            self._entries.pop(username, None)
+
+
+role_cache = RoleCache()
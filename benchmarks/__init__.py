@@ -0,0 +1,2 @@
+# Benchmarks and load tests. Run from the repository root, e.g.
+#   python -m benchmarks.search_bench --help
@@ -0,0 +1,168 @@
+"""Load test for the public JSON lookups: the Flask routes (sync mode) against
+async_api.py (async mode), reporting requests/s and p50/p99 latency per
+endpoint and concurrency level.
+
+Start both servers against the same database first, e.g.
+
+    gunicorn --workers 1 --threads 32 --bind 127.0.0.1:5000 app:app
+    uvicorn async_api:app --workers 1 --port 8000
+
+then
+
+    python -m benchmarks.api_load_bench --sync-url http://127.0.0.1:5000 \\
+        --async-url http://127.0.0.1:8000 --concurrency 32 128 512
+
+Request parameters are sampled from the flights already in that database
+(config.MYSQL_DB unless --database is given; benchmarks.search_bench can
+load a synthetic flight table into BENCH_DB).
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+from pathlib import Path
+from urllib.parse import urlencode, urlsplit
+
+import config
+from benchmarks.common import connect, summarize
+
+
+ENDPOINTS = ('search', 'status')
+
+
+def sample_cases(database, count, seed=1):
+    """Request paths for each endpoint, built from randomly chosen existing flights."""
+    db = connect(database)
+    cursor = db.cursor()
+    cursor.execute("""
+        SELECT f.flight_num, f.departure_time, dep.airport_city, arr.airport_city
+        FROM flight f
+        JOIN airport dep ON f.departure_airport = dep.airport_name
+        JOIN airport arr ON f.arrival_airport = arr.airport_name
+        ORDER BY RAND(%s) LIMIT %s
+    """, (seed, count))
+    rows = cursor.fetchall()
+    cursor.close()
+    db.close()
+    if not rows:
+        raise SystemExit(f"No flights in database {database!r} to build requests from")
+
+    cases = {'search': [], 'status': []}
+    for flight_num, departure_time, source_city, destination_city in rows:
+        day = departure_time.strftime("%Y-%m-%d")
+        cases['search'].append('/search_flights?' + urlencode(
+            {'source_city': source_city, 'destination_city': destination_city, 'date': day}))
+        cases['status'].append('/flight_status?' + urlencode({'flight_num': flight_num, 'date': day}))
+    return cases
+
+
+async def _request(reader, writer, host, path):
+    """One keep-alive GET; returns (status, server_closed). Bodies must carry Content-Length."""
+    writer.write(f"GET {path} HTTP/1.1\r\nHost: {host}\r\nAccept: application/json\r\n\r\n".encode())
+    await writer.drain()
+    status_line = await reader.readline()
+    if not status_line:
+        raise ConnectionError("Connection closed by server")
+    status = int(status_line.split()[1])
+
+    length, closed = 0, False
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b'\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        name, value = name.strip().lower(), value.strip().lower()
+        if name == 'content-length':
+            length = int(value)
+        elif name == 'connection' and value == 'close':
+            closed = True
+        elif name == 'transfer-encoding' and 'chunked' in value:
+            raise ConnectionError("Chunked responses are not supported by the load tester")
+    await reader.readexactly(length)
+    return status, closed
+
+
+async def _client(base_url, paths, deadline, measure_from, latencies, counts):
+    url = urlsplit(base_url)
+    host, port = url.hostname, url.port or 80
+    rng = random.Random()
+    reader = writer = None
+    while time.perf_counter() < deadline:
+        path = rng.choice(paths)
+        started = time.perf_counter()
+        try:
+            if writer is None:
+                reader, writer = await asyncio.open_connection(host, port)
+            status, closed = await _request(reader, writer, url.netloc, path)
+        except (OSError, ConnectionError, asyncio.IncompleteReadError, ValueError, IndexError):
+            # Count the failure and reconnect, as a real client would
+            status, closed = None, True
+        finished = time.perf_counter()
+        if closed and writer is not None:
+            writer.close()
+            reader = writer = None
+
+        # Requests that start during the warm-up are not recorded
+        if started >= measure_from:
+            if status is None or status >= 500:
+                counts['errors'] += 1
+            else:
+                counts['ok'] += 1
+                latencies.append((finished - started) * 1000)
+    if writer is not None:
+        writer.close()
+
+
+async def run_load(base_url, paths, concurrency, duration, warmup):
+    latencies = []
+    counts = {'ok': 0, 'errors': 0}
+    measure_from = time.perf_counter() + warmup
+    deadline = measure_from + duration
+    await asyncio.gather(*(
+        _client(base_url, paths, deadline, measure_from, latencies, counts)
+        for _ in range(concurrency)
+    ))
+    return {
+        'concurrency': concurrency,
+        'requests_per_s': round(counts['ok'] / duration, 1),
+        'errors': counts['errors'],
+        'latency': summarize(latencies) if latencies else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sync-url', help="base URL of the Flask app")
+    parser.add_argument('--async-url', help="base URL of async_api")
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[32, 128, 512])
+    parser.add_argument('--duration', type=float, default=20, help="measured seconds per run")
+    parser.add_argument('--warmup', type=float, default=3, help="unmeasured seconds before each run")
+    parser.add_argument('--endpoints', nargs='+', choices=ENDPOINTS, default=list(ENDPOINTS))
+    parser.add_argument('--cases', type=int, default=2000, help="distinct requests sampled per endpoint")
+    parser.add_argument('--database', default=config.MYSQL_DB)
+    parser.add_argument('--json', help="also write the results to this file")
+    args = parser.parse_args()
+
+    modes = {mode: url for mode, url in (('sync', args.sync_url), ('async', args.async_url)) if url}
+    if not modes:
+        parser.error("give --sync-url, --async-url or both")
+
+    cases = sample_cases(args.database, args.cases)
+    report = {'duration_s': args.duration, 'results': {}}
+    for endpoint in args.endpoints:
+        for concurrency in args.concurrency:
+            for mode, url in modes.items():
+                result = asyncio.run(run_load(url, cases[endpoint], concurrency, args.duration, args.warmup))
+                report['results'].setdefault(endpoint, {}).setdefault(mode, []).append(result)
+                latency = result['latency'] or {'p50_ms': float('nan'), 'p99_ms': float('nan')}
+                print(f"{endpoint:>6} {mode:>5} c={concurrency:<4} {result['requests_per_s']:>9.1f} req/s  "
+                      f"p50 {latency['p50_ms']:>8.2f} ms  p99 {latency['p99_ms']:>8.2f} ms  "
+                      f"errors {result['errors']}")
+
+    if args.json:
+        Path(args.json).write_text(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+"""Group booking benchmark: the old per-ticket purchase loop against the batched
+bulk_purchase.purchase_tickets path, for several group sizes.
+
+    python -m benchmarks.bulk_purchase_bench --sizes 50 100 200 --repeat 20
+"""
+import argparse
+import json
+from datetime import datetime
+from pathlib import Path
+
+import bulk_purchase
+from benchmarks.common import DEFAULT_DATABASE, Timer, apply_migration, scratch_database, summarize
+
+
+AIRLINE = 'Bench Air'
+FLIGHT_NUM = 1
+
+
+def legacy_purchase(db, customer_emails, num_tickets, booking_agent_email):
+    # The loop purchase_ticket_agent ran before the bulk path: two round-trips per ticket
+    cursor = db.cursor()
+    try:
+        for customer_email in customer_emails:
+            for _ in range(num_tickets):
+                cursor.execute("""
+                    INSERT INTO ticket (airline_name, flight_num)
+                    VALUES (%s, %s)
+                """, (AIRLINE, FLIGHT_NUM))
+                ticket_id = cursor.lastrowid
+                cursor.execute("""
+                    INSERT INTO purchases (ticket_id, customer_email, booking_agent_email, purchase_date)
+                    VALUES (%s, %s, %s, %s)
+                """, (ticket_id, customer_email, booking_agent_email, datetime.now().date()))
+        db.commit()
+    finally:
+        cursor.close()
+
+
+def prepare(db):
+    apply_migration(db, '002_sales_rollups.sql')
+    cursor = db.cursor()
+    cursor.execute("""
+        INSERT IGNORE INTO flight (airline_name, flight_num, departure_airport, departure_time,
+                                   arrival_airport, arrival_time, price, status, airplane_id)
+        VALUES (%s, %s, 'BENCH1', '2030-01-01 08:00', 'BENCH2', '2030-01-01 12:00', 300, 'Upcoming', 1)
+    """, (AIRLINE, FLIGHT_NUM))
+    db.commit()
+    cursor.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[50, 100, 200])
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--database', default=DEFAULT_DATABASE)
+    parser.add_argument('--json', help="also write the results to this file")
+    args = parser.parse_args()
+
+    db = scratch_database(args.database)
+    prepare(db)
+
+    report = {}
+    for size in args.sizes:
+        # One ticket per customer, the common group booking shape
+        customers = [f"group{size}-{i}@bench.test" for i in range(size)]
+        legacy, batched = [], []
+        for _ in range(args.repeat):
+            with Timer(legacy):
+                legacy_purchase(db, customers, 1, 'agent@bench.test')
+            with Timer(batched):
+                bulk_purchase.purchase_tickets(
+                    db, [(customer, AIRLINE, FLIGHT_NUM, 1) for customer in customers], 'agent@bench.test'
+                )
+        report[size] = {'legacy': summarize(legacy), 'batched': summarize(batched)}
+        print(f"{size:>4} seats  legacy p50 {report[size]['legacy']['p50_ms']:>9.2f} ms"
+              f"  batched p50 {report[size]['batched']['p50_ms']:>8.2f} ms"
+              f"  (p99 {report[size]['legacy']['p99_ms']:.2f} / {report[size]['batched']['p99_ms']:.2f})")
+    db.close()
+
+    if args.json:
+        Path(args.json).write_text(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
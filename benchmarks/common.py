@@ -0,0 +1,178 @@
+"""Helpers shared by the benchmarks: scratch database setup and timing."""
+import time
+from pathlib import Path
+
+import mysql.connector
+
+import config
+
+
+MIGRATIONS = Path(__file__).resolve().parent.parent / 'migrations'
+DEFAULT_DATABASE = getattr(config, 'BENCH_DB', 'flight_bench')
+
+# Minimal copies of the application tables, enough for the benchmarks to run
+# against a scratch database without touching the real one.
+SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS airline (
+        airline_name VARCHAR(50) PRIMARY KEY
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS airport (
+        airport_name VARCHAR(50) PRIMARY KEY,
+        airport_city VARCHAR(50) NOT NULL
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS airplane (
+        airline_name VARCHAR(50) NOT NULL,
+        airplane_id INT NOT NULL,
+        seats INT NOT NULL,
+        PRIMARY KEY (airline_name, airplane_id)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS flight (
+        airline_name VARCHAR(50) NOT NULL,
+        flight_num INT NOT NULL,
+        departure_airport VARCHAR(50) NOT NULL,
+        departure_time DATETIME NOT NULL,
+        arrival_airport VARCHAR(50) NOT NULL,
+        arrival_time DATETIME NOT NULL,
+        price DECIMAL(10, 2) NOT NULL,
+        status VARCHAR(50) NOT NULL,
+        airplane_id INT NOT NULL,
+        PRIMARY KEY (airline_name, flight_num)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS ticket (
+        ticket_id INT AUTO_INCREMENT PRIMARY KEY,
+        airline_name VARCHAR(50) NOT NULL,
+        flight_num INT NOT NULL
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS purchases (
+        ticket_id INT NOT NULL,
+        customer_email VARCHAR(50) NOT NULL,
+        booking_agent_email VARCHAR(50) NULL,
+        purchase_date DATE NOT NULL,
+        PRIMARY KEY (ticket_id, customer_email)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS customer (
+        email VARCHAR(50) PRIMARY KEY,
+        name VARCHAR(50) NOT NULL,
+        password VARCHAR(255) NOT NULL,
+        building_number VARCHAR(30),
+        street VARCHAR(30),
+        city VARCHAR(30),
+        state VARCHAR(30),
+        phone_number VARCHAR(20),
+        passport_number VARCHAR(30),
+        passport_expiration DATE,
+        passport_country VARCHAR(50),
+        date_of_birth DATE
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS booking_agent (
+        email VARCHAR(50) PRIMARY KEY,
+        password VARCHAR(255) NOT NULL,
+        booking_agent_id INT NOT NULL,
+        airline VARCHAR(50)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS airline_staff (
+        username VARCHAR(50) PRIMARY KEY,
+        password VARCHAR(255) NOT NULL,
+        first_name VARCHAR(50),
+        last_name VARCHAR(50),
+        date_of_birth DATE,
+        airline_name VARCHAR(50) NOT NULL
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS permission (
+        permission_id VARCHAR(50) PRIMARY KEY,
+        username VARCHAR(50) NOT NULL,
+        permission VARCHAR(50) NOT NULL
+    )
+    """,
+]
+
+
+def connect(database=None, **kwargs):
+    return mysql.connector.connect(
+        host=config.MYSQL_HOST,
+        user=config.MYSQL_USER,
+        password=config.MYSQL_PASSWORD,
+        port=config.MYSQL_PORT,
+        database=database,
+        **kwargs,
+    )
+
+
+def scratch_database(name=DEFAULT_DATABASE):
+    """Connect to the scratch database, creating it and the base tables if needed."""
+    server = connect()
+    cursor = server.cursor()
+    cursor.execute(f"CREATE DATABASE IF NOT EXISTS `{name}`")
+    cursor.close()
+    server.close()
+
+    db = connect(name)
+    cursor = db.cursor()
+    for statement in SCHEMA:
+        cursor.execute(statement)
+    cursor.close()
+    return db
+
+
+def migration_statements(filename):
+    """Statements of one file in migrations/, with comment lines removed."""
+    text = (MIGRATIONS / filename).read_text()
+    text = '\n'.join(line for line in text.splitlines() if not line.lstrip().startswith('--'))
+    return [statement.strip() for statement in text.split(';') if statement.strip()]
+
+
+def apply_migration(db, filename):
+    cursor = db.cursor()
+    for statement in migration_statements(filename):
+        cursor.execute(statement)
+    db.commit()
+    cursor.close()
+
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def summarize(samples_ms):
+    return {
+        'count': len(samples_ms),
+        'p50_ms': round(percentile(samples_ms, 0.50), 3),
+        'p95_ms': round(percentile(samples_ms, 0.95), 3),
+        'p99_ms': round(percentile(samples_ms, 0.99), 3),
+        'max_ms': round(max(samples_ms), 3),
+    }
+
+
+class Timer:
+    """Context manager recording elapsed milliseconds into a list."""
+
+    def __init__(self, samples):
+        self.samples = samples
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.samples.append((time.perf_counter() - self.started) * 1000)
+        return False
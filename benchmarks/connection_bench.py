@@ -0,0 +1,91 @@
+"""Connection search latency: itinerary_search.find_itineraries over a synthetic
+in-memory flight catalog shaped like a hub-and-spoke network. No database is
+used; the catalog is built directly.
+
+    python -m benchmarks.connection_bench --flights 1000000 --queries 200
+"""
+import argparse
+import json
+import random
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import itinerary_search
+from benchmarks.common import Timer, summarize
+from flight_catalog import FlightCatalog, FlightRecord, _Indexes
+
+
+def build_catalog(flights, airports, hubs, days, seed):
+    rng = random.Random(seed)
+    names = [f"AP{i:04d}" for i in range(airports)]
+    hub_names = names[:hubs]
+    first_day = datetime(2030, 1, 1)
+
+    indexes = _Indexes()
+    for number in range(1, flights + 1):
+        # Most flights touch a hub, as in a real network
+        if rng.random() < 0.8:
+            origin, destination = rng.choice(hub_names), rng.choice(names)
+            if rng.random() < 0.5:
+                origin, destination = destination, origin
+        else:
+            origin, destination = rng.choice(names), rng.choice(names)
+        if origin == destination:
+            continue
+        departure = first_day + timedelta(days=rng.randrange(days), minutes=5 * rng.randrange(288))
+        arrival = departure + timedelta(minutes=45 + 15 * rng.randrange(40))
+        indexes.add(FlightRecord('Bench Air', number, origin, departure, destination, arrival,
+                                 rng.randint(50, 900), 'upcoming', 1))
+
+    catalog = FlightCatalog(ttl=float('inf'))
+    catalog._indexes = indexes
+    catalog._loaded_at = time.monotonic()
+    return catalog, names, hub_names, first_day
+
+
+def time_queries(pairs, day):
+    samples = []
+    found = 0
+    for origin, destination in pairs:
+        with Timer(samples):
+            found += len(itinerary_search.find_itineraries({origin}, {destination}, day))
+    return summarize(samples), found / len(pairs)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--flights', type=int, default=1_000_000)
+    parser.add_argument('--airports', type=int, default=400)
+    parser.add_argument('--hubs', type=int, default=12)
+    parser.add_argument('--days', type=int, default=60)
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--json', help="also write the results to this file")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    catalog, names, hub_names, first_day = build_catalog(args.flights, args.airports, args.hubs, args.days,
+                                                         args.seed)
+    itinerary_search.catalog = catalog
+    print(f"Built a catalog of {len(catalog._indexes.flights)} flights in {time.perf_counter() - started:.1f}s")
+
+    rng = random.Random(args.seed)
+    day = (first_day + timedelta(days=args.days // 2)).date()
+    workloads = {
+        'any airports': [tuple(rng.sample(names, 2)) for _ in range(args.queries)],
+        'hub to hub': [tuple(rng.sample(hub_names, 2)) for _ in range(args.queries)],
+    }
+    report = {}
+    for name, pairs in workloads.items():
+        latency, average = time_queries(pairs, day)
+        report[name] = {'latency': latency, 'itineraries_per_query': average}
+        print(f"{name:>14}  p50 {latency['p50_ms']:>8.2f} ms  p95 {latency['p95_ms']:>8.2f} ms  "
+              f"max {latency['max_ms']:>8.2f} ms  {average:.1f} itineraries per query")
+
+    if args.json:
+        Path(args.json).write_text(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,283 @@
+"""Synthetic airline dataset for load tests: airlines, airports, airplanes,
+flights, customers, booking agents, staff and up to tens of millions of
+tickets and purchases, written into a scratch database (BENCH_DB, default
+flight_bench) with LOAD DATA LOCAL INFILE or, with --method insert, batched
+multi-row INSERTs.
+
+    python -m benchmarks.datagen --tickets 20000000 --customers 2000000
+
+The same --seed produces the same rows, with dates relative to the day of
+the run. Every user's password is
+BENCH_PASSWORD; names follow the patterns in this module, so the journeys in
+benchmarks.journeys can log in without reading the database. Derived tables
+(indexes, rollups, seat counters, ledgers) are built after the load, and a manifest of
+the generated sizes is written next to the data as JSON.
+"""
+import argparse
+import csv
+import json
+import os
+import random
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+import auth
+import commission_ledger
+import fare_calendar
+import report_jobs
+import sales_rollup
+import spending_ledger
+from benchmarks.common import DEFAULT_DATABASE, apply_migration, connect, scratch_database
+from benchmarks.search_bench import set_indexes
+
+
+BENCH_PASSWORD = 'bench-password'
+
+AIRPORTS_PER_CITY = 3
+AIRPLANES_PER_AIRLINE = 40
+STAFF_PER_AIRLINE = 3
+
+# Flights depart within this many days either side of the generation date, so
+# both past sales reports and upcoming searches have data
+FLIGHT_WINDOW_DAYS = 180
+CHUNK_ROWS = 200_000
+
+
+def airline_name(i):
+    return f"Airline{i:02d}"
+
+
+def airport_name(city, i):
+    return f"APT{city:03d}{'ABCDEFGHIJ'[i]}"
+
+
+def city_name(city):
+    return f"City{city:03d}"
+
+
+def customer_email(i):
+    return f"customer{i}@bench.test"
+
+
+def agent_email(i):
+    return f"agent{i}@bench.test"
+
+
+def staff_username(airline, i):
+    return f"staff{airline:02d}_{i}"
+
+
+class Loader:
+    """Writes row chunks with LOAD DATA LOCAL INFILE or multi-row INSERTs."""
+
+    def __init__(self, db, method):
+        self.db = db
+        self.method = method
+        self.rows_written = 0
+
+    def write(self, table, columns, rows):
+        if not rows:
+            return
+        cursor = self.db.cursor()
+        try:
+            if self.method == 'load':
+                self._load_data(cursor, table, columns, rows)
+            else:
+                placeholders = f"({', '.join(['%s'] * len(columns))})"
+                for offset in range(0, len(rows), 5000):
+                    batch = rows[offset:offset + 5000]
+                    cursor.execute(
+                        f"INSERT INTO {table} ({', '.join(columns)}) VALUES "
+                        + ', '.join([placeholders] * len(batch)),
+                        tuple(value for row in batch for value in row),
+                    )
+            self.db.commit()
+        finally:
+            cursor.close()
+        self.rows_written += len(rows)
+
+    def _load_data(self, cursor, table, columns, rows):
+        with tempfile.NamedTemporaryFile('w', newline='', suffix='.csv', delete=False) as handle:
+            writer = csv.writer(handle, lineterminator='\n')
+            for row in rows:
+                # With ENCLOSED BY set, an unquoted NULL field loads as SQL NULL
+                writer.writerow(['NULL' if value is None else value for value in row])
+            path = handle.name
+        try:
+            cursor.execute(f"""
+                LOAD DATA LOCAL INFILE '{path}' INTO TABLE {table}
+                FIELDS TERMINATED BY ',' OPTIONALLY ENCLOSED BY '"' ESCAPED BY ''
+                LINES TERMINATED BY '\\n'
+                ({', '.join(columns)})
+            """)
+        finally:
+            os.unlink(path)
+
+
+def truncate(db):
+    cursor = db.cursor()
+    for table in ('airline', 'airport', 'airplane', 'flight', 'ticket', 'purchases',
+                  'customer', 'booking_agent', 'airline_staff', 'permission'):
+        cursor.execute(f"TRUNCATE TABLE {table}")
+    # Derived tables are rebuilt from scratch by build_derived
+    for table in DERIVED_TABLES:
+        cursor.execute(f"DROP TABLE IF EXISTS {table}")
+    cursor.close()
+    # Secondary indexes are cheaper to build once after the load than to maintain during it
+    set_indexes(db, enabled=False)
+
+
+def generate(loader, args, rng):
+    today = date.today()
+    password_hash = auth.hash_password(BENCH_PASSWORD)
+    airlines = args.airlines
+
+    loader.write('airline', ('airline_name',), [(airline_name(a),) for a in range(airlines)])
+
+    airports = [(airport_name(c, i), city_name(c)) for c in range(args.cities) for i in range(AIRPORTS_PER_CITY)]
+    loader.write('airport', ('airport_name', 'airport_city'), airports)
+
+    rows = [(airline_name(a), plane, rng.randrange(150, 450))
+            for a in range(airlines) for plane in range(1, AIRPLANES_PER_AIRLINE + 1)]
+    loader.write('airplane', ('airline_name', 'airplane_id', 'seats'), rows)
+
+    # Flights: numbered per airline, spread over the window around today
+    window_start = datetime.combine(today, datetime.min.time()) - timedelta(days=FLIGHT_WINDOW_DAYS)
+    flights = []
+    rows = []
+    for i in range(args.flights):
+        a = i % airlines
+        flight_num = i // airlines + 1
+        departure_airport, arrival_airport = rng.sample(airports, 2)
+        departure = window_start + timedelta(minutes=rng.randrange(2 * FLIGHT_WINDOW_DAYS * 24 * 60))
+        arrival = departure + timedelta(minutes=rng.randrange(60, 900))
+        price = rng.randrange(50, 2000)
+        status = 'Upcoming' if departure.date() >= today else rng.choice(('On Time', 'Delayed'))
+        flights.append((airline_name(a), flight_num, departure, price))
+        rows.append((airline_name(a), flight_num, departure_airport[0], departure, arrival_airport[0], arrival,
+                     price, status, rng.randrange(1, AIRPLANES_PER_AIRLINE + 1)))
+        if len(rows) >= CHUNK_ROWS:
+            loader.write('flight', FLIGHT_COLUMNS, rows)
+            rows = []
+    loader.write('flight', FLIGHT_COLUMNS, rows)
+
+    rows = []
+    for i in range(args.customers):
+        rows.append((customer_email(i), f"Customer {i}", password_hash, str(rng.randrange(1, 999)),
+                     f"Street {rng.randrange(500)}", city_name(rng.randrange(args.cities)), 'NY',
+                     f"555{i:07d}"[-10:], f"P{i:09d}", today + timedelta(days=rng.randrange(100, 3000)),
+                     'USA', today - timedelta(days=rng.randrange(18 * 365, 80 * 365))))
+        if len(rows) >= CHUNK_ROWS:
+            loader.write('customer', CUSTOMER_COLUMNS, rows)
+            rows = []
+    loader.write('customer', CUSTOMER_COLUMNS, rows)
+
+    loader.write('booking_agent', ('email', 'password', 'booking_agent_id', 'airline'),
+                 [(agent_email(i), password_hash, i + 1, airline_name(i % airlines)) for i in range(args.agents)])
+
+    staff, permissions = [], []
+    for a in range(airlines):
+        for i in range(STAFF_PER_AIRLINE):
+            username = staff_username(a, i)
+            staff.append((username, password_hash, 'Staff', str(i), today - timedelta(days=30 * 365),
+                          airline_name(a)))
+            permissions.append((f"{username}-operator", username, 'Operator'))
+            if i == 0:
+                permissions.append((f"{username}-admin", username, 'Admin'))
+    loader.write('airline_staff', ('username', 'password', 'first_name', 'last_name', 'date_of_birth',
+                                   'airline_name'), staff)
+    loader.write('permission', ('permission_id', 'username', 'permission'), permissions)
+
+    # Tickets and purchases: ids are assigned here so both tables load without lastrowid
+    tickets, purchases = [], []
+    for ticket_id in range(1, args.tickets + 1):
+        airline, flight_num, departure, _ = flights[rng.randrange(len(flights))]
+        bought = min(departure.date(), today) - timedelta(days=rng.randrange(0, 90))
+        agent = agent_email(rng.randrange(args.agents)) if rng.random() < args.agent_share else None
+        tickets.append((ticket_id, airline, flight_num))
+        purchases.append((ticket_id, customer_email(rng.randrange(args.customers)), agent, bought))
+        if len(tickets) >= CHUNK_ROWS:
+            loader.write('ticket', ('ticket_id', 'airline_name', 'flight_num'), tickets)
+            loader.write('purchases', PURCHASE_COLUMNS, purchases)
+            tickets, purchases = [], []
+            print(f"  {ticket_id:,} tickets", flush=True)
+    loader.write('ticket', ('ticket_id', 'airline_name', 'flight_num'), tickets)
+    loader.write('purchases', PURCHASE_COLUMNS, purchases)
+
+
+FLIGHT_COLUMNS = ('airline_name', 'flight_num', 'departure_airport', 'departure_time', 'arrival_airport',
+                  'arrival_time', 'price', 'status', 'airplane_id')
+CUSTOMER_COLUMNS = ('email', 'name', 'password', 'building_number', 'street', 'city', 'state', 'phone_number',
+                    'passport_number', 'passport_expiration', 'passport_country', 'date_of_birth')
+PURCHASE_COLUMNS = ('ticket_id', 'customer_email', 'booking_agent_email', 'purchase_date')
+
+# Migrations applied after the load; 003 and 005 backfill the seat counters and
+# spending ledger from the tickets
+MIGRATIONS = ('002_sales_rollups.sql', '003_flight_seat_inventory.sql', '005_customer_spending_ledger.sql',
+              '006_agent_commission_ledger.sql', '007_daily_customer_flights.sql', '008_report_jobs.sql',
+              '009_fare_calendar.sql', '010_purchases_agent_index.sql')
+DERIVED_TABLES = (sales_rollup.ROLLUP_TABLES + commission_ledger.LEDGER_TABLES + report_jobs.JOB_TABLES
+                  + ('flight_seat_inventory', spending_ledger.LEDGER_TABLE, fare_calendar.CALENDAR_TABLE))
+
+
+def build_derived(db):
+    """Indexes, seat counters, rollups and ledgers, computed from the loaded rows."""
+    set_indexes(db, enabled=True)
+    for filename in MIGRATIONS:
+        apply_migration(db, filename)
+    commission_ledger.rebuild(db)
+    sales_rollup.rebuild(db)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--airlines', type=int, default=20)
+    parser.add_argument('--cities', type=int, default=120)
+    parser.add_argument('--flights', type=int, default=200_000)
+    parser.add_argument('--customers', type=int, default=500_000)
+    parser.add_argument('--agents', type=int, default=2_000)
+    parser.add_argument('--tickets', type=int, default=5_000_000)
+    parser.add_argument('--agent-share', type=float, default=0.3, help="fraction of tickets sold by agents")
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--method', choices=('load', 'insert'), default='load',
+                        help="LOAD DATA LOCAL INFILE (needs local_infile=ON on the server) or multi-row INSERTs")
+    parser.add_argument('--database', default=DEFAULT_DATABASE)
+    parser.add_argument('--manifest', help="manifest path (default: datagen-<database>.json)")
+    args = parser.parse_args()
+
+    scratch_database(args.database).close()
+    db = connect(args.database, allow_local_infile=args.method == 'load')
+    cursor = db.cursor()
+    cursor.execute("SET unique_checks = 0, foreign_key_checks = 0")
+    cursor.close()
+
+    started = time.perf_counter()
+    truncate(db)
+    loader = Loader(db, args.method)
+    generate(loader, args, random.Random(args.seed))
+    loaded = time.perf_counter() - started
+    print(f"Loaded {loader.rows_written:,} rows in {loaded:.1f}s")
+
+    build_derived(db)
+    db.close()
+    total = time.perf_counter() - started
+    print(f"Built indexes and derived tables in {total - loaded:.1f}s")
+
+    manifest = {
+        'database': args.database,
+        'seed': args.seed,
+        'generated_on': date.today().isoformat(),
+        'method': args.method,
+        'rows': loader.rows_written,
+        'load_seconds': round(loaded, 1),
+        'total_seconds': round(total, 1),
+        'sizes': {key: getattr(args, key) for key in
+                  ('airlines', 'cities', 'flights', 'customers', 'agents', 'tickets', 'agent_share')},
+    }
+    Path(args.manifest or f"datagen-{args.database}.json").write_text(json.dumps(manifest, indent=2))
+
+
+if __name__ == '__main__':
+    main()
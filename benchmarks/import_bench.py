@@ -0,0 +1,105 @@
+"""Schedule import cost on the application side: validate, number and expand
+an import file into flight records with flight_import.import_flights. The
+airport and airplane directories are filled in memory and the connection
+discards every write, so no database is used and only the Python work is
+timed; the INSERTs themselves are measured by loading a real file.
+
+    python -m benchmarks.import_bench --rows 1000 --days 100 --repeat 5
+"""
+import argparse
+import json
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import flight_import
+from benchmarks.common import Timer, summarize
+
+
+AIRLINE = 'Bench Air'
+AIRPORTS = 200
+
+
+class _DiscardingCursor:
+    # Answers the numbering queries as for an airline with no flights yet
+
+    def execute(self, query, params=()):
+        self.rows = [(0,)] if 'MAX(flight_num)' in query else []
+
+    def executemany(self, query, rows):
+        pass
+
+    def fetchone(self):
+        return self.rows.pop(0)
+
+    def fetchall(self):
+        rows, self.rows = self.rows, []
+        return rows
+
+    def close(self):
+        pass
+
+
+class _DiscardingConnection:
+    def cursor(self):
+        return _DiscardingCursor()
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+
+def prepare():
+    flight_import.airports._build([(f"AP{i:03d}", f"City {i % 50}") for i in range(AIRPORTS)])
+    flight_import.airports._loaded_at = time.monotonic()
+    flight_import.airports.ttl = float('inf')
+    flight_import.airplanes.ttl = float('inf')
+    flight_import.airplanes._by_airline[AIRLINE] = (time.monotonic(), {str(i): (i, 180) for i in range(1, 51)})
+
+
+def schedule(rows, days):
+    first_day = datetime(2030, 1, 1)
+    last_day = (first_day + timedelta(days=days - 1)).date().isoformat()
+    file_rows = []
+    for i in range(rows):
+        departure = first_day + timedelta(minutes=15 * (i % 64))
+        file_rows.append({
+            'departure_airport': f"AP{i % AIRPORTS:03d}",
+            'departure_time': departure.isoformat(sep=' '),
+            'arrival_airport': f"AP{(i * 7 + 1) % AIRPORTS:03d}",
+            'arrival_time': (departure + timedelta(hours=2, minutes=i % 240)).isoformat(sep=' '),
+            'price': f"{100 + i % 400}.00",
+            'airplane_id': str(1 + i % 50),
+            'repeat_until': last_day if days > 1 else '',
+        })
+    return file_rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=1000, help="rows in the import file")
+    parser.add_argument('--days', type=int, default=100, help="days each row repeats for")
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--json', help="also write the results to this file")
+    args = parser.parse_args()
+
+    prepare()
+    rows = schedule(args.rows, args.days)
+    samples = []
+    for _ in range(args.repeat):
+        with Timer(samples):
+            report, records = flight_import.import_flights(_DiscardingConnection(), AIRLINE, rows)
+    assert not report['errors'], report['errors'][:5]
+
+    latency = summarize(samples)
+    print(f"{args.rows} rows -> {len(records)} flights  p50 {latency['p50_ms']:.1f} ms  "
+          f"max {latency['max_ms']:.1f} ms  ({len(records) / latency['p50_ms']:.0f} flights/ms)")
+    if args.json:
+        Path(args.json).write_text(json.dumps({'rows': args.rows, 'flights': len(records), 'latency': latency},
+                                              indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,300 @@
+"""Scripted user journeys against a running app, with per-route throughput and
+latency percentiles saved as JSON for run-over-run comparison.
+
+Load a dataset with benchmarks.datagen, point the app's config.py at that
+database, start the app, then e.g.
+
+    python -m benchmarks.journeys --url http://127.0.0.1:5000 --users 50 --duration 120 \\
+        --mix customer=4,agent=1,staff=1,public=10 --json run.json --compare previous.json
+
+Journeys:
+  customer  log in, search by airport, buy a ticket, list my flights, log out
+  agent     log in, search for the agent's airline, bulk-buy for several customers,
+            view commission and top customers, log out
+  staff     log in as an Admin, open every report page, log out
+  public    JSON flight search and flight status lookups, no session
+"""
+import argparse
+import json
+import random
+import subprocess
+import threading
+import time
+from collections import Counter, defaultdict
+from datetime import datetime
+from http.cookiejar import CookieJar
+from pathlib import Path
+from urllib.error import HTTPError, URLError
+from urllib.parse import urlencode
+from urllib.request import HTTPCookieProcessor, HTTPRedirectHandler, Request, build_opener
+
+from benchmarks.common import DEFAULT_DATABASE, connect, summarize
+from benchmarks.datagen import BENCH_PASSWORD, agent_email, airline_name, customer_email, staff_username
+
+
+class _NoRedirect(HTTPRedirectHandler):
+    # Each hop is timed as its own route, so redirects are not followed
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+class Recorder:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies = defaultdict(list)
+        self.statuses = defaultdict(Counter)
+        self.journeys = Counter()
+        self.measuring = False
+
+    def record(self, route, elapsed_ms, status):
+        if not self.measuring:
+            return
+        with self._lock:
+            self.statuses[route][status] += 1
+            if status != 'error' and status < 500:
+                self.latencies[route].append(elapsed_ms)
+
+    def journey_done(self, name):
+        if self.measuring:
+            with self._lock:
+                self.journeys[name] += 1
+
+
+class VirtualUser:
+    """One browser: its own cookie jar, requests timed under a route label."""
+
+    def __init__(self, base_url, recorder):
+        self.base_url = base_url.rstrip('/')
+        self.recorder = recorder
+        self.opener = build_opener(HTTPCookieProcessor(CookieJar()), _NoRedirect)
+
+    def request(self, route, path, form=None, payload=None):
+        data, headers = None, {}
+        if form is not None:
+            data = urlencode(form).encode()
+            headers['Content-Type'] = 'application/x-www-form-urlencoded'
+        elif payload is not None:
+            data = json.dumps(payload).encode()
+            headers['Content-Type'] = 'application/json'
+
+        started = time.perf_counter()
+        try:
+            with self.opener.open(Request(self.base_url + path, data=data, headers=headers), timeout=60) as response:
+                response.read()
+                status = response.status
+        except HTTPError as e:
+            # 3xx lands here because redirects are not followed
+            e.read()
+            status = e.code
+        except (URLError, OSError):
+            status = 'error'
+        self.recorder.record(route, (time.perf_counter() - started) * 1000, status)
+        return status
+
+    def login(self, username, user_type):
+        self.request('POST /login', '/login',
+                     form={'username': username, 'password': BENCH_PASSWORD, 'user_type': user_type})
+
+    def logout(self):
+        self.request('GET /logout', '/logout')
+
+
+def sample_flights(database, count, seed=1):
+    """Upcoming flights with their airports and cities, to build journey requests from."""
+    db = connect(database)
+    cursor = db.cursor(dictionary=True)
+    cursor.execute("""
+        SELECT f.airline_name, f.flight_num, f.departure_airport, f.arrival_airport, f.departure_time,
+               f.arrival_time, dep.airport_city AS source_city, arr.airport_city AS destination_city
+        FROM flight f
+        JOIN airport dep ON f.departure_airport = dep.airport_name
+        JOIN airport arr ON f.arrival_airport = arr.airport_name
+        WHERE f.departure_time >= NOW()
+        ORDER BY RAND(%s) LIMIT %s
+    """, (seed, count))
+    flights = cursor.fetchall()
+    cursor.execute("SELECT COUNT(*) AS n FROM customer")
+    customers = cursor.fetchone()['n']
+    cursor.execute("SELECT COUNT(*) AS n FROM booking_agent")
+    agents = cursor.fetchone()['n']
+    cursor.execute("SELECT COUNT(*) AS n FROM airline")
+    airlines = cursor.fetchone()['n']
+    cursor.close()
+    db.close()
+    if not flights:
+        raise SystemExit(f"No upcoming flights in {database!r}; load data with benchmarks.datagen first")
+    return flights, {'customers': customers, 'agents': agents, 'airlines': airlines}
+
+
+def customer_journey(user, rng, flights, sizes):
+    flight = rng.choice(flights)
+    user.login(customer_email(rng.randrange(sizes['customers'])), 'customer')
+    user.request('POST /search_flights_customer', '/search_flights_customer', form={
+        'source': flight['departure_airport'], 'destination': flight['arrival_airport'],
+        'date': flight['departure_time'].strftime('%Y-%m-%d'),
+    })
+    user.request('GET /purchase_ticket/<airline>/<num>',
+                 f"/purchase_ticket/{flight['airline_name']}/{flight['flight_num']}")
+    user.request('GET /my_flights', '/my_flights')
+    user.logout()
+
+
+def agent_journey(user, rng, flights, sizes, group_size=5):
+    agent = rng.randrange(sizes['agents'])
+    # datagen assigns agent i to airline i % airlines; agents only see their airline's flights
+    airline = airline_name(agent % sizes['airlines'])
+    flight = rng.choice([flight for flight in flights if flight['airline_name'] == airline] or flights)
+    user.login(agent_email(agent), 'booking_agent')
+    user.request('POST /search_flights_agent', '/search_flights_agent', form={
+        'source': flight['departure_airport'], 'destination': flight['arrival_airport'],
+        'date': flight['departure_time'].strftime('%Y-%m-%d'),
+    })
+    user.request('POST /api/purchase_tickets_agent', '/api/purchase_tickets_agent', payload={'lines': [
+        {'customer_email': customer_email(rng.randrange(sizes['customers'])),
+         'airline_name': flight['airline_name'], 'flight_num': flight['flight_num'], 'count': 1}
+        for _ in range(group_size)
+    ]})
+    user.request('GET /view_commission', '/view_commission')
+    user.request('GET /view_top_customers', '/view_top_customers')
+    user.logout()
+
+
+STAFF_PAGES = ('/view_reports', '/view_top_destinations', '/view_booking_agents',
+               '/view_frequent_customers', '/view_my_flights_staff')
+
+
+def staff_journey(user, rng, flights, sizes):
+    # Staff member 0 of each airline is an Admin
+    user.login(staff_username(rng.randrange(sizes['airlines']), 0), 'airline_staff')
+    for page in STAFF_PAGES:
+        user.request(f"GET {page}", page)
+    user.logout()
+
+
+def public_journey(user, rng, flights, sizes):
+    flight = rng.choice(flights)
+    day = flight['departure_time'].strftime('%Y-%m-%d')
+    user.request('GET /search_flights', '/search_flights?' + urlencode({
+        'source_city': flight['source_city'], 'destination_city': flight['destination_city'], 'date': day}))
+    user.request('GET /flight_status', '/flight_status?' + urlencode({'flight_num': flight['flight_num'],
+                                                                       'date': day}))
+
+
+JOURNEYS = {
+    'customer': customer_journey,
+    'agent': agent_journey,
+    'staff': staff_journey,
+    'public': public_journey,
+}
+
+
+def parse_mix(text):
+    mix = {}
+    for part in text.split(','):
+        name, _, weight = part.partition('=')
+        if name not in JOURNEYS:
+            raise argparse.ArgumentTypeError(f"unknown journey {name!r}; choose from {', '.join(JOURNEYS)}")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+def run(base_url, users, duration, warmup, mix, flights, sizes, seed):
+    recorder = Recorder()
+    deadline = time.perf_counter() + warmup + duration
+    names, weights = list(mix), list(mix.values())
+
+    def user_loop(index):
+        rng = random.Random(seed * 100_003 + index)
+        user = VirtualUser(base_url, recorder)
+        while time.perf_counter() < deadline:
+            name = rng.choices(names, weights)[0]
+            JOURNEYS[name](user, rng, flights, sizes)
+            recorder.journey_done(name)
+
+    threads = [threading.Thread(target=user_loop, args=(i,), daemon=True) for i in range(users)]
+    for thread in threads:
+        thread.start()
+    time.sleep(warmup)
+    recorder.measuring = True
+    measured_from = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - measured_from
+
+    routes = {}
+    for route in sorted(recorder.statuses):
+        latencies = recorder.latencies[route]
+        routes[route] = {
+            'requests': sum(recorder.statuses[route].values()),
+            'requests_per_s': round(len(latencies) / elapsed, 2),
+            'statuses': {str(status): count for status, count in recorder.statuses[route].items()},
+            'latency': summarize(latencies) if latencies else None,
+        }
+    return {
+        'elapsed_s': round(elapsed, 1),
+        'journeys_per_s': {name: round(count / elapsed, 2) for name, count in recorder.journeys.items()},
+        'routes': routes,
+    }
+
+
+def compare(report, previous):
+    print(f"\n{'route':<42} {'req/s':>16} {'p50 ms':>20} {'p99 ms':>20}")
+    for route, result in report['routes'].items():
+        before = previous.get('routes', {}).get(route)
+        if not before or not result['latency'] or not before['latency']:
+            continue
+
+        def cell(new, old):
+            change = (new - old) / old * 100 if old else 0
+            return f"{old:>7.1f}->{new:<7.1f}{change:+5.0f}%"
+
+        print(f"{route:<42} {cell(result['requests_per_s'], before['requests_per_s']):>16} "
+              f"{cell(result['latency']['p50_ms'], before['latency']['p50_ms']):>20} "
+              f"{cell(result['latency']['p99_ms'], before['latency']['p99_ms']):>20}")
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', default='http://127.0.0.1:5000')
+    parser.add_argument('--users', type=int, default=20, help="concurrent virtual users")
+    parser.add_argument('--duration', type=float, default=60, help="measured seconds")
+    parser.add_argument('--warmup', type=float, default=10, help="unmeasured seconds before measuring")
+    parser.add_argument('--mix', type=parse_mix, default=parse_mix('customer=4,agent=1,staff=1,public=10'))
+    parser.add_argument('--flights', type=int, default=5000, help="upcoming flights sampled for requests")
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--database', default=DEFAULT_DATABASE, help="database the app is serving")
+    parser.add_argument('--json', help="write the report to this file")
+    parser.add_argument('--compare', help="earlier report to compare against")
+    args = parser.parse_args()
+
+    flights, sizes = sample_flights(args.database, args.flights, args.seed)
+    report = {
+        'started_at': datetime.now().isoformat(timespec='seconds'),
+        'git_revision': git_revision(),
+        'settings': {'url': args.url, 'users': args.users, 'duration_s': args.duration, 'mix': args.mix,
+                     'seed': args.seed, 'database': args.database, 'dataset': sizes},
+        **run(args.url, args.users, args.duration, args.warmup, args.mix, flights, sizes, args.seed),
+    }
+
+    for route, result in report['routes'].items():
+        latency = result['latency'] or {'p50_ms': float('nan'), 'p95_ms': float('nan'), 'p99_ms': float('nan')}
+        print(f"{route:<42} {result['requests_per_s']:>8.1f} req/s  p50 {latency['p50_ms']:>8.1f}  "
+              f"p95 {latency['p95_ms']:>8.1f}  p99 {latency['p99_ms']:>8.1f} ms  {result['statuses']}")
+    print("journeys/s: " + ', '.join(f"{name} {rate}" for name, rate in report['journeys_per_s'].items()))
+
+    if args.compare:
+        compare(report, json.loads(Path(args.compare).read_text()))
+    if args.json:
+        Path(args.json).write_text(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+"""Password hashing cost: time auth.hash_password for several scrypt N values
+(and the legacy MD5 digest) to pick AUTH_SCRYPT_N for the login throughput
+we need. No database is used.
+
+    python -m benchmarks.kdf_bench --n 8192 16384 32768 65536 --threads 4
+"""
+import argparse
+import hashlib
+import json
+import threading
+import time
+from pathlib import Path
+
+import auth
+from benchmarks.common import Timer, summarize
+
+
+def time_hashes(make_hash, repeat):
+    samples = []
+    for i in range(repeat):
+        with Timer(samples):
+            make_hash(f"benchmark-password-{i}")
+    return summarize(samples)
+
+
+def parallel_throughput(make_hash, threads, seconds):
+    # hashlib.scrypt releases the GIL, so concurrent logins can use several cores
+    counts = [0] * threads
+    deadline = time.perf_counter() + seconds
+
+    def worker(index):
+        while time.perf_counter() < deadline:
+            make_hash("benchmark-password")
+            counts[index] += 1
+
+    workers = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    return round(sum(counts) / seconds, 1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--n', type=int, nargs='+', default=[2 ** 13, 2 ** 14, 2 ** 15, 2 ** 16])
+    parser.add_argument('--r', type=int, default=auth.KDF_DEFAULTS['AUTH_SCRYPT_R'])
+    parser.add_argument('--p', type=int, default=auth.KDF_DEFAULTS['AUTH_SCRYPT_P'])
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--threads', type=int, default=4)
+    parser.add_argument('--seconds', type=float, default=3, help="duration of each parallel run")
+    parser.add_argument('--json', help="also write the results to this file")
+    args = parser.parse_args()
+
+    candidates = {'md5 (legacy)': lambda password: hashlib.md5(password.encode()).hexdigest()}
+    for n in args.n:
+        candidates[f"scrypt N={n} r={args.r} p={args.p}"] = (
+            lambda password, n=n: auth.hash_password(password, n=n, r=args.r, p=args.p))
+
+    report = {}
+    for name, make_hash in candidates.items():
+        latency = time_hashes(make_hash, args.repeat)
+        report[name] = {
+            'latency': latency,
+            'hashes_per_s': parallel_throughput(make_hash, args.threads, args.seconds),
+            'threads': args.threads,
+        }
+        print(f"{name:>28}  p50 {latency['p50_ms']:>9.3f} ms  p99 {latency['p99_ms']:>9.3f} ms  "
+              f"{report[name]['hashes_per_s']:>10.1f} logins/s on {args.threads} threads")
+
+    if args.json:
+        Path(args.json).write_text(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
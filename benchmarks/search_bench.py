@@ -0,0 +1,208 @@
+"""Flight search benchmark: query plans and p50/p99 latency before and after
+the composite indexes in migrations/001_flight_search_indexes.sql.
+
+Loads a synthetic flight table into a scratch database (BENCH_DB, default
+flight_bench) on the MySQL server from config.py, then times the original
+search queries against the flight_search.py rewrites with and without the
+indexes.
+
+    python -m benchmarks.search_bench --flights 1000000 --repeat 200
+"""
+import argparse
+import json
+import random
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import flight_search
+from benchmarks.common import DEFAULT_DATABASE, migration_statements, scratch_database, summarize
+
+
+MIGRATION = '001_flight_search_indexes.sql'
+
+# The queries as app.py ran them before the search layer
+LEGACY_SEARCH = """
+    SELECT f.airline_name, f.flight_num, f.departure_airport, f.departure_time,
+           f.arrival_airport, f.arrival_time, f.status, f.price
+    FROM flight f
+    JOIN airport dep_airport ON f.departure_airport = dep_airport.airport_name
+    JOIN airport arr_airport ON f.arrival_airport = arr_airport.airport_name
+    WHERE 1=1 AND dep_airport.airport_city = %s AND arr_airport.airport_city = %s
+    AND DATE(f.departure_time) = %s ORDER BY f.departure_time
+"""
+LEGACY_STATUS = """
+    SELECT f.airline_name, f.flight_num, f.departure_airport, f.departure_time,
+           f.arrival_airport, f.arrival_time, f.status, f.price
+    FROM flight f
+    WHERE f.flight_num = %s
+      AND (DATE(f.departure_time) = %s OR DATE(f.arrival_time) = %s)
+"""
+LEGACY_AGENT_SEARCH = """
+    SELECT * FROM flight
+    WHERE airline_name = %s
+    AND departure_airport LIKE %s
+    AND arrival_airport LIKE %s
+    AND DATE(departure_time) = %s
+"""
+
+CITIES = 120
+AIRPORTS_PER_CITY = 3
+AIRLINES = 20
+START = datetime(2024, 1, 1)
+
+
+def load_data(db, flights, batch=5000, seed=1):
+    rng = random.Random(seed)
+    cursor = db.cursor()
+    cursor.execute("SELECT COUNT(*) FROM flight")
+    if cursor.fetchone()[0] >= flights:
+        print(f"Reusing existing {flights} flights")
+        cursor.close()
+        return
+
+    cursor.execute("TRUNCATE TABLE flight")
+    cursor.execute("TRUNCATE TABLE airport")
+    airports = [(f"APT{c:03d}{a}", f"City{c:03d}") for c in range(CITIES) for a in range(AIRPORTS_PER_CITY)]
+    cursor.executemany("INSERT INTO airport (airport_name, airport_city) VALUES (%s, %s)", airports)
+
+    rows = []
+    started = time.perf_counter()
+    for i in range(flights):
+        dep, arr = rng.sample(airports, 2)
+        departure = START + timedelta(minutes=rng.randrange(365 * 24 * 60))
+        rows.append((
+            f"Airline{i % AIRLINES:02d}", i // AIRLINES + 1, dep[0], departure,
+            arr[0], departure + timedelta(minutes=rng.randrange(60, 900)),
+            rng.randrange(50, 2000), 'Upcoming', rng.randrange(1, 500),
+        ))
+        if len(rows) == batch:
+            cursor.executemany("""
+                INSERT INTO flight (airline_name, flight_num, departure_airport, departure_time,
+                                    arrival_airport, arrival_time, price, status, airplane_id)
+                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
+            """, rows)
+            db.commit()
+            rows = []
+    if rows:
+        cursor.executemany("""
+            INSERT INTO flight (airline_name, flight_num, departure_airport, departure_time,
+                                arrival_airport, arrival_time, price, status, airplane_id)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
+        """, rows)
+        db.commit()
+    cursor.execute("ANALYZE TABLE flight")
+    cursor.fetchall()
+    cursor.close()
+    print(f"Loaded {flights} flights in {time.perf_counter() - started:.1f}s")
+
+
+def set_indexes(db, enabled):
+    cursor = db.cursor()
+    cursor.execute("SHOW INDEX FROM flight")
+    existing = {row[2] for row in cursor.fetchall()}
+    for statement in migration_statements(MIGRATION):
+        name = statement.split()[2]
+        if enabled and name not in existing:
+            cursor.execute(statement)
+        elif not enabled and name in existing:
+            cursor.execute(f"DROP INDEX {name} ON flight")
+    cursor.execute("ANALYZE TABLE flight")
+    cursor.fetchall()
+    cursor.close()
+
+
+def explain(db, query, params):
+    cursor = db.cursor(dictionary=True)
+    cursor.execute("EXPLAIN " + query, params)
+    plan = [{key: row[key] for key in ('table', 'type', 'key', 'rows', 'Extra')} for row in cursor.fetchall()]
+    cursor.close()
+    return plan
+
+
+def time_query(db, cases):
+    samples = []
+    cursor = db.cursor()
+    for query, params in cases:
+        started = time.perf_counter()
+        cursor.execute(query, params)
+        cursor.fetchall()
+        samples.append((time.perf_counter() - started) * 1000)
+    cursor.close()
+    return summarize(samples)
+
+
+def build_cases(db, repeat, flights, seed=2):
+    rng = random.Random(seed)
+    cases = {'search': {'legacy': [], 'rewritten': []},
+             'status': {'legacy': [], 'rewritten': []},
+             'agent_search': {'legacy': [], 'rewritten': []}}
+    for _ in range(repeat):
+        source, destination = rng.sample(range(CITIES), 2)
+        day = (START + timedelta(days=rng.randrange(365))).strftime("%Y-%m-%d")
+        source_city, destination_city = f"City{source:03d}", f"City{destination:03d}"
+        cases['search']['legacy'].append((LEGACY_SEARCH, (source_city, destination_city, day)))
+        cases['search']['rewritten'].append(flight_search.search_query(db, source_city, destination_city, day))
+
+        flight_num = rng.randrange(1, flights // AIRLINES + 1)
+        cases['status']['legacy'].append((LEGACY_STATUS, (flight_num, day, day)))
+        cases['status']['rewritten'].append(flight_search.status_query(flight_num, day))
+
+        airline = f"Airline{rng.randrange(AIRLINES):02d}"
+        source_airport = f"APT{source:03d}"
+        destination_airport = f"APT{destination:03d}"
+        cases['agent_search']['legacy'].append(
+            (LEGACY_AGENT_SEARCH, (airline, f"%{source_airport}%", f"%{destination_airport}%", day)))
+        cases['agent_search']['rewritten'].append(flight_search.airport_search_query(
+            db, source_airport, destination_airport, day, airline_name=airline, same_day=True))
+    return cases
+
+
+def run(db, cases):
+    results = {}
+    for name, variants in cases.items():
+        results[name] = {}
+        for variant, variant_cases in variants.items():
+            results[name][variant] = {
+                'plan': explain(db, *variant_cases[0]),
+                **time_query(db, variant_cases),
+            }
+    return results
+
+
+def print_report(report):
+    for phase, results in report['phases'].items():
+        print(f"\n== {phase}")
+        for name, variants in results.items():
+            for variant, result in variants.items():
+                plan = ', '.join(f"{step['table']}:{step['type']}/{step['key']}" for step in result['plan'])
+                print(f"{name:>13} {variant:>9}  p50 {result['p50_ms']:>9.3f} ms  "
+                      f"p99 {result['p99_ms']:>9.3f} ms  plan {plan}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--flights', type=int, default=1_000_000)
+    parser.add_argument('--repeat', type=int, default=200)
+    parser.add_argument('--database', default=DEFAULT_DATABASE)
+    parser.add_argument('--json', help="also write the results to this file")
+    args = parser.parse_args()
+
+    db = scratch_database(args.database)
+    load_data(db, args.flights)
+    cases = build_cases(db, args.repeat, args.flights)
+
+    report = {'flights': args.flights, 'repeat': args.repeat, 'phases': {}}
+    set_indexes(db, enabled=False)
+    report['phases']['before_indexes'] = run(db, cases)
+    set_indexes(db, enabled=True)
+    report['phases']['after_indexes'] = run(db, cases)
+    db.close()
+
+    print_report(report)
+    if args.json:
+        Path(args.json).write_text(json.dumps(report, indent=2, default=str))
+
+
+if __name__ == '__main__':
+    main()
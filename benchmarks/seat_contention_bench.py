@@ -0,0 +1,139 @@
+"""Seat inventory stress test: many parallel buyers race for the seats on one
+flight through bulk_purchase.purchase_tickets. Checks that exactly the
+flight's capacity was sold (no oversell, no lost seats) and reports purchase
+throughput and latency.
+
+    python -m benchmarks.seat_contention_bench --seats 200 --buyers 64
+"""
+import argparse
+import json
+import sys
+import threading
+import time
+from pathlib import Path
+
+from mysql.connector import Error
+
+import bulk_purchase
+import seat_inventory
+from benchmarks.common import DEFAULT_DATABASE, Timer, apply_migration, connect, scratch_database, summarize
+
+
+AIRLINE = 'Contention Air'
+AIRPLANE_ID = 1
+
+
+def prepare(db, flight_num, seats):
+    apply_migration(db, '002_sales_rollups.sql')
+    apply_migration(db, '003_flight_seat_inventory.sql')
+    cursor = db.cursor()
+    cursor.execute("""
+        INSERT INTO airplane (airline_name, airplane_id, seats) VALUES (%s, %s, %s)
+        ON DUPLICATE KEY UPDATE seats = VALUES(seats)
+    """, (AIRLINE, AIRPLANE_ID, seats))
+    cursor.execute("DELETE FROM flight WHERE airline_name = %s AND flight_num = %s", (AIRLINE, flight_num))
+    cursor.execute("DELETE FROM flight_seat_inventory WHERE airline_name = %s AND flight_num = %s",
+                   (AIRLINE, flight_num))
+    cursor.execute("DELETE FROM ticket WHERE airline_name = %s AND flight_num = %s", (AIRLINE, flight_num))
+    cursor.execute("""
+        INSERT INTO flight (airline_name, flight_num, departure_airport, departure_time,
+                            arrival_airport, arrival_time, price, status, airplane_id)
+        VALUES (%s, %s, 'STRESS1', '2030-01-01 08:00', 'STRESS2', '2030-01-01 12:00', 150, 'Upcoming', %s)
+    """, (AIRLINE, flight_num, AIRPLANE_ID))
+    seat_inventory.create(cursor, AIRLINE, flight_num)
+    db.commit()
+    cursor.close()
+
+
+def buyer(database, flight_num, buyer_id, tickets_per_purchase, results, latencies, lock):
+    db = connect(database)
+    sold = rejected = errors = 0
+    samples = []
+    purchase = 0
+    while True:
+        purchase += 1
+        line = (f"buyer{buyer_id}-{purchase}@stress.test", AIRLINE, flight_num, tickets_per_purchase)
+        try:
+            with Timer(samples):
+                bulk_purchase.purchase_tickets(db, [line])
+            sold += tickets_per_purchase
+        except seat_inventory.SeatsUnavailable:
+            rejected += 1
+            break
+        except Error:
+            # Lock wait timeouts and deadlocks are retried like a real client would
+            errors += 1
+            if errors > 100:
+                break
+    db.close()
+    with lock:
+        results['sold'] += sold
+        results['rejected'] += rejected
+        results['errors'] += errors
+        latencies.extend(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--seats', type=int, default=200)
+    parser.add_argument('--buyers', type=int, default=64)
+    parser.add_argument('--tickets-per-purchase', type=int, default=1)
+    parser.add_argument('--flight-num', type=int, default=9001)
+    parser.add_argument('--database', default=DEFAULT_DATABASE)
+    parser.add_argument('--json', help="also write the results to this file")
+    args = parser.parse_args()
+
+    db = scratch_database(args.database)
+    prepare(db, args.flight_num, args.seats)
+
+    results = {'sold': 0, 'rejected': 0, 'errors': 0}
+    latencies = []
+    lock = threading.Lock()
+    threads = [
+        threading.Thread(target=buyer, args=(args.database, args.flight_num, i,
+                                             args.tickets_per_purchase, results, latencies, lock))
+        for i in range(args.buyers)
+    ]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    cursor = db.cursor()
+    cursor.execute("SELECT seats_total, seats_sold FROM flight_seat_inventory WHERE airline_name = %s "
+                   "AND flight_num = %s", (AIRLINE, args.flight_num))
+    seats_total, seats_sold = cursor.fetchone()
+    cursor.execute("SELECT COUNT(*) FROM ticket WHERE airline_name = %s AND flight_num = %s",
+                   (AIRLINE, args.flight_num))
+    tickets = cursor.fetchone()[0]
+    cursor.close()
+    db.close()
+
+    # A purchase bigger than the remaining seats is rejected, so with more than one
+    # ticket per purchase a few seats may legitimately stay unsold
+    expected = args.seats - args.seats % args.tickets_per_purchase
+    report = {
+        'seats': seats_total,
+        'buyers': args.buyers,
+        'sold': results['sold'],
+        'seats_sold_counter': seats_sold,
+        'tickets_in_db': tickets,
+        'rejected_attempts': results['rejected'],
+        'retried_errors': results['errors'],
+        'elapsed_s': round(elapsed, 3),
+        'purchases_per_s': round(len(latencies) / elapsed, 1),
+        'latency': summarize(latencies) if latencies else None,
+        'ok': results['sold'] == seats_sold == tickets == expected,
+    }
+    print(json.dumps(report, indent=2))
+    if args.json:
+        Path(args.json).write_text(json.dumps(report, indent=2))
+    if not report['ok']:
+        print("Seat counts disagree: oversell or lost seats", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
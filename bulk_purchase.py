@@ -0,0 +1,178 @@
+from collections import Counter
+from datetime import datetime
+
+import commission_ledger
+import sales_rollup
+import seat_inventory
+import spending_ledger
+from customer_picker import picker
+from leaderboard import leaderboards
+
+
+# Rows per multi-row INSERT; keeps each statement well under max_allowed_packet
+BATCH_SIZE = 1000
+
+# Server settings read once per process (see _insert_tickets)
+_server_settings = {}
+
+
+class PurchaseError(ValueError):
+    """A purchase request that cannot be fulfilled as asked."""
+
+
+def parse_lines(payload, max_tickets):
+    """Validate a JSON bulk purchase body into (customer, airline, flight_num, count) tuples."""
+    if not isinstance(payload, dict) or not isinstance(payload.get('lines'), list) or not payload['lines']:
+        raise PurchaseError("Expected a JSON object with a non-empty 'lines' list")
+
+    lines = []
+    for number, line in enumerate(payload['lines'], start=1):
+        try:
+            customer_email = line['customer_email']
+            airline_name = line['airline_name']
+            flight_num = int(line['flight_num'])
+            count = int(line.get('count', 1))
+        except (KeyError, TypeError, ValueError):
+            raise PurchaseError(f"Line {number}: customer_email, airline_name and an integer "
+                                f"flight_num are required, and count must be an integer")
+        if count < 1:
+            raise PurchaseError(f"Line {number}: count must be at least 1")
+        lines.append((customer_email, airline_name, flight_num, count))
+
+    total = sum(line[3] for line in lines)
+    if total > max_tickets:
+        raise PurchaseError(f"At most {max_tickets} tickets can be bought in one request, got {total}")
+    return lines
+
+
+def _id_increment(cursor):
+    # auto_increment_increment is a server setting, so it is read once per process
+    if 'auto_increment_increment' not in _server_settings:
+        cursor.execute("SELECT @@auto_increment_increment")
+        _server_settings['auto_increment_increment'] = cursor.fetchone()[0]
+        cursor.fetchall()
+    return _server_settings['auto_increment_increment']
+
+
+def _insert_tickets(cursor, flights):
+    """Insert one ticket per (airline, flight_num) and return the new ticket ids in order.
+
+    A multi-row INSERT is a "simple insert" for InnoDB, which reserves its
+    AUTO_INCREMENT values as one block, so with auto_increment_increment = 1
+    the ids are lastrowid .. lastrowid + n - 1. Servers that step ids by more
+    (Galera and other multi-primary setups) get one INSERT per ticket instead.
+    The block also assumes nothing bulk-inserts into ticket at the same time
+    (LOAD DATA, INSERT ... SELECT) under innodb_autoinc_lock_mode = 2, where
+    such statements may take interleaved ids.
+    """
+    if _id_increment(cursor) != 1:
+        ticket_ids = []
+        for flight in flights:
+            cursor.execute("INSERT INTO ticket (airline_name, flight_num) VALUES (%s, %s)", flight)
+            ticket_ids.append(cursor.lastrowid)
+        return ticket_ids
+
+    ticket_ids = []
+    for offset in range(0, len(flights), BATCH_SIZE):
+        batch = flights[offset:offset + BATCH_SIZE]
+        cursor.execute(
+            "INSERT INTO ticket (airline_name, flight_num) VALUES " + ", ".join(["(%s, %s)"] * len(batch)),
+            tuple(value for flight in batch for value in flight),
+        )
+        if cursor.rowcount != len(batch):
+            raise PurchaseError(f"Expected {len(batch)} tickets to be inserted, got {cursor.rowcount}")
+        first_id = cursor.lastrowid
+        ticket_ids.extend(range(first_id, first_id + len(batch)))
+    return ticket_ids
+
+
+def _flight_details(cursor, flights):
+    """{(airline_name, flight_num): (price, arrival_airport, departure date)} for the flights."""
+    flights = sorted(flights)
+    cursor.execute(
+        "SELECT airline_name, flight_num, price, arrival_airport, DATE(departure_time) FROM flight "
+        "WHERE (airline_name, flight_num) IN (" + ", ".join(["(%s, %s)"] * len(flights)) + ")",
+        tuple(value for flight in flights for value in flight),
+    )
+    return {(row[0], row[1]): row[2:] for row in cursor.fetchall()}
+
+
+def purchase_tickets(db, lines, booking_agent_email=None):
+    """Buy all tickets for lines of (customer, airline, flight_num, count) in one transaction.
+
+    Returns the ticket ids, in line order. Raises PurchaseError if there is
+    nothing to buy, FlightNotFound for a flight that does not exist and
+    SeatsUnavailable if any flight lacks the seats; nothing is written if any
+    part fails.
+    """
+    if not lines:
+        raise PurchaseError("No tickets to purchase")
+    purchase_date = datetime.now().date()
+    flights = [(airline_name, flight_num)
+               for _, airline_name, flight_num, count in lines
+               for _ in range(count)]
+    customers = [customer_email
+                 for customer_email, _, _, count in lines
+                 for _ in range(count)]
+    if not flights:
+        raise PurchaseError("No tickets to purchase")
+
+    seats_by_flight = Counter(flights)
+
+    cursor = db.cursor()
+    try:
+        # Take the seats first, in a fixed order so concurrent group bookings lock
+        # inventory rows in the same sequence and cannot deadlock each other
+        for (airline_name, flight_num), seats in sorted(seats_by_flight.items()):
+            seat_inventory.reserve(cursor, airline_name, flight_num, seats)
+
+        ticket_ids = _insert_tickets(cursor, flights)
+
+        purchases = [(ticket_id, customer_email, booking_agent_email, purchase_date)
+                     for ticket_id, customer_email in zip(ticket_ids, customers)]
+        for offset in range(0, len(purchases), BATCH_SIZE):
+            # executemany rewrites a plain INSERT ... VALUES into one multi-row statement
+            cursor.executemany("""
+                INSERT INTO purchases (ticket_id, customer_email, booking_agent_email, purchase_date)
+                VALUES (%s, %s, %s, %s)
+            """, purchases[offset:offset + BATCH_SIZE])
+
+        details = _flight_details(cursor, seats_by_flight)
+        prices = {flight: detail[0] for flight, detail in details.items()}
+        commission = {}
+        if booking_agent_email:
+            commission = commission_ledger.record_sales(
+                cursor, booking_agent_email,
+                [(ticket_id, customer_email, airline_name, flight_num)
+                 for ticket_id, customer_email, (airline_name, flight_num) in zip(ticket_ids, customers, flights)],
+                prices, purchase_date)
+        commission_by_flight = Counter()
+        for ticket_id, flight in zip(ticket_ids, flights):
+            commission_by_flight[flight] += commission.get(ticket_id, 0)
+
+        # One rollup update per flight rather than per ticket
+        for flight, tickets in sorted(seats_by_flight.items()):
+            if flight in details:
+                price, arrival_airport, _ = details[flight]
+                sales_rollup.record_purchase(cursor, flight[0], price, arrival_airport, tickets, purchase_date,
+                                             booking_agent_email, commission_by_flight[flight])
+        sales_rollup.record_customer_flights(cursor, Counter(
+            (flight[0], details[flight][2], customer_email)
+            for customer_email, flight in zip(customers, flights) if flight in details))
+        spending_ledger.record_purchases(cursor, lines, prices, purchase_date)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        cursor.close()
+
+    for airline_name, flight_num in seats_by_flight:
+        seat_inventory.availability.invalidate(airline_name, flight_num)
+    leaderboards.record_purchase(purchase_date, booking_agent_email, [
+        (flight[0], details[flight][1], details[flight][2], customer_email, commission.get(ticket_id, 0))
+        for ticket_id, customer_email, flight in zip(ticket_ids, customers, flights) if flight in details
+    ])
+    if booking_agent_email:
+        picker.record_purchase(booking_agent_email, Counter(customers), purchase_date)
+    return ticket_ids
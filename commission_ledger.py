@@ -0,0 +1,189 @@
+import logging
+from collections import defaultdict
+from datetime import timedelta
+from decimal import ROUND_HALF_UP, Decimal
+
+from sales_rollup import date_filter
+
+
+# Commission settings read from config.py, with defaults:
+#   AGENT_COMMISSION_RATE   share of the ticket price a booking agent earns on a sale (0.10)
+DEFAULT_RATE = Decimal('0.10')
+_settings = {'rate': DEFAULT_RATE}
+
+# Tables maintained by this module; see migrations/006_agent_commission_ledger.sql
+LEDGER_TABLES = ('agent_commission_ledger', 'daily_agent_commission', 'daily_agent_customer_commission')
+
+CENT = Decimal('0.01')
+
+
+def configure(config):
+    _settings['rate'] = Decimal(str(config.get('AGENT_COMMISSION_RATE', DEFAULT_RATE)))
+
+
+def commission_rate():
+    return _settings['rate']
+
+
+def record_sales(cursor, booking_agent_email, sales, prices, sale_date):
+    """Record an agent's sales of (ticket_id, customer_email, airline_name, flight_num).
+
+    Each ticket is written to the ledger with the rate in force now, so a
+    later rate change does not rewrite past commission. Runs on the caller's
+    cursor inside the purchase transaction. Returns {ticket_id: commission}.
+    """
+    rate = commission_rate()
+    rows = []
+    by_customer = defaultdict(lambda: [0, Decimal(0), Decimal(0)])
+    by_ticket = {}
+    for ticket_id, customer_email, airline_name, flight_num in sales:
+        price = prices.get((airline_name, flight_num))
+        if price is None:
+            continue
+        price = Decimal(price)
+        commission = (price * rate).quantize(CENT, ROUND_HALF_UP)
+        rows.append((ticket_id, booking_agent_email, customer_email, airline_name, flight_num,
+                     sale_date, price, rate, commission))
+        totals = by_customer[customer_email]
+        totals[0] += 1
+        totals[1] += price
+        totals[2] += commission
+        by_ticket[ticket_id] = commission
+    if not rows:
+        return by_ticket
+
+    for offset in range(0, len(rows), 1000):
+        cursor.executemany("""
+            INSERT INTO agent_commission_ledger (ticket_id, booking_agent_email, customer_email, airline_name,
+                                                 flight_num, sale_date, price, commission_rate, commission)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
+        """, rows[offset:offset + 1000])
+
+    # Customer rows in email order, so concurrent group bookings lock them in the same sequence
+    customer_rows = [(booking_agent_email, customer_email, sale_date, tickets, commission)
+                     for customer_email, (tickets, _, commission) in sorted(by_customer.items())]
+    cursor.execute(f"""
+        INSERT INTO daily_agent_customer_commission (booking_agent_email, customer_email, sale_date,
+                                                     tickets, commission)
+        VALUES {", ".join(["(%s, %s, %s, %s, %s)"] * len(customer_rows))}
+        ON DUPLICATE KEY UPDATE
+            tickets = tickets + VALUES(tickets),
+            commission = commission + VALUES(commission)
+    """, tuple(value for row in customer_rows for value in row))
+
+    tickets = sum(totals[0] for totals in by_customer.values())
+    total_sales = sum(totals[1] for totals in by_customer.values())
+    commission = sum(totals[2] for totals in by_customer.values())
+    # Sales are always recorded for today, the agent's latest day, so the running
+    # totals of a new day's row start from the agent's previous row
+    cum_tickets, cum_commission = _running_totals(cursor, booking_agent_email, sale_date - timedelta(days=1))
+    cursor.execute("""
+        INSERT INTO daily_agent_commission (booking_agent_email, sale_date, tickets, total_sales, commission,
+                                            cum_tickets, cum_commission)
+        VALUES (%s, %s, %s, %s, %s, %s, %s)
+        ON DUPLICATE KEY UPDATE
+            tickets = tickets + VALUES(tickets),
+            total_sales = total_sales + VALUES(total_sales),
+            commission = commission + VALUES(commission),
+            cum_tickets = cum_tickets + VALUES(tickets),
+            cum_commission = cum_commission + VALUES(commission)
+    """, (booking_agent_email, sale_date, tickets, total_sales, commission,
+          cum_tickets + tickets, cum_commission + commission))
+    return by_ticket
+
+
+def _running_totals(cursor, booking_agent_email, day):
+    # Tickets and commission from the agent's first sale up to and including day
+    cursor.execute("""
+        SELECT cum_tickets, cum_commission FROM daily_agent_commission
+        WHERE booking_agent_email = %s AND sale_date <= %s
+        ORDER BY sale_date DESC
+        LIMIT 1
+    """, (booking_agent_email, day))
+    row = cursor.fetchone()
+    cursor.fetchall()
+    return (row[0], row[1]) if row else (0, Decimal(0))
+
+
+def agent_summary(db, booking_agent_email, start, end):
+    """Commission, average commission per ticket and tickets sold in [start, end].
+
+    Two index lookups on the running totals, however long the range.
+    """
+    cursor = db.cursor()
+    try:
+        end_tickets, end_commission = _running_totals(cursor, booking_agent_email, end)
+        start_tickets, start_commission = _running_totals(cursor, booking_agent_email,
+                                                          start - timedelta(days=1))
+    finally:
+        cursor.close()
+    tickets = end_tickets - start_tickets
+    commission = end_commission - start_commission
+    return {
+        'total_commission': commission,
+        'avg_commission_per_ticket': (commission / tickets).quantize(CENT, ROUND_HALF_UP) if tickets else 0,
+        'total_tickets_sold': tickets,
+    }
+
+
+def rebuild(db, start=None, end=None):
+    """Fill in ledger rows for agent sales made before the ledger existed, then
+    recompute the daily aggregates and running totals, optionally only from
+    start to end. Back-filled sales use the current rate.
+    """
+    rate = commission_rate()
+
+    cursor = db.cursor()
+    try:
+        clause, params = date_filter('p.purchase_date', start, end)
+        cursor.execute(f"""
+            INSERT IGNORE INTO agent_commission_ledger (ticket_id, booking_agent_email, customer_email,
+                                                        airline_name, flight_num, sale_date, price,
+                                                        commission_rate, commission)
+            SELECT p.ticket_id, p.booking_agent_email, p.customer_email, t.airline_name, t.flight_num,
+                   p.purchase_date, f.price, %s, ROUND(f.price * %s, 2)
+            FROM purchases p
+            JOIN ticket t ON p.ticket_id = t.ticket_id
+            JOIN flight f ON t.airline_name = f.airline_name AND t.flight_num = f.flight_num
+            WHERE p.booking_agent_email IS NOT NULL{clause}
+        """, (rate, rate) + params)
+
+        clause, params = date_filter('sale_date', start, end)
+        for table in LEDGER_TABLES[1:]:
+            cursor.execute(f"DELETE FROM {table} WHERE 1=1{clause}", params)
+        cursor.execute(f"""
+            INSERT INTO daily_agent_commission (booking_agent_email, sale_date, tickets, total_sales, commission)
+            SELECT booking_agent_email, sale_date, COUNT(*), SUM(price), SUM(commission)
+            FROM agent_commission_ledger
+            WHERE 1=1{clause}
+            GROUP BY booking_agent_email, sale_date
+        """, params)
+        cursor.execute(f"""
+            INSERT INTO daily_agent_customer_commission (booking_agent_email, customer_email, sale_date,
+                                                         tickets, commission)
+            SELECT booking_agent_email, customer_email, sale_date, COUNT(*), SUM(commission)
+            FROM agent_commission_ledger
+            WHERE 1=1{clause}
+            GROUP BY booking_agent_email, customer_email, sale_date
+        """, params)
+
+        # Running totals shift for every day after the first rebuilt one
+        since, since_params = date_filter('d.sale_date', start, None)
+        cursor.execute(f"""
+            UPDATE daily_agent_commission d
+            JOIN (
+                SELECT booking_agent_email, sale_date,
+                       SUM(tickets) OVER w AS cum_tickets, SUM(commission) OVER w AS cum_commission
+                FROM daily_agent_commission
+                WINDOW w AS (PARTITION BY booking_agent_email ORDER BY sale_date)
+            ) running ON running.booking_agent_email = d.booking_agent_email AND running.sale_date = d.sale_date
+            SET d.cum_tickets = running.cum_tickets, d.cum_commission = running.cum_commission
+            WHERE 1=1{since}
+        """, since_params)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        cursor.close()
+    logging.info(f"Rebuilt the commission ledger for {start or 'the beginning'} to {end or 'today'}")
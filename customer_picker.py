@@ -0,0 +1,183 @@
+import threading
+import time
+from bisect import bisect_left
+from collections import OrderedDict
+
+import pagination
+
+
+# Customer lookup for the booking agent purchase form. Matches are customers
+# whose email starts with what the agent typed: first the agent's own
+# customers, most recent purchase first, then everyone else by email.
+
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 100
+
+
+def _like_prefix(prefix):
+    # LIKE pattern matching values that start with prefix, wildcards escaped
+    return prefix.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+
+
+class _Served:
+    __slots__ = ('loaded_at', 'ranked', 'sorted_emails', 'details')
+
+    def __init__(self, rows):
+        self.loaded_at = time.monotonic()
+        # {email: [last purchase date, tickets]}
+        self.details = {email: [last_purchase, tickets] for email, last_purchase, tickets in rows}
+        self._rank()
+
+    def _rank(self):
+        self.ranked = sorted(self.details, key=lambda email: (-self.details[email][0].toordinal(), email))
+        self.sorted_emails = sorted((email.casefold(), email) for email in self.details)
+
+    def record(self, customers, sale_date):
+        for customer_email, tickets in customers.items():
+            entry = self.details.setdefault(customer_email, [sale_date, 0])
+            entry[0] = max(entry[0], sale_date)
+            entry[1] += tickets
+        self._rank()
+
+    def matching(self, prefix):
+        """The agent's customers whose email starts with prefix, most recent first."""
+        if not prefix:
+            return self.ranked
+        position = bisect_left(self.sorted_emails, (prefix,))
+        matched = set()
+        for key, email in self.sorted_emails[position:]:
+            if not key.startswith(prefix):
+                break
+            matched.add(email)
+        return [email for email in self.ranked if email in matched]
+
+
+class CustomerPicker:
+    """Prefix search over customers for one booking agent, served customers first.
+
+    Each agent's customers, with their last purchase date and tickets bought,
+    are read once from purchases and kept in memory; purchases through this
+    process update them, and they are reloaded after `ttl` seconds for
+    purchases made elsewhere. Everyone else is read from the customer table's
+    primary key one page at a time, so a page costs the same however many
+    customers there are.
+    """
+
+    def __init__(self, ttl=60, max_agents=1000):
+        self.ttl = ttl
+        self.max_agents = max_agents
+        self._lock = threading.Lock()
+        self._agents = OrderedDict()
+
+    def configure(self, ttl=60, max_agents=1000):
+        self.ttl = ttl
+        self.max_agents = max_agents
+        with self._lock:
+            self._agents.clear()
+
+    def _served(self, db, booking_agent_email):
+        with self._lock:
+            served = self._agents.get(booking_agent_email)
+            if served is not None and time.monotonic() - served.loaded_at <= self.ttl:
+                self._agents.move_to_end(booking_agent_email)
+                return served
+
+        cursor = db.cursor()
+        try:
+            # Read from purchases rather than the commission ledger, which only covers
+            # sales made after it was introduced unless rebuilt (see migration 010)
+            cursor.execute("""
+                SELECT customer_email, MAX(purchase_date), COUNT(*)
+                FROM purchases
+                WHERE booking_agent_email = %s
+                GROUP BY customer_email
+            """, (booking_agent_email,))
+            served = _Served(cursor.fetchall())
+        finally:
+            cursor.close()
+        with self._lock:
+            self._agents[booking_agent_email] = served
+            self._agents.move_to_end(booking_agent_email)
+            while len(self._agents) > self.max_agents:
+                self._agents.popitem(last=False)
+        return served
+
+    def record_purchase(self, booking_agent_email, customers, sale_date):
+        """Apply a committed purchase of {customer_email: tickets} made through an agent."""
+        with self._lock:
+            served = self._agents.get(booking_agent_email)
+            if served is not None:
+                served.record(customers, sale_date)
+
+    def search(self, db, booking_agent_email, prefix='', after=None, limit=DEFAULT_LIMIT):
+        """One page of matches as (customers, next_cursor).
+
+        Each customer is {'email', 'name', 'served', 'last_purchase',
+        'tickets'}. after is the next_cursor of the previous page.
+        """
+        prefix = prefix.strip().casefold()
+        limit = max(1, min(limit, MAX_LIMIT))
+        phase, position = pagination.decode_cursor(after) if after else ['served', 0]
+        if not (phase == 'served' and isinstance(position, int) and position >= 0
+                or phase == 'others' and isinstance(position, str)):
+            raise ValueError("Invalid page cursor")
+
+        served = self._served(db, booking_agent_email)
+        page = []
+        if phase == 'served':
+            matches = served.matching(prefix)
+            emails = matches[position:position + limit]
+            page = [{'email': email, 'served': True, 'last_purchase': served.details[email][0].isoformat(),
+                     'tickets': int(served.details[email][1])} for email in emails]
+            if position + limit < len(matches):
+                return self._with_names(db, page), pagination.encode_cursor(['served', position + limit])
+            position = ''
+
+        # Everyone else, by email from the customer table's primary key
+        others, last_email = [], position
+        cursor = db.cursor()
+        try:
+            while len(page) + len(others) <= limit:
+                cursor.execute("""
+                    SELECT email, name FROM customer
+                    WHERE email LIKE %s AND email > %s
+                    ORDER BY email
+                    LIMIT %s
+                """, (_like_prefix(prefix), last_email, limit + 1))
+                rows = cursor.fetchall()
+                for email, name in rows:
+                    if email not in served.details:
+                        others.append({'email': email, 'name': name, 'served': False, 'last_purchase': None,
+                                       'tickets': 0})
+                if len(rows) <= limit:
+                    break
+                last_email = rows[-1][0]
+        finally:
+            cursor.close()
+
+        room = limit - len(page)
+        next_cursor = None
+        if len(others) > room:
+            # A page filled by the agent's own customers continues from the first other customer
+            next_cursor = pagination.encode_cursor(['others', others[room - 1]['email'] if room else position])
+        return self._with_names(db, page) + others[:room], next_cursor
+
+    @staticmethod
+    def _with_names(db, customers):
+        # Names for the agent's own customers, one primary key lookup per page
+        missing = [customer['email'] for customer in customers if 'name' not in customer]
+        if not missing:
+            return customers
+        cursor = db.cursor()
+        try:
+            cursor.execute(f"SELECT email, name FROM customer WHERE email IN ({', '.join(['%s'] * len(missing))})",
+                           tuple(missing))
+            names = dict(cursor.fetchall())
+        finally:
+            cursor.close()
+        for customer in customers:
+            customer.setdefault('name', names.get(customer['email']))
+        return customers
+
+
+picker = CustomerPicker()
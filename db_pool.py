@@ -0,0 +1,328 @@
+import logging
+import os
+import threading
+import time
+from collections import deque
+
+import mysql.connector
+from mysql.connector import Error
+from mysql.connector.errors import PoolError
+
+
+# Pool settings read from config.py, with the defaults used when a key is missing:
+#   DB_POOL_SIZE          connections kept open between requests (5)
+#   DB_POOL_MAX_OVERFLOW  extra connections opened under load, closed on return (10)
+#   DB_POOL_TIMEOUT       seconds to wait for a free connection before giving up (10)
+#   DB_POOL_IDLE_TIMEOUT  idle connections older than this are reopened on borrow (300)
+#   DB_POOL_RECYCLE       connections older than this are reopened on borrow (3600)
+#   DB_POOL_PRE_PING      ping the server before handing out an idle connection (True)
+POOL_DEFAULTS = {
+    'DB_POOL_SIZE': 5,
+    'DB_POOL_MAX_OVERFLOW': 10,
+    'DB_POOL_TIMEOUT': 10,
+    'DB_POOL_IDLE_TIMEOUT': 300,
+    'DB_POOL_RECYCLE': 3600,
+    'DB_POOL_PRE_PING': True,
+}
+
+
+class _PooledEntry:
+    __slots__ = ('conn', 'created_at', 'last_used', 'borrowed_at')
+
+    def __init__(self, conn):
+        now = time.monotonic()
+        self.conn = conn
+        self.created_at = now
+        self.last_used = now
+        self.borrowed_at = None
+
+
+class ConnectionPool:
+    """Thread-safe pool of MySQL connections with overflow and health checks.
+
+    Connections are opened lazily, so creating the pool never touches the
+    database. acquire() raises PoolError (a mysql.connector.Error) when no
+    connection frees up within the timeout, so routes that already catch
+    Error handle an exhausted pool like any other database failure.
+    """
+
+    def __init__(self, connect_args, size=5, max_overflow=10, timeout=10,
+                 idle_timeout=300, recycle=3600, pre_ping=True):
+        self.connect_args = dict(connect_args)
+        self.size = size
+        self.max_overflow = max_overflow
+        self.timeout = timeout
+        self.idle_timeout = idle_timeout
+        self.recycle = recycle
+        self.pre_ping = pre_ping
+
+        self._cond = threading.Condition()
+        self._idle = deque()
+        self._in_use = {}
+        self._total = 0
+        self._pid = os.getpid()
+        self._stats = {
+            'borrows': 0,
+            'waits': 0,
+            'exhausted': 0,
+            'created': 0,
+            'recycled': 0,
+            'failed_health_checks': 0,
+            'discarded': 0,
+            'wait_seconds_total': 0.0,
+            'borrow_seconds_total': 0.0,
+            'held_seconds_total': 0.0,
+        }
+
+    @classmethod
+    def from_config(cls, config):
+        settings = {key: config.get(key, default) for key, default in POOL_DEFAULTS.items()}
+        connect_args = {
+            'host': config['MYSQL_HOST'],
+            'user': config['MYSQL_USER'],
+            'password': config['MYSQL_PASSWORD'],
+            'database': config['MYSQL_DB'],
+            'port': config['MYSQL_PORT'],
+        }
+        return cls(
+            connect_args,
+            size=settings['DB_POOL_SIZE'],
+            max_overflow=settings['DB_POOL_MAX_OVERFLOW'],
+            timeout=settings['DB_POOL_TIMEOUT'],
+            idle_timeout=settings['DB_POOL_IDLE_TIMEOUT'],
+            recycle=settings['DB_POOL_RECYCLE'],
+            pre_ping=settings['DB_POOL_PRE_PING'],
+        )
+
+    def _reset_after_fork(self):
+        # Sockets inherited from the parent process must not be shared; drop them without closing
+        self._idle.clear()
+        self._in_use.clear()
+        self._total = 0
+        self._pid = os.getpid()
+
+    def _connect(self):
+        conn = mysql.connector.connect(**self.connect_args)
+        with self._cond:
+            self._stats['created'] += 1
+        return _PooledEntry(conn)
+
+    def _close_quietly(self, conn):
+        try:
+            conn.close()
+        except Error:
+            pass
+
+    def _is_usable(self, entry, now):
+        if self.recycle and now - entry.created_at > self.recycle:
+            return False
+        if self.idle_timeout and now - entry.last_used > self.idle_timeout:
+            return False
+        return True
+
+    def _is_healthy(self, entry):
+        if not self.pre_ping:
+            return True
+        try:
+            entry.conn.ping(reconnect=False)
+            return True
+        except Error:
+            return False
+
+    def acquire(self, timeout=None):
+        """A connection, waiting up to timeout seconds (the pool's own by default) for one to free up."""
+        timeout = self.timeout if timeout is None else timeout
+        start = time.monotonic()
+        deadline = start + timeout
+        waited = False
+        entry = None
+
+        with self._cond:
+            if self._pid != os.getpid():
+                self._reset_after_fork()
+            while True:
+                if self._idle:
+                    entry = self._idle.pop()
+                    break
+                if self._total < self.size + self.max_overflow:
+                    # Reserve a slot now and open the connection outside the lock
+                    self._total += 1
+                    break
+                if not waited:
+                    waited = True
+                    self._stats['waits'] += 1
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._stats['exhausted'] += 1
+                    self._stats['wait_seconds_total'] += time.monotonic() - start
+                    raise PoolError("Connection pool exhausted: no connection available "
+                                    f"within {timeout}s ({self._total} open)")
+                self._cond.wait(remaining)
+            if waited:
+                self._stats['wait_seconds_total'] += time.monotonic() - start
+
+        if entry is not None:
+            now = time.monotonic()
+            if not self._is_usable(entry, now):
+                self._close_quietly(entry.conn)
+                with self._cond:
+                    self._stats['recycled'] += 1
+                entry = None
+            elif not self._is_healthy(entry):
+                self._close_quietly(entry.conn)
+                with self._cond:
+                    self._stats['failed_health_checks'] += 1
+                entry = None
+
+        if entry is None:
+            try:
+                entry = self._connect()
+            except Error:
+                with self._cond:
+                    self._total -= 1
+                    self._cond.notify()
+                raise
+
+        now = time.monotonic()
+        entry.borrowed_at = now
+        with self._cond:
+            self._in_use[id(entry.conn)] = entry
+            self._stats['borrows'] += 1
+            self._stats['borrow_seconds_total'] += now - start
+        return entry.conn
+
+    def _reset_connection(self, conn):
+        # Leave no open transaction or pending result behind for the next borrower
+        if conn.unread_result:
+            conn.consume_results()
+        if conn.in_transaction:
+            conn.rollback()
+
+    def release(self, conn, discard=False):
+        with self._cond:
+            entry = self._in_use.pop(id(conn), None)
+        if entry is None:
+            # Not ours (e.g. borrowed before a fork); just close it
+            self._close_quietly(conn)
+            return
+
+        if not discard:
+            try:
+                self._reset_connection(conn)
+            except Error as e:
+                logging.warning(f"Discarding pooled connection that failed to reset: {e}")
+                discard = True
+
+        now = time.monotonic()
+        entry.last_used = now
+        with self._cond:
+            self._stats['held_seconds_total'] += now - entry.borrowed_at
+            entry.borrowed_at = None
+            if discard or len(self._idle) >= self.size:
+                # Broken or overflow connection: close it instead of keeping it around
+                self._total -= 1
+                if discard:
+                    self._stats['discarded'] += 1
+                keep = False
+            else:
+                self._idle.append(entry)
+                keep = True
+            self._cond.notify()
+        if not keep:
+            self._close_quietly(conn)
+
+    def close_all(self):
+        with self._cond:
+            idle = list(self._idle)
+            self._idle.clear()
+            self._total -= len(idle)
+        for entry in idle:
+            self._close_quietly(entry.conn)
+
+    def stats(self):
+        with self._cond:
+            stats = dict(self._stats)
+            stats.update({
+                'size': self.size,
+                'max_overflow': self.max_overflow,
+                'open': self._total,
+                'idle': len(self._idle),
+                'in_use': len(self._in_use),
+            })
+        borrows = stats['borrows'] or 1
+        stats['avg_borrow_ms'] = round(stats['borrow_seconds_total'] / borrows * 1000, 3)
+        stats['avg_wait_ms'] = round(stats['wait_seconds_total'] / (stats['waits'] or 1) * 1000, 3)
+        return stats
+
+
+class ReplicaRouter:
+    """A primary pool plus read replica pools, chosen per borrow.
+
+    Read-only borrows go round-robin across the replicas. A replica that
+    fails to connect is skipped for `retry_after` seconds. If no replica can
+    serve the borrow, it falls back to the primary, so the routes keep working
+    with every replica down. Writes, and anything that must see its own
+    writes, borrow from the primary.
+    """
+
+    def __init__(self, primary, replicas=(), retry_after=30):
+        self.primary = primary
+        self.replicas = list(replicas)
+        self.retry_after = retry_after
+        self._lock = threading.Lock()
+        self._next = 0
+        self._down_until = [0.0] * len(self.replicas)
+
+    @classmethod
+    def from_config(cls, config):
+        """Primary from MYSQL_*, replicas from MYSQL_REPLICAS.
+
+        MYSQL_REPLICAS is a list of dicts with any of host, port, user, password
+        and db; missing keys are taken from the primary's settings. Every
+        pool uses the DB_POOL_* settings.
+        """
+        replicas = [
+            ConnectionPool.from_config({**config, **{f"MYSQL_{key.upper()}": value for key, value in replica.items()}})
+            for replica in config.get('MYSQL_REPLICAS', ())
+        ]
+        return cls(ConnectionPool.from_config(config), replicas,
+                   retry_after=config.get('DB_REPLICA_RETRY_AFTER', 30))
+
+    def acquire(self, read_only=False):
+        """(pool, connection); release the connection to the pool it came from."""
+        if read_only and self.replicas:
+            with self._lock:
+                start = self._next
+                self._next = (self._next + 1) % len(self.replicas)
+            now = time.monotonic()
+            for offset in range(len(self.replicas)):
+                index = (start + offset) % len(self.replicas)
+                if self._down_until[index] > now:
+                    continue
+                pool = self.replicas[index]
+                try:
+                    # No waiting on a replica: a busy one falls through to the next, and
+                    # only the primary waits the full DB_POOL_TIMEOUT
+                    return pool, pool.acquire(timeout=0)
+                except PoolError:
+                    # Busy, not broken: try the next replica
+                    continue
+                except Error as e:
+                    logging.warning(f"Read replica {pool.connect_args['host']}:{pool.connect_args['port']} "
+                                    f"unavailable for {self.retry_after}s: {e}")
+                    self._down_until[index] = now + self.retry_after
+        return self.primary, self.primary.acquire()
+
+    def pools(self):
+        return [self.primary] + self.replicas
+
+    def stats(self):
+        now = time.monotonic()
+        return {
+            'primary': self.primary.stats(),
+            'replicas': [
+                {'host': pool.connect_args['host'], 'port': pool.connect_args['port'],
+                 'down': self._down_until[index] > now, **pool.stats()}
+                for index, pool in enumerate(self.replicas)
+            ],
+        }
@@ -0,0 +1,124 @@
+import logging
+from datetime import timedelta
+
+
+# Table maintained by this module; see migrations/009_fare_calendar.sql
+CALENDAR_TABLE = 'fare_calendar'
+
+# Default and largest number of days one /fare_calendar call covers
+DEFAULT_DAYS = 60
+MAX_DAYS = 366
+
+# Flight numbers per IN (...) list in record_flights
+RECORD_BATCH = 1000
+
+# Flights with their airports' cities; cancelled flights cannot be booked, so they
+# are left out of the calendar
+BOOKABLE_FLIGHTS = """
+    FROM flight f
+    JOIN airport o ON o.airport_name = f.departure_airport
+    JOIN airport d ON d.airport_name = f.arrival_airport
+    WHERE LOWER(f.status) <> 'cancelled'
+"""
+
+CELL_COLUMNS = "o.airport_city, d.airport_city, DATE(f.departure_time)"
+
+
+def record_flights(cursor, airline_name, flight_nums):
+    """Add new flights to their calendar days.
+
+    Runs on the caller's cursor after the flights are inserted, so the
+    calendar commits or rolls back with them.
+    """
+    flight_nums = list(flight_nums)
+    for offset in range(0, len(flight_nums), RECORD_BATCH):
+        batch = flight_nums[offset:offset + RECORD_BATCH]
+        cursor.execute(f"""
+            INSERT INTO {CALENDAR_TABLE} (origin_city, destination_city, departure_date, min_price, flights)
+            SELECT {CELL_COLUMNS}, MIN(f.price), COUNT(*)
+            {BOOKABLE_FLIGHTS}
+              AND f.airline_name = %s AND f.flight_num IN ({', '.join(['%s'] * len(batch))})
+            GROUP BY {CELL_COLUMNS}
+            ON DUPLICATE KEY UPDATE
+                min_price = LEAST(min_price, VALUES(min_price)),
+                flights = flights + VALUES(flights)
+        """, (airline_name, *batch))
+
+
+def refresh_flight(cursor, airline_name, flight_num):
+    """Recompute the calendar day of a flight whose price or status changed.
+
+    A lower price could be folded in like a new flight, but a raised price or
+    a cancellation can remove the day's minimum, so the day is recomputed from
+    the flights departing that day between the two cities.
+    """
+    cursor.execute(f"""
+        SELECT {CELL_COLUMNS}
+        FROM flight f
+        JOIN airport o ON o.airport_name = f.departure_airport
+        JOIN airport d ON d.airport_name = f.arrival_airport
+        WHERE f.airline_name = %s AND f.flight_num = %s
+    """, (airline_name, flight_num))
+    cell = cursor.fetchone()
+    cursor.fetchall()
+    if cell is None:
+        return
+
+    origin_city, destination_city, day = cell
+    cursor.execute(f"""
+        DELETE FROM {CALENDAR_TABLE}
+        WHERE origin_city = %s AND destination_city = %s AND departure_date = %s
+    """, cell)
+    cursor.execute(f"""
+        INSERT INTO {CALENDAR_TABLE} (origin_city, destination_city, departure_date, min_price, flights)
+        SELECT {CELL_COLUMNS}, MIN(f.price), COUNT(*)
+        {BOOKABLE_FLIGHTS}
+          AND o.airport_city = %s AND d.airport_city = %s
+          AND f.departure_time >= %s AND f.departure_time < %s
+        GROUP BY {CELL_COLUMNS}
+    """, (origin_city, destination_city, day, day + timedelta(days=1)))
+
+
+def rebuild(db):
+    """Recompute the whole calendar from the flight table."""
+    cursor = db.cursor()
+    try:
+        cursor.execute(f"DELETE FROM {CALENDAR_TABLE}")
+        cursor.execute(f"""
+            INSERT INTO {CALENDAR_TABLE} (origin_city, destination_city, departure_date, min_price, flights)
+            SELECT {CELL_COLUMNS}, MIN(f.price), COUNT(*)
+            {BOOKABLE_FLIGHTS}
+            GROUP BY {CELL_COLUMNS}
+        """)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        cursor.close()
+    logging.info("Rebuilt the fare calendar")
+
+
+def fares(db, origin_city, destination_city, start, days=DEFAULT_DAYS):
+    """One entry per day from start: {'date': 'YYYY-MM-DD', 'min_price', 'flights'}.
+
+    Days without a bookable flight have min_price None and flights 0.
+    """
+    end = start + timedelta(days=days - 1)
+    cursor = db.cursor()
+    try:
+        cursor.execute(f"""
+            SELECT departure_date, min_price, flights
+            FROM {CALENDAR_TABLE}
+            WHERE origin_city = %s AND destination_city = %s AND departure_date BETWEEN %s AND %s
+        """, (origin_city.strip(), destination_city.strip(), start, end))
+        by_day = {row[0]: (row[1], row[2]) for row in cursor.fetchall()}
+    finally:
+        cursor.close()
+
+    calendar = []
+    for offset in range(days):
+        day = start + timedelta(days=offset)
+        min_price, flights = by_day.get(day, (None, 0))
+        calendar.append({'date': day.isoformat(), 'min_price': min_price, 'flights': flights})
+    return calendar
@@ -0,0 +1,337 @@
+import logging
+import threading
+import time
+from bisect import bisect_left, insort
+from datetime import timedelta
+
+
+# Column order of SELECT * FROM flight, which the HTML templates index into
+FLIGHT_FIELDS = ('airline_name', 'flight_num', 'departure_airport', 'departure_time',
+                 'arrival_airport', 'arrival_time', 'price', 'status', 'airplane_id')
+
+# Keys returned by the public JSON endpoints (see flight_search.FLIGHT_COLUMNS)
+PUBLIC_FIELDS = ('airline_name', 'flight_num', 'departure_airport', 'departure_time',
+                 'arrival_airport', 'arrival_time', 'status', 'price')
+
+# Flights with their airports' cities resolved, so city searches need no airport lookup.
+# The join is paid once per load or refresh instead of on every search.
+SELECT_FLIGHTS = f"""
+    SELECT {', '.join('f.' + field for field in FLIGHT_FIELDS)}, o.airport_city, d.airport_city
+    FROM flight f
+    LEFT JOIN airport o ON o.airport_name = f.departure_airport
+    LEFT JOIN airport d ON d.airport_name = f.arrival_airport
+"""
+
+
+class FlightRecord:
+    __slots__ = FLIGHT_FIELDS + ('departure_city', 'arrival_city')
+
+    def __init__(self, airline_name, flight_num, departure_airport, departure_time,
+                 arrival_airport, arrival_time, price, status, airplane_id,
+                 departure_city=None, arrival_city=None):
+        self.airline_name = airline_name
+        self.flight_num = flight_num
+        self.departure_airport = departure_airport
+        self.departure_time = departure_time
+        self.arrival_airport = arrival_airport
+        self.arrival_time = arrival_time
+        self.price = price
+        self.status = status
+        self.airplane_id = airplane_id
+        self.departure_city = departure_city
+        self.arrival_city = arrival_city
+
+    @property
+    def key(self):
+        return (self.airline_name, self.flight_num)
+
+    @property
+    def sort_key(self):
+        return (self.departure_time, self.airline_name, self.flight_num)
+
+    def as_row(self):
+        return tuple(getattr(self, field) for field in FLIGHT_FIELDS)
+
+    def as_dict(self):
+        return {field: getattr(self, field) for field in PUBLIC_FIELDS}
+
+
+class _Indexes:
+    """Primary map plus secondary indexes over one set of flights.
+
+    Day buckets map a date to a sorted list of (departure_time, airline,
+    flight_num) keys so results come out already ordered by departure.
+    """
+
+    __slots__ = ('flights', 'departures', 'arrivals', 'from_cities', 'to_cities', 'days')
+
+    def __init__(self):
+        self.flights = {}
+        self.departures = {}   # departure_airport -> {day: sorted sort_keys}
+        self.arrivals = {}     # arrival_airport -> {day: sorted sort_keys}
+        self.from_cities = {}  # casefolded departure city -> {day: sorted sort_keys}
+        self.to_cities = {}    # casefolded arrival city -> {day: sorted sort_keys}
+        self.days = {}         # departure day -> sorted sort_keys
+
+    def add(self, record):
+        self.flights[record.key] = record
+        sort_key = record.sort_key
+        day = record.departure_time.date()
+        insort(self.departures.setdefault(record.departure_airport, {}).setdefault(day, []), sort_key)
+        insort(self.arrivals.setdefault(record.arrival_airport, {}).setdefault(day, []), sort_key)
+        if record.departure_city:
+            insort(self.from_cities.setdefault(record.departure_city.casefold(), {}).setdefault(day, []), sort_key)
+        if record.arrival_city:
+            insort(self.to_cities.setdefault(record.arrival_city.casefold(), {}).setdefault(day, []), sort_key)
+        insort(self.days.setdefault(day, []), sort_key)
+
+    def remove(self, key):
+        record = self.flights.pop(key, None)
+        if record is None:
+            return
+        sort_key = record.sort_key
+        day = record.departure_time.date()
+        _discard_sorted(self.departures[record.departure_airport], day, sort_key)
+        _discard_sorted(self.arrivals[record.arrival_airport], day, sort_key)
+        if record.departure_city:
+            _discard_sorted(self.from_cities[record.departure_city.casefold()], day, sort_key)
+        if record.arrival_city:
+            _discard_sorted(self.to_cities[record.arrival_city.casefold()], day, sort_key)
+        _discard_sorted(self.days, day, sort_key)
+
+
+def _discard_sorted(buckets, day, sort_key):
+    bucket = buckets.get(day)
+    if not bucket:
+        return
+    position = bisect_left(bucket, sort_key)
+    if position < len(bucket) and bucket[position] == sort_key:
+        del bucket[position]
+    if not bucket:
+        del buckets[day]
+
+
+class FlightCatalog:
+    """In-memory, read-optimized copy of the flight table.
+
+    Flights only change through create_flight and change_flight_status, which
+    call refresh() for the exact flight they wrote. Changes made outside the
+    app are picked up by a full reload once the snapshot is older than ttl;
+    the reload runs in a background thread while readers keep using the old
+    snapshot.
+    """
+
+    def __init__(self, ttl=300):
+        self.ttl = ttl
+        self.enabled = True
+        self._pool = None
+        self._lock = threading.RLock()
+        self._indexes = None
+        self._loaded_at = None
+        self._reloading = False
+        self._pending = None
+
+    def configure(self, pool, ttl=300, enabled=True):
+        self._pool = pool
+        self.ttl = ttl
+        self.enabled = enabled
+
+    def _read_all(self):
+        conn = self._pool.acquire()
+        try:
+            cursor = conn.cursor()
+            try:
+                cursor.execute(SELECT_FLIGHTS)
+                indexes = _Indexes()
+                while True:
+                    rows = cursor.fetchmany(10000)
+                    if not rows:
+                        break
+                    for row in rows:
+                        indexes.add(FlightRecord(*row))
+            finally:
+                cursor.close()
+        finally:
+            self._pool.release(conn)
+        return indexes
+
+    def reload(self):
+        started = time.monotonic()
+        with self._lock:
+            # Flights refreshed while the table is being read are replayed onto the new snapshot
+            self._pending = {}
+        try:
+            indexes = self._read_all()
+        except Exception:
+            with self._lock:
+                self._pending = None
+            raise
+        with self._lock:
+            for key, record in self._pending.items():
+                indexes.remove(key)
+                if record is not None:
+                    indexes.add(record)
+            self._pending = None
+            self._indexes = indexes
+            self._loaded_at = time.monotonic()
+        logging.info(f"Flight catalog loaded {len(indexes.flights)} flights "
+                     f"in {time.monotonic() - started:.2f}s")
+
+    def _background_reload(self):
+        try:
+            self.reload()
+        except Exception as e:
+            logging.error(f"Flight catalog reload failed: {e}")
+        finally:
+            with self._lock:
+                self._reloading = False
+
+    def _current(self):
+        indexes = self._indexes
+        if indexes is None:
+            with self._lock:
+                if self._indexes is None:
+                    self.reload()
+                return self._indexes
+
+        if time.monotonic() - self._loaded_at > self.ttl:
+            with self._lock:
+                start_reload = not self._reloading
+                self._reloading = True
+            if start_reload:
+                threading.Thread(target=self._background_reload, daemon=True).start()
+        return indexes
+
+    def refresh(self, db, airline_name, flight_num):
+        """Re-read one flight after a write so the catalog matches the database."""
+        if self._indexes is None:
+            return
+        cursor = db.cursor()
+        try:
+            cursor.execute(SELECT_FLIGHTS + " WHERE f.airline_name = %s AND f.flight_num = %s",
+                           (airline_name, flight_num))
+            row = cursor.fetchone()
+            cursor.fetchall()
+        finally:
+            cursor.close()
+
+        key = (airline_name, int(flight_num))
+        record = FlightRecord(*row) if row is not None else None
+        with self._lock:
+            indexes = self._indexes
+            indexes.remove(key)
+            if record is not None:
+                indexes.add(record)
+            if self._pending is not None:
+                self._pending[key] = record
+
+    def add_new(self, records):
+        """Add flights just inserted by this process, without reading them back."""
+        if self._indexes is None:
+            return
+        with self._lock:
+            indexes = self._indexes
+            for record in records:
+                indexes.remove(record.key)
+                indexes.add(record)
+                if self._pending is not None:
+                    self._pending[record.key] = record
+
+    def get(self, airline_name, flight_num):
+        return self._current().flights.get((airline_name, int(flight_num)))
+
+    def search(self, departure_airports=None, arrival_airports=None, start=None, end=None,
+               airline_name=None):
+        """Flights ordered by departure time, filtered by airport sets and [start, end).
+
+        start and end are datetimes; either may be None for an open range.
+        """
+        indexes = self._current()
+        with self._lock:
+            if departure_airports is not None:
+                sort_keys = self._from_airports(indexes.departures, departure_airports, start, end)
+            elif arrival_airports is not None:
+                sort_keys = self._from_airports(indexes.arrivals, arrival_airports, start, end)
+            else:
+                sort_keys = self._from_days(indexes.days, start, end)
+
+            results = []
+            for sort_key in sort_keys:
+                departure_time, airline, number = sort_key
+                if start is not None and departure_time < start:
+                    continue
+                if end is not None and departure_time >= end:
+                    continue
+                record = indexes.flights[(airline, number)]
+                if arrival_airports is not None and record.arrival_airport not in arrival_airports:
+                    continue
+                if airline_name is not None and record.airline_name != airline_name:
+                    continue
+                results.append(record)
+            return results
+
+    def search_cities(self, departure_city=None, arrival_city=None, start=None, end=None):
+        """Flights between cities (either may be None), ordered by departure time, within [start, end)."""
+        indexes = self._current()
+        with self._lock:
+            if departure_city is not None:
+                buckets = indexes.from_cities.get(departure_city.strip().casefold(), {})
+            else:
+                buckets = indexes.to_cities.get(arrival_city.strip().casefold(), {})
+            wanted = arrival_city.strip().casefold() if arrival_city is not None else None
+
+            results = []
+            for departure_time, airline, number in self._from_days(buckets, start, end):
+                if start is not None and departure_time < start:
+                    continue
+                if end is not None and departure_time >= end:
+                    continue
+                record = indexes.flights[(airline, number)]
+                if wanted is not None and (record.arrival_city or '').casefold() != wanted:
+                    continue
+                results.append(record)
+            return results
+
+    def departures(self, airport, start, end):
+        """Flights leaving airport with start <= departure_time <= end, in departure order.
+
+        Walks only the day buckets the range touches, so it stays cheap for
+        the short layover windows of connection searches.
+        """
+        indexes = self._current()
+        with self._lock:
+            buckets = indexes.departures.get(airport)
+            if not buckets:
+                return []
+            results = []
+            day = start.date()
+            while day <= end.date():
+                bucket = buckets.get(day, ())
+                for sort_key in bucket[bisect_left(bucket, (start,)):]:
+                    if sort_key[0] > end:
+                        break
+                    results.append(indexes.flights[sort_key[1:]])
+                day += timedelta(days=1)
+            return results
+
+    def _from_airports(self, index, airports, start, end):
+        sort_keys = []
+        for airport in airports:
+            sort_keys.extend(self._from_days(index.get(airport, {}), start, end))
+        sort_keys.sort()
+        return sort_keys
+
+    def _from_days(self, buckets, start, end):
+        start_day = start.date() if start is not None else None
+        end_day = end.date() if end is not None else None
+        sort_keys = []
+        for day in sorted(buckets):
+            if start_day is not None and day < start_day:
+                continue
+            if end_day is not None and day > end_day:
+                break
+            sort_keys.extend(buckets[day])
+        return sort_keys
+
+
+catalog = FlightCatalog()
@@ -0,0 +1,324 @@
+import csv
+import io
+import json
+import logging
+import threading
+import time
+from datetime import datetime, timedelta
+from decimal import Decimal, InvalidOperation
+
+import fare_calendar
+import seat_inventory
+from flight_catalog import FlightRecord
+from flight_search import airports
+
+
+# Columns of an import file (CSV header or JSON object keys). A row is one flight,
+# or with repeat_until a schedule of flights at the same times on each chosen day:
+#   flight_num      optional; a schedule numbers its flights consecutively from it,
+#                   rows without one are numbered after the airline's highest flight
+#   departure_time  YYYY-MM-DD HH:MM[:SS]; for a schedule, its first flight
+#   arrival_time    same format; a schedule keeps the first flight's duration
+#   status          optional, default 'upcoming'
+#   repeat_until    optional YYYY-MM-DD, last day of the schedule
+#   days            optional with repeat_until: 'daily' (the default) or weekdays like 'mon,wed,fri'
+IMPORT_FIELDS = ('flight_num', 'departure_airport', 'departure_time', 'arrival_airport', 'arrival_time',
+                 'price', 'status', 'airplane_id', 'repeat_until', 'days')
+REQUIRED_FIELDS = ('departure_airport', 'departure_time', 'arrival_airport', 'arrival_time',
+                   'price', 'airplane_id')
+
+DEFAULT_STATUS = 'upcoming'
+WEEKDAYS = ('mon', 'tue', 'wed', 'thu', 'fri', 'sat', 'sun')
+
+# Limits against a typo in repeat_until turning into millions of flights
+MAX_OCCURRENCES = 1000
+MAX_FLIGHTS = 200_000
+
+# Rows per multi-row INSERT
+INSERT_BATCH = 1000
+
+
+class ScheduleFileError(ValueError):
+    """An import file that cannot be read at all."""
+
+
+class AirplaneDirectory:
+    """Cached airplane ids and seat counts per airline, for validating imports.
+
+    Airplanes are only added through add_airplane, which invalidates the
+    airline's entry; the ttl covers changes made outside the app.
+    """
+
+    def __init__(self, ttl=300):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._by_airline = {}
+
+    def invalidate(self, airline_name):
+        with self._lock:
+            self._by_airline.pop(airline_name, None)
+
+    def fleet(self, db, airline_name):
+        """{airplane_id as text: (airplane_id, seats)} for the airline's airplanes."""
+        with self._lock:
+            cached = self._by_airline.get(airline_name)
+        if cached is not None and time.monotonic() - cached[0] <= self.ttl:
+            return cached[1]
+
+        cursor = db.cursor()
+        try:
+            cursor.execute("SELECT airplane_id, seats FROM airplane WHERE airline_name = %s", (airline_name,))
+            fleet = {str(airplane_id): (airplane_id, seats) for airplane_id, seats in cursor.fetchall()}
+        finally:
+            cursor.close()
+        with self._lock:
+            self._by_airline[airline_name] = (time.monotonic(), fleet)
+        return fleet
+
+
+airplanes = AirplaneDirectory()
+
+
+def read_rows(stream, file_format):
+    """Rows of an import file opened in binary mode, as dicts; file_format is 'csv' or 'json'."""
+    if file_format == 'csv':
+        try:
+            return list(csv.DictReader(io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')))
+        except (csv.Error, UnicodeDecodeError) as e:
+            raise ScheduleFileError(f"Invalid CSV: {e}")
+    if file_format == 'json':
+        try:
+            data = json.load(stream)
+        except ValueError as e:
+            raise ScheduleFileError(f"Invalid JSON: {e}")
+        return json_rows(data)
+    raise ScheduleFileError(f"Unknown import format {file_format!r}; use csv or json")
+
+
+def json_rows(data):
+    """The rows of decoded JSON import data: a list of objects, or that list under "flights"."""
+    if isinstance(data, dict):
+        data = data.get('flights')
+    if not isinstance(data, list) or not all(isinstance(row, dict) for row in data):
+        raise ScheduleFileError('Expected a JSON list of flight objects, or {"flights": [...]}')
+    return data
+
+
+class _Schedule:
+    __slots__ = ('row', 'flight_num', 'departure_airport', 'arrival_airport', 'departure_city', 'arrival_city',
+                 'times', 'price', 'status', 'airplane_id', 'seats')
+
+
+def _text(row, field):
+    value = row.get(field)
+    return '' if value is None else str(value).strip()
+
+
+def _datetime(value, field):
+    try:
+        return datetime.fromisoformat(value).replace(microsecond=0)
+    except ValueError:
+        raise ValueError(f"{field} must be YYYY-MM-DD HH:MM[:SS], not {value!r}")
+
+
+def _weekdays(value):
+    if value in ('', 'daily'):
+        return set(range(7))
+    days = set()
+    for name in value.lower().split(','):
+        name = name.strip()[:3]
+        if name not in WEEKDAYS:
+            raise ValueError(f"days must be 'daily' or weekdays like 'mon,wed,fri', not {value!r}")
+        days.add(WEEKDAYS.index(name))
+    return days
+
+
+def _occurrences(departure, arrival, repeat_until, days):
+    # (departure, arrival) for each chosen weekday from the first flight's day to repeat_until
+    duration = arrival - departure
+    times = []
+    day = departure
+    while day.date() <= repeat_until:
+        if day.weekday() in days:
+            if len(times) == MAX_OCCURRENCES:
+                raise ValueError(f"A schedule may repeat at most {MAX_OCCURRENCES} times")
+            times.append((day, day + duration))
+        day += timedelta(days=1)
+    return times
+
+
+def _parse(db, airline_name, fleet, number, row):
+    # One row of the file as a _Schedule, or ValueError with the reason it is invalid
+    missing = [field for field in REQUIRED_FIELDS if not _text(row, field)]
+    if missing:
+        raise ValueError(f"Missing {', '.join(missing)}")
+
+    schedule = _Schedule()
+    schedule.row = number
+    flight_num = _text(row, 'flight_num')
+    try:
+        schedule.flight_num = int(flight_num) if flight_num else None
+    except ValueError:
+        raise ValueError(f"flight_num must be a whole number, not {flight_num!r}")
+    if schedule.flight_num is not None and schedule.flight_num <= 0:
+        raise ValueError("flight_num must be positive")
+
+    for field in ('departure_airport', 'arrival_airport'):
+        name = airports.canonical_name(db, _text(row, field))
+        if name is None:
+            raise ValueError(f"Unknown {field.replace('_', ' ')} {_text(row, field)!r}")
+        setattr(schedule, field, name)
+    schedule.departure_city = airports.city_of(db, schedule.departure_airport)
+    schedule.arrival_city = airports.city_of(db, schedule.arrival_airport)
+    if schedule.departure_airport == schedule.arrival_airport:
+        raise ValueError("The departure and arrival airports are the same")
+
+    departure = _datetime(_text(row, 'departure_time'), 'departure_time')
+    arrival = _datetime(_text(row, 'arrival_time'), 'arrival_time')
+    if arrival <= departure:
+        raise ValueError("arrival_time must be after departure_time")
+
+    try:
+        schedule.price = Decimal(_text(row, 'price')).quantize(Decimal('0.01'))
+    except InvalidOperation:
+        raise ValueError(f"price must be a number, not {_text(row, 'price')!r}")
+    if schedule.price < 0:
+        raise ValueError("price must not be negative")
+
+    airplane = fleet.get(_text(row, 'airplane_id'))
+    if airplane is None:
+        raise ValueError(f"{airline_name} has no airplane {_text(row, 'airplane_id')!r}")
+    schedule.airplane_id, schedule.seats = airplane
+    schedule.status = _text(row, 'status') or DEFAULT_STATUS
+
+    repeat_until = _text(row, 'repeat_until')
+    if repeat_until:
+        try:
+            repeat_until = datetime.strptime(repeat_until, "%Y-%m-%d").date()
+        except ValueError:
+            raise ValueError(f"repeat_until must be YYYY-MM-DD, not {repeat_until!r}")
+        schedule.times = _occurrences(departure, arrival, repeat_until, _weekdays(_text(row, 'days')))
+        if not schedule.times:
+            raise ValueError("The schedule has no flights up to repeat_until")
+    elif _text(row, 'days'):
+        raise ValueError("days needs repeat_until")
+    else:
+        schedule.times = [(departure, arrival)]
+    return schedule
+
+
+def _validate(db, airline_name, rows):
+    # Schedules for the valid rows, and {row number: error} for the others
+    fleet = airplanes.fleet(db, airline_name)
+    schedules, errors = [], {}
+    for number, row in enumerate(rows, start=1):
+        try:
+            schedules.append(_parse(db, airline_name, fleet, number, row))
+        except ValueError as e:
+            errors[number] = str(e)
+    return schedules, errors
+
+
+def _number(cursor, airline_name, schedules, errors):
+    """Give every flight its number, reporting rows whose numbers are taken.
+
+    Runs inside the import transaction: the locking reads keep a concurrent
+    import or create_flight from taking the same numbers before commit.
+    """
+    taken = {}
+    explicit = [schedule for schedule in schedules if schedule.flight_num is not None]
+    if explicit:
+        low = min(schedule.flight_num for schedule in explicit)
+        high = max(schedule.flight_num + len(schedule.times) - 1 for schedule in explicit)
+        cursor.execute("""
+            SELECT flight_num FROM flight
+            WHERE airline_name = %s AND flight_num BETWEEN %s AND %s
+            FOR UPDATE
+        """, (airline_name, low, high))
+        existing = {row[0] for row in cursor.fetchall()}
+        for schedule in explicit:
+            numbers = range(schedule.flight_num, schedule.flight_num + len(schedule.times))
+            clash = next((n for n in numbers if n in existing), None)
+            if clash is not None:
+                errors[schedule.row] = f"Flight {clash} already exists"
+                continue
+            clash = next((n for n in numbers if n in taken), None)
+            if clash is not None:
+                errors[schedule.row] = f"Flight {clash} is also in row {taken[clash]}"
+                continue
+            taken.update((n, schedule.row) for n in numbers)
+
+    cursor.execute("SELECT COALESCE(MAX(flight_num), 0) FROM flight WHERE airline_name = %s FOR UPDATE",
+                   (airline_name,))
+    next_num = max([cursor.fetchone()[0], *taken]) + 1
+    cursor.fetchall()
+    numbered = []
+    for schedule in schedules:
+        if schedule.row in errors:
+            continue
+        if schedule.flight_num is None:
+            schedule.flight_num = next_num
+            next_num += len(schedule.times)
+        numbered.append(schedule)
+    return numbered
+
+
+def _report(rows, errors, flights, imported):
+    return {
+        'rows': len(rows),
+        'flights': flights,
+        'imported': imported,
+        'errors': [{'row': number, 'error': error} for number, error in sorted(errors.items())],
+    }
+
+
+def import_flights(db, airline_name, rows, skip_invalid=False):
+    """Validate, expand and insert a schedule of flights for one airline in one transaction.
+
+    Returns (report, records). The report counts the rows and flights and
+    lists each invalid row (numbered from 1, the first data row) with the
+    reason. Unless skip_invalid is set, any invalid row means nothing is
+    imported. records are the FlightRecords inserted, for the caches.
+    """
+    started = time.monotonic()
+    schedules, errors = _validate(db, airline_name, rows)
+    total = sum(len(schedule.times) for schedule in schedules)
+    if total > MAX_FLIGHTS:
+        raise ScheduleFileError(f"The file expands to {total} flights; import at most {MAX_FLIGHTS} at a time")
+
+    cursor = db.cursor()
+    try:
+        # Numbering runs even when rows are invalid, so the report lists clashes too
+        schedules = _number(cursor, airline_name, schedules, errors)
+        if errors and not skip_invalid:
+            db.rollback()
+            return _report(rows, errors, 0, False), []
+
+        records = [
+            FlightRecord(airline_name, schedule.flight_num + offset, schedule.departure_airport, departure,
+                         schedule.arrival_airport, arrival, schedule.price, schedule.status, schedule.airplane_id,
+                         schedule.departure_city, schedule.arrival_city)
+            for schedule in schedules
+            for offset, (departure, arrival) in enumerate(schedule.times)
+        ]
+        for offset in range(0, len(records), INSERT_BATCH):
+            cursor.executemany("""
+                INSERT INTO flight (airline_name, flight_num, departure_airport, departure_time, arrival_airport,
+                                    arrival_time, price, status, airplane_id)
+                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
+            """, [record.as_row() for record in records[offset:offset + INSERT_BATCH]])
+        seat_inventory.create_new(cursor, [
+            (airline_name, schedule.flight_num + offset, schedule.seats)
+            for schedule in schedules for offset in range(len(schedule.times))
+        ])
+        fare_calendar.record_flights(cursor, airline_name, [record.flight_num for record in records])
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        cursor.close()
+
+    logging.info(f"Imported {len(records)} flights for {airline_name} from {len(rows)} rows "
+                 f"in {time.monotonic() - started:.2f}s")
+    return _report(rows, errors, len(records), bool(records)), records
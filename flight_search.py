@@ -0,0 +1,347 @@
+import threading
+import time
+from datetime import datetime, timedelta
+
+import pagination
+import seat_inventory
+from flight_catalog import catalog
+from name_index import NameIndex
+
+
+# Columns returned by the public JSON search and status endpoints
+FLIGHT_COLUMNS = """f.airline_name, f.flight_num, f.departure_airport, f.departure_time,
+                   f.arrival_airport, f.arrival_time, f.status, f.price"""
+
+
+def day_range(date):
+    """Turn a YYYY-MM-DD string into a [start, end) datetime range.
+
+    Comparing departure_time against a range keeps the predicate sargable,
+    unlike DATE(departure_time) = %s which forces a full scan.
+    """
+    start = datetime.strptime(date, "%Y-%m-%d")
+    return start, start + timedelta(days=1)
+
+
+def _placeholders(values):
+    return ', '.join(['%s'] * len(values))
+
+
+class AirportDirectory:
+    """Cached copy of the airport table used to resolve cities and names.
+
+    The airport table is tiny compared to flight, so it is cheaper to match
+    city names and partial airport names here once and send the resulting
+    airport set to MySQL as an IN list than to join airport twice per search.
+    Partial names are matched through a trigram index rather than by scanning
+    every name. add_airport adds its airport here directly; the ttl picks up
+    changes made outside the app.
+    """
+
+    def __init__(self, ttl=300):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._loaded_at = None
+        self._rows = []
+        self._by_name = {}
+        self._by_city = {}
+        self._city_of = {}
+        self._names = NameIndex()
+        self._cities = NameIndex()
+
+    def invalidate(self):
+        with self._lock:
+            self._loaded_at = None
+
+    def _load(self, db):
+        cursor = db.cursor()
+        try:
+            cursor.execute("SELECT airport_name, airport_city FROM airport")
+            rows = cursor.fetchall()
+        finally:
+            cursor.close()
+        self._build(rows)
+        self._loaded_at = time.monotonic()
+
+    def _build(self, rows):
+        by_name = {}
+        by_city = {}
+        city_of = {}
+        for airport_name, airport_city in rows:
+            by_name[airport_name.casefold()] = airport_name
+            by_city.setdefault((airport_city or '').casefold(), set()).add(airport_name)
+            city_of[airport_name] = airport_city
+        names = NameIndex(airport_name for airport_name, _ in rows)
+        cities = NameIndex(airport_city for _, airport_city in rows if airport_city)
+
+        with self._lock:
+            self._rows = rows
+            self._by_name = by_name
+            self._by_city = by_city
+            self._city_of = city_of
+            self._names = names
+            self._cities = cities
+
+    def fresh(self):
+        loaded_at = self._loaded_at
+        return loaded_at is not None and time.monotonic() - loaded_at <= self.ttl
+
+    def _ensure_loaded(self, db):
+        # db is None only from callers that saw a fresh copy and skipped borrowing a
+        # connection; if it expired since, it is used once more
+        if db is not None and not self.fresh():
+            self._load(db)
+
+    def add(self, airport_name, airport_city):
+        """Index an airport just inserted by this process, without re-reading the table."""
+        if self._loaded_at is None:
+            return
+        with self._lock:
+            rows = self._rows + [(airport_name, airport_city)]
+        self._build(rows)
+
+    def airports_in_city(self, db, city):
+        self._ensure_loaded(db)
+        return set(self._by_city.get(city.strip().casefold(), ()))
+
+    def canonical_name(self, db, name):
+        """The stored name of the airport called name (case-insensitive), or None if there is none."""
+        self._ensure_loaded(db)
+        return self._by_name.get(name.strip().casefold())
+
+    def city_of(self, db, airport_name):
+        self._ensure_loaded(db)
+        return self._city_of.get(airport_name)
+
+    def resolve(self, db, term):
+        """Airports in the city called term, or else the airport called term."""
+        in_city = self.airports_in_city(db, term)
+        if in_city:
+            return in_city
+        name = self.canonical_name(db, term)
+        return {name} if name else set()
+
+    def match(self, db, term):
+        """Airports whose name contains term, or whose city is term (case-insensitive)."""
+        self._ensure_loaded(db)
+        matches = set(self._by_city.get(term.strip().casefold(), ()))
+        matches.update(self._names.containing(term))
+        return matches
+
+    def suggest(self, db, term, limit=10, kinds=('city', 'airport')):
+        """Typeahead suggestions for term: cities and airports starting with it,
+        then those containing it, then near misses. Answered from the in-memory
+        indexes, without a query per keystroke.
+
+        Each is {'type': 'city' or 'airport', 'name', 'city'}.
+        """
+        self._ensure_loaded(db)
+        indexes = {'city': self._cities, 'airport': self._names}
+        found = []
+        for lookup in (lambda index: index.starting_with(term, limit),
+                       lambda index: index.containing(term),
+                       lambda index: index.similar(term, limit)):
+            for kind in kinds:
+                if len(found) == limit:
+                    break
+                for name in lookup(indexes[kind]):
+                    if (kind, name) not in found:
+                        found.append((kind, name))
+                        if len(found) == limit:
+                            break
+        return [{'type': kind, 'name': name, 'city': name if kind == 'city' else self._city_of.get(name)}
+                for kind, name in found]
+
+
+airports = AirportDirectory()
+
+
+def search_query(db, source_city=None, destination_city=None, date=None, after=None, limit=None):
+    """SQL and parameters for find_flights, or None if a city has no airports.
+
+    after is the decoded keyset cursor of the last flight already returned.
+    """
+    query = f"SELECT {FLIGHT_COLUMNS} FROM flight f WHERE 1=1"
+    params = []
+
+    if source_city:
+        source_airports = airports.airports_in_city(db, source_city)
+        if not source_airports:
+            return None
+        query += f" AND f.departure_airport IN ({_placeholders(source_airports)})"
+        params.extend(sorted(source_airports))
+
+    if destination_city:
+        destination_airports = airports.airports_in_city(db, destination_city)
+        if not destination_airports:
+            return None
+        query += f" AND f.arrival_airport IN ({_placeholders(destination_airports)})"
+        params.extend(sorted(destination_airports))
+
+    if date:
+        start, end = day_range(date)
+        query += " AND f.departure_time >= %s AND f.departure_time < %s"
+        params.extend([start, end])
+
+    if after:
+        clause, extra = pagination.keyset_clause(pagination.FLIGHT_ORDER, after)
+        query += f" AND {clause}"
+        params.extend(extra)
+
+    query += f" ORDER BY {', '.join(pagination.FLIGHT_ORDER)}"
+    if limit is not None:
+        query += " LIMIT %s"
+        params.append(limit)
+    return query, tuple(params)
+
+
+def status_query(flight_num, date):
+    """SQL and parameters for find_flight_status."""
+    start, end = day_range(date)
+    query = f"""
+        SELECT {FLIGHT_COLUMNS}
+        FROM flight f
+        WHERE f.flight_num = %s
+          AND ((f.departure_time >= %s AND f.departure_time < %s)
+               OR (f.arrival_time >= %s AND f.arrival_time < %s))
+    """
+    return query, (flight_num, start, end, start, end)
+
+
+def airport_search_query(db, source, destination, date, airline_name=None, same_day=False):
+    """SQL and parameters for find_flights_by_airport, or None if a term matches no airport."""
+    source_airports = airports.match(db, source or '')
+    destination_airports = airports.match(db, destination or '')
+    if not source_airports or not destination_airports:
+        return None
+
+    start, end = day_range(date)
+    query = f"""
+        SELECT * FROM flight
+        WHERE departure_airport IN ({_placeholders(source_airports)})
+        AND arrival_airport IN ({_placeholders(destination_airports)})
+        AND departure_time >= %s
+    """
+    params = sorted(source_airports) + sorted(destination_airports) + [start]
+    if same_day:
+        query += " AND departure_time < %s"
+        params.append(end)
+    if airline_name:
+        query += " AND airline_name = %s"
+        params.append(airline_name)
+    query += " ORDER BY departure_time"
+    return query, tuple(params)
+
+
+def find_flights(db, source_city=None, destination_city=None, date=None, after=None, limit=None):
+    """Flights between two cities and/or on a given day, as dictionaries.
+
+    Results are ordered by (departure_time, airline_name, flight_num); after
+    and limit select one keyset page of them.
+    """
+    if catalog.enabled:
+        # Catalog flights carry their cities, so a city search is a lookup in its city index
+        start, end = day_range(date) if date else (None, None)
+        if source_city or destination_city:
+            flights = catalog.search_cities(source_city or None, destination_city or None, start, end)
+        else:
+            flights = catalog.search(start=start, end=end)
+        if after:
+            flights = [flight for flight in flights if list(flight.sort_key) > after]
+        if limit is not None:
+            flights = flights[:limit]
+        return [flight.as_dict() for flight in flights]
+
+    built = search_query(db, source_city, destination_city, date, after, limit)
+    if built is None:
+        return []
+
+    cursor = db.cursor(dictionary=True)
+    try:
+        cursor.execute(*built)
+        return cursor.fetchall()
+    finally:
+        cursor.close()
+
+
+def stream_flights(db, source_city=None, destination_city=None, date=None):
+    """find_flights as JSON lines, without materialising the result when it comes from MySQL."""
+    if catalog.enabled:
+        return pagination.jsonl_lines(find_flights(db, source_city, destination_city, date))
+
+    built = search_query(db, source_city, destination_city, date)
+    if built is None:
+        return iter(())
+    query, params = built
+    # stream_jsonl adds its own ORDER BY
+    query = query[:query.rindex(" ORDER BY ")]
+    return pagination.stream_jsonl(db, query, params, pagination.FLIGHT_ORDER)
+
+
+def search_page(db, source_city=None, destination_city=None, date=None, after=None,
+                limit=pagination.DEFAULT_PAGE_SIZE):
+    """One page of the public flight search as (flights, next_cursor).
+
+    Each flight carries seats_remaining from the inventory counters. Shared
+    by the Flask route and the async API so both return the same results.
+    """
+    flights = find_flights(db, source_city, destination_city, date, after=after, limit=limit + 1)
+    next_cursor = None
+    if len(flights) > limit:
+        flights = flights[:limit]
+        last = flights[-1]
+        next_cursor = pagination.encode_cursor([last['departure_time'], last['airline_name'], last['flight_num']])
+
+    if flights:
+        seats_left = seat_inventory.availability.remaining(
+            db, [(flight['airline_name'], flight['flight_num']) for flight in flights]
+        )
+        for flight in flights:
+            flight['seats_remaining'] = seats_left.get((flight['airline_name'], flight['flight_num']))
+    return flights, next_cursor
+
+
+def find_flight_status(db, flight_num, date):
+    """The flight with this number departing or arriving on date, or None.
+
+    Read from MySQL rather than the flight catalog: a status change reaches
+    only the catalog of the process that made it, while the short-lived
+    status cache in front of this lookup already absorbs polling.
+    """
+    cursor = db.cursor(dictionary=True)
+    try:
+        cursor.execute(*status_query(flight_num, date))
+        flight = cursor.fetchone()
+        cursor.fetchall()
+        return flight
+    finally:
+        cursor.close()
+
+
+def find_flights_by_airport(db, source, destination, date, airline_name=None, same_day=False):
+    """Rows of flight matching free-text source/destination terms.
+
+    Terms are resolved against the airport directory (partial airport name
+    or exact city) instead of LIKE '%term%' on the flight table. Without
+    same_day every flight departing on or after date is returned.
+    """
+    if catalog.enabled:
+        source_airports = airports.match(db, source or '')
+        destination_airports = airports.match(db, destination or '')
+        if not source_airports or not destination_airports:
+            return []
+        start, end = day_range(date)
+        flights = catalog.search(source_airports, destination_airports, start,
+                                 end if same_day else None, airline_name)
+        return [flight.as_row() for flight in flights]
+
+    built = airport_search_query(db, source, destination, date, airline_name, same_day)
+    if built is None:
+        return []
+
+    cursor = db.cursor()
+    try:
+        cursor.execute(*built)
+        return cursor.fetchall()
+    finally:
+        cursor.close()
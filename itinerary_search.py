@@ -0,0 +1,194 @@
+import heapq
+from bisect import bisect_left
+from datetime import datetime, timedelta
+
+from flight_catalog import catalog
+
+
+# Connection search over the flight catalog. The catalog's departure index
+# (airport -> day -> flights sorted by departure time) is the time-expanded
+# graph: a flight is an edge from (airport, departure time) to (airport,
+# arrival time), and a connection is any flight leaving the arrival airport
+# within the layover window. create_flight, change_flight_status and imports
+# update the catalog flight by flight, so there is no separate graph to rebuild.
+
+MAX_STOPS = 2
+DEFAULT_MIN_LAYOVER = timedelta(minutes=60)
+DEFAULT_MAX_LAYOVER = timedelta(hours=6)
+MAX_LAYOVER = timedelta(hours=24)
+# Longest itinerary considered, first departure to last arrival
+MAX_DURATION = timedelta(hours=48)
+
+SORT_ORDERS = {
+    'duration': lambda itinerary: (itinerary.duration, itinerary.price, itinerary.stops),
+    'price': lambda itinerary: (itinerary.price, itinerary.duration, itinerary.stops),
+}
+
+
+def _bookable(flight):
+    # Cancelled flights cannot be flown, so they are never a leg (as in the fare calendar)
+    return (flight.status or '').lower() != 'cancelled'
+
+
+class Itinerary:
+    __slots__ = ('legs',)
+
+    def __init__(self, legs):
+        self.legs = legs
+
+    @property
+    def stops(self):
+        return len(self.legs) - 1
+
+    @property
+    def duration(self):
+        return self.legs[-1].arrival_time - self.legs[0].departure_time
+
+    @property
+    def price(self):
+        return sum(leg.price for leg in self.legs)
+
+    def as_dict(self):
+        return {
+            'stops': self.stops,
+            'departure_time': self.legs[0].departure_time,
+            'arrival_time': self.legs[-1].arrival_time,
+            'duration_minutes': int(self.duration.total_seconds() // 60),
+            'price': self.price,
+            'legs': [leg.as_dict() for leg in self.legs],
+        }
+
+
+class _FinalLegs:
+    # Flights into the destination grouped by the airport they leave from, each group
+    # in departure order, so the last leg of a connection is a dict lookup and a bisect
+
+    def __init__(self, flights):
+        self._by_airport = {}
+        for flight in flights:
+            if not _bookable(flight):
+                continue
+            times, records = self._by_airport.setdefault(flight.departure_airport, ([], []))
+            times.append(flight.departure_time)
+            records.append(flight)
+
+    def __contains__(self, airport):
+        return airport in self._by_airport
+
+    def leaving(self, airport, earliest, latest):
+        times, records = self._by_airport.get(airport, ((), ()))
+        position = bisect_left(times, earliest)
+        while position < len(times) and times[position] <= latest:
+            yield records[position]
+            position += 1
+
+
+class _Worse:
+    # Reverses the order of sort keys, so heapq's min-heap keeps the worst kept itinerary on top
+    __slots__ = ('key',)
+
+    def __init__(self, key):
+        self.key = key
+
+    def __lt__(self, other):
+        return other.key < self.key
+
+    def __eq__(self, other):
+        return self.key == other.key
+
+
+class _Best:
+    # The `limit` best itineraries offered so far, in a heap of at most `limit` entries
+
+    def __init__(self, limit, order):
+        self.limit = limit
+        self.order = order
+        self._heap = []
+        self._offered = 0
+
+    def worst(self):
+        """The sort key an itinerary must beat to be kept, or None while there is room."""
+        return self._heap[0][0].key if len(self._heap) == self.limit else None
+
+    def offer(self, itinerary):
+        if itinerary.duration > MAX_DURATION:
+            return
+        key = self.order(itinerary)
+        self._offered += 1
+        # The offer number keeps equal keys in the order they were found
+        entry = (_Worse(key), -self._offered, itinerary)
+        if len(self._heap) < self.limit:
+            heapq.heappush(self._heap, entry)
+        elif key < self._heap[0][0].key:
+            heapq.heapreplace(self._heap, entry)
+
+    def ranked(self):
+        entries = sorted(self._heap, key=lambda entry: (entry[0].key, -entry[1]))
+        return [itinerary for _, _, itinerary in entries]
+
+
+def find_itineraries(origins, destinations, day, max_stops=MAX_STOPS, min_layover=DEFAULT_MIN_LAYOVER,
+                     max_layover=DEFAULT_MAX_LAYOVER, sort='duration', limit=20):
+    """The best itineraries from origin to destination airports with a first flight on day.
+
+    Direct flights and connections of up to max_stops stops are considered,
+    leaving out cancelled flights; each layover lasts between min_layover and max_layover, and no itinerary
+    passes through an origin or destination airport on the way. Results are
+    ranked by total duration or total price (see SORT_ORDERS). Only the best
+    limit are kept while searching, and two-stop connections that cannot beat
+    them are not expanded.
+    """
+    start = datetime.combine(day, datetime.min.time())
+    end = start + timedelta(days=1)
+    if limit < 1:
+        return []
+    best = _Best(limit, SORT_ORDERS[sort])
+
+    # Every connection ends on one of these, so a stop with no flight onward to the
+    # destination is never expanded
+    final = _FinalLegs(catalog.search(arrival_airports=destinations, start=start, end=end + MAX_DURATION)
+                       if max_stops else ())
+
+    # Direct flights and one-stop connections first: they fill the kept itineraries
+    # with good ones, so the costlier two-stop expansion can be cut short
+    firsts = []
+    for first in catalog.search(departure_airports=origins, start=start, end=end):
+        if not _bookable(first):
+            continue
+        stop = first.arrival_airport
+        if stop in destinations:
+            best.offer(Itinerary((first,)))
+            continue
+        if not max_stops or stop in origins:
+            continue
+        for last in final.leaving(stop, first.arrival_time + min_layover, first.arrival_time + max_layover):
+            best.offer(Itinerary((first, last)))
+        firsts.append(first)
+    if max_stops < 2:
+        return best.ranked()
+
+    for first in firsts:
+        # Bounds a second leg must meet for any itinerary through it to be kept: with the
+        # shortest layover after it, it cannot end later than the limit-th best itinerary
+        # by duration (or MAX_DURATION), nor cost more than it by price
+        worst = best.worst()
+        latest_arrival = first.departure_time + MAX_DURATION - min_layover
+        max_price = None
+        if worst is not None and sort == 'duration':
+            latest_arrival = min(latest_arrival, first.departure_time + worst[0] - min_layover)
+        elif worst is not None and sort == 'price':
+            max_price = worst[0] - first.price
+        if first.arrival_time > latest_arrival or (max_price is not None and max_price < 0):
+            continue
+
+        # A second leg lands after it departs, so the window also closes at latest_arrival
+        for second in catalog.departures(first.arrival_airport, first.arrival_time + min_layover,
+                                         min(first.arrival_time + max_layover, latest_arrival)):
+            via = second.arrival_airport
+            if (second.arrival_time > latest_arrival or (max_price is not None and second.price > max_price)
+                    or via in destinations or via in origins or via not in final or not _bookable(second)):
+                continue
+            for last in final.leaving(via, second.arrival_time + min_layover, second.arrival_time + max_layover):
+                best.offer(Itinerary((first, second, last)))
+
+    return best.ranked()
@@ -0,0 +1,163 @@
+import calendar
+import heapq
+import threading
+import time
+from collections import Counter, OrderedDict
+from datetime import date
+from operator import itemgetter
+
+
+class Board:
+    """A ranking read from a daily bucket table: members of an owner by summed value."""
+
+    def __init__(self, table, owner_column, day_column, member_column, value_column, member_key, value_key):
+        self.table = table
+        self.owner_column = owner_column
+        self.day_column = day_column
+        self.member_column = member_column
+        self.value_column = value_column
+        self.member_key = member_key
+        self.value_key = value_key
+
+    def load(self, db, owner, start):
+        """{member: total} over the owner's buckets from start on."""
+        cursor = db.cursor()
+        try:
+            cursor.execute(f"""
+                SELECT {self.member_column}, SUM({self.value_column})
+                FROM {self.table}
+                WHERE {self.owner_column} = %s AND {self.day_column} >= %s
+                GROUP BY {self.member_column}
+            """, (owner, start))
+            return Counter({member: value for member, value in cursor.fetchall() if value})
+        finally:
+            cursor.close()
+
+
+# Every ranking shown on the report pages, by name; see sales_rollup.py and commission_ledger.py
+BOARDS = {
+    # Staff pages, per airline
+    'destinations': Board('daily_destination_rollup', 'airline_name', 'sale_date',
+                          'arrival_airport', 'tickets_sold', 'destination', 'tickets_sold'),
+    'agents_by_tickets': Board('daily_agent_rollup', 'airline_name', 'sale_date',
+                               'booking_agent_email', 'tickets_sold', 'booking_agent_email', 'tickets_sold'),
+    'agents_by_commission': Board('daily_agent_rollup', 'airline_name', 'sale_date',
+                                  'booking_agent_email', 'commission', 'booking_agent_email', 'commission_earned'),
+    # Flights taken are bucketed by departure date, so the window includes upcoming flights
+    'customers_by_flights': Board('daily_customer_flights', 'airline_name', 'departure_date',
+                                  'customer_email', 'tickets', 'customer_email', 'flights_taken'),
+    # Booking agent pages, per agent
+    'agent_customers_by_tickets': Board('daily_agent_customer_commission', 'booking_agent_email', 'sale_date',
+                                        'customer_email', 'tickets', 'customer_email', 'tickets_bought'),
+    'agent_customers_by_commission': Board('daily_agent_customer_commission', 'booking_agent_email', 'sale_date',
+                                           'customer_email', 'commission', 'customer_email', 'total_commission'),
+}
+
+
+def window_start(months, today):
+    """today minus months, clamped to the month's last day like MySQL's DATE_SUB."""
+    index = today.year * 12 + today.month - 1 - months
+    year, month = divmod(index, 12)
+    month += 1
+    return date(year, month, min(today.day, calendar.monthrange(year, month)[1]))
+
+
+class _Window:
+    __slots__ = ('start', 'today', 'loaded_at', 'totals', 'tops')
+
+    def __init__(self, start, today, totals):
+        self.start = start
+        self.today = today
+        self.loaded_at = time.monotonic()
+        self.totals = totals
+        self.tops = {}
+
+
+class Leaderboards:
+    """Sliding-window top-K rankings per owner (airline or booking agent).
+
+    A window's totals per member are summed from the daily buckets once,
+    then kept current in memory: purchases made through this process add to
+    every loaded window they fall in, and the top K is recomputed only after
+    a change, so a page view is a dictionary lookup. Windows are reloaded
+    after `ttl` seconds, which bounds staleness from other worker processes
+    (and the rare purchase committed while its window was loading, which may
+    be counted twice), and whenever the date changes so the window slides.
+    """
+
+    def __init__(self, ttl=60, max_owners=1000):
+        self.ttl = ttl
+        self.max_owners = max_owners
+        self._lock = threading.Lock()
+        # (board name, owner) -> {months: _Window}, least recently used first
+        self._owners = OrderedDict()
+
+    def configure(self, ttl=60, max_owners=1000):
+        self.ttl = ttl
+        self.max_owners = max_owners
+        self.clear()
+
+    def top(self, db, board_name, owner, months, limit, today=None):
+        """The top `limit` members over the last `months` months, as dicts keyed by the board's names."""
+        board = BOARDS[board_name]
+        today = today or date.today()
+        key = (board_name, owner)
+        with self._lock:
+            window = self._fresh(key, months, today)
+            if window is not None:
+                return self._top(board, window, limit)
+
+        start = window_start(months, today)
+        window = _Window(start, today, board.load(db, owner, start))
+        with self._lock:
+            self._owners.setdefault(key, {})[months] = window
+            self._owners.move_to_end(key)
+            while len(self._owners) > self.max_owners:
+                self._owners.popitem(last=False)
+            return self._top(board, window, limit)
+
+    def _fresh(self, key, months, today):
+        windows = self._owners.get(key)
+        window = windows.get(months) if windows else None
+        if window is None or window.today != today or time.monotonic() - window.loaded_at > self.ttl:
+            return None
+        self._owners.move_to_end(key)
+        return window
+
+    @staticmethod
+    def _top(board, window, limit):
+        top = window.tops.get(limit)
+        if top is None:
+            top = window.tops[limit] = heapq.nlargest(limit, window.totals.items(), key=itemgetter(1))
+        return [{board.member_key: member, board.value_key: value} for member, value in top]
+
+    def record(self, deltas):
+        """Add {(board name, owner, day, member): amount} to the loaded windows that include each day."""
+        with self._lock:
+            for (board_name, owner, day, member), amount in deltas.items():
+                for window in self._owners.get((board_name, owner), {}).values():
+                    if day >= window.start:
+                        window.totals[member] += amount
+                        window.tops.clear()
+
+    def record_purchase(self, sale_date, booking_agent_email, tickets):
+        """Apply a committed purchase of tickets given as
+        (airline_name, arrival_airport, departure_date, customer_email, commission) tuples.
+        """
+        deltas = Counter()
+        for airline_name, arrival_airport, departure_date, customer_email, commission in tickets:
+            deltas['destinations', airline_name, sale_date, arrival_airport] += 1
+            deltas['customers_by_flights', airline_name, departure_date, customer_email] += 1
+            if booking_agent_email:
+                deltas['agents_by_tickets', airline_name, sale_date, booking_agent_email] += 1
+                deltas['agents_by_commission', airline_name, sale_date, booking_agent_email] += commission
+                deltas['agent_customers_by_tickets', booking_agent_email, sale_date, customer_email] += 1
+                deltas['agent_customers_by_commission', booking_agent_email, sale_date, customer_email] += commission
+        self.record(deltas)
+
+    def clear(self):
+        with self._lock:
+            self._owners.clear()
+
+
+leaderboards = Leaderboards()
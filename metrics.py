@@ -0,0 +1,198 @@
+import threading
+import weakref
+
+
+# Latency buckets in seconds, from sub-millisecond cache hits to slow reports
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+
+class _Metric:
+    """Base for metrics whose values live in per-thread shards.
+
+    Each thread only ever writes its own shard, so recording a value takes
+    no lock; a scrape sums the shards. Shards of threads that have exited are
+    folded into one retired shard so short-lived request threads do not pile up.
+    """
+
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._shards = []
+        self._retired = {}
+
+    def _shard(self):
+        shard = getattr(self._local, 'values', None)
+        if shard is None:
+            shard = self._local.values = {}
+            with self._lock:
+                self._shards.append((weakref.ref(threading.current_thread()), shard))
+        return shard
+
+    def _new_value(self):
+        raise NotImplementedError
+
+    def _merge(self, into, values):
+        raise NotImplementedError
+
+    def _collect(self):
+        totals = {}
+        with self._lock:
+            live = []
+            for thread_ref, shard in self._shards:
+                thread = thread_ref()
+                if thread is None or not thread.is_alive():
+                    for key, value in list(shard.items()):
+                        self._merge(self._retired.setdefault(key, self._new_value()), value)
+                else:
+                    live.append((thread_ref, shard))
+            self._shards = live
+            shards = [shard for _, shard in live] + [self._retired]
+            for shard in shards:
+                for key, value in list(shard.items()):
+                    self._merge(totals.setdefault(key, self._new_value()), value)
+        return totals
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def _new_value(self):
+        return [0.0]
+
+    def _merge(self, into, values):
+        into[0] += values[0]
+
+    def inc(self, *labelvalues, amount=1):
+        shard = self._shard()
+        value = shard.get(labelvalues)
+        if value is None:
+            value = shard[labelvalues] = [0.0]
+        value[0] += amount
+
+    def expose(self):
+        return [f"{self.name}{_labels(self.labelnames, key)} {_number(value[0])}"
+                for key, value in sorted(self._collect().items())]
+
+
+class Gauge(Counter):
+    """Up/down gauge; the value is the sum of every thread's increments."""
+
+    kind = 'gauge'
+
+    def dec(self, *labelvalues, amount=1):
+        self.inc(*labelvalues, amount=-amount)
+
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_value(self):
+        # One count per bucket, then +Inf, then the sum
+        return [0.0] * (len(self.buckets) + 2)
+
+    def _merge(self, into, values):
+        for i, value in enumerate(values):
+            into[i] += value
+
+    def observe(self, amount, *labelvalues):
+        shard = self._shard()
+        value = shard.get(labelvalues)
+        if value is None:
+            value = shard[labelvalues] = self._new_value()
+        # Counts are stored per bucket and made cumulative at scrape time
+        for i, bound in enumerate(self.buckets):
+            if amount <= bound:
+                value[i] += 1
+                break
+        else:
+            value[-2] += 1
+        value[-1] += amount
+
+    def expose(self):
+        lines = []
+        for key, value in sorted(self._collect().items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + ('+Inf',), value[:-1]):
+                cumulative += count
+                le = bound if bound == '+Inf' else repr(float(bound))
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, key, [('le', le)])} {int(cumulative)}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, key)} {repr(float(value[-1]))}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, key)} {int(cumulative)}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+        self._callbacks = []
+
+    def counter(self, *args, **kwargs):
+        return self._add(Counter(*args, **kwargs))
+
+    def gauge(self, *args, **kwargs):
+        return self._add(Gauge(*args, **kwargs))
+
+    def histogram(self, *args, **kwargs):
+        return self._add(Histogram(*args, **kwargs))
+
+    def _add(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def gauge_callback(self, name, documentation, labelname, read):
+        """Gauge computed at scrape time; read() returns {label value: number}."""
+        self._callbacks.append((name, documentation, labelname, read))
+
+    def expose(self):
+        """All metrics in the Prometheus text exposition format."""
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.expose())
+        for name, documentation, labelname, read in self._callbacks:
+            lines.append(f"# HELP {name} {documentation}")
+            lines.append(f"# TYPE {name} gauge")
+            for label, value in sorted(read().items()):
+                lines.append(f"{name}{_labels((labelname,), (label,))} {_number(value)}")
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+request_duration = registry.histogram(
+    'flask_request_duration_seconds', "Request latency by endpoint", ('endpoint', 'method', 'status'))
+requests_in_flight = registry.gauge(
+    'flask_requests_in_flight', "Requests currently being handled", ('endpoint',))
+template_render = registry.histogram(
+    'flask_template_render_seconds', "render_template time by template", ('template',))
+db_connect = registry.histogram(
+    'db_connect_seconds', "Time get_db() spent borrowing or opening a connection")
+request_sql = registry.histogram(
+    'flask_request_sql_seconds', "SQL time per request by endpoint", ('endpoint',))
+request_sql_statements = registry.counter(
+    'flask_request_sql_statements_total', "SQL statements run by endpoint", ('endpoint',))
@@ -0,0 +1,11 @@
+-- Composite indexes for the range predicates built in flight_search.py.
+-- Every search filters on an airport set (or airline) and a departure_time range,
+-- so the leading equality column is followed by departure_time.
+
+CREATE INDEX idx_flight_departure_airport_time ON flight (departure_airport, departure_time);
+CREATE INDEX idx_flight_arrival_airport_time ON flight (arrival_airport, departure_time);
+CREATE INDEX idx_flight_airline_time ON flight (airline_name, departure_time);
+
+-- /flight_status looks flights up by number alone, which the (airline_name, flight_num)
+-- primary key cannot serve.
+CREATE INDEX idx_flight_num_departure_time ON flight (flight_num, departure_time);
@@ -0,0 +1,30 @@
+-- Daily sales rollups read by the staff report pages (see sales_rollup.py).
+-- Rows are keyed by the airline that operates the flight and the purchase date.
+-- They are maintained on every purchase; fill them for existing data with
+--   flask --app app rebuild-rollups
+
+CREATE TABLE IF NOT EXISTS daily_sales_rollup (
+    airline_name VARCHAR(50) NOT NULL,
+    sale_date DATE NOT NULL,
+    tickets_sold INT NOT NULL DEFAULT 0,
+    direct_revenue DECIMAL(14, 2) NOT NULL DEFAULT 0,
+    indirect_revenue DECIMAL(14, 2) NOT NULL DEFAULT 0,
+    PRIMARY KEY (airline_name, sale_date)
+);
+
+CREATE TABLE IF NOT EXISTS daily_destination_rollup (
+    airline_name VARCHAR(50) NOT NULL,
+    sale_date DATE NOT NULL,
+    arrival_airport VARCHAR(50) NOT NULL,
+    tickets_sold INT NOT NULL DEFAULT 0,
+    PRIMARY KEY (airline_name, sale_date, arrival_airport)
+);
+
+CREATE TABLE IF NOT EXISTS daily_agent_rollup (
+    airline_name VARCHAR(50) NOT NULL,
+    sale_date DATE NOT NULL,
+    booking_agent_email VARCHAR(50) NOT NULL,
+    tickets_sold INT NOT NULL DEFAULT 0,
+    total_sales DECIMAL(14, 2) NOT NULL DEFAULT 0,
+    PRIMARY KEY (airline_name, sale_date, booking_agent_email)
+);
@@ -0,0 +1,19 @@
+-- Per-flight seat counters checked and updated at purchase time (see seat_inventory.py).
+-- A purchase only succeeds if a guarded UPDATE can move seats_sold without passing
+-- seats_total, so two buyers can never both take the last seat.
+
+CREATE TABLE IF NOT EXISTS flight_seat_inventory (
+    airline_name VARCHAR(50) NOT NULL,
+    flight_num INT NOT NULL,
+    seats_total INT NOT NULL,
+    seats_sold INT NOT NULL DEFAULT 0,
+    version INT NOT NULL DEFAULT 0,
+    PRIMARY KEY (airline_name, flight_num)
+);
+
+-- Backfill counters for existing flights from their airplane and the tickets already sold
+INSERT IGNORE INTO flight_seat_inventory (airline_name, flight_num, seats_total, seats_sold)
+SELECT f.airline_name, f.flight_num, a.seats,
+       (SELECT COUNT(*) FROM ticket t WHERE t.airline_name = f.airline_name AND t.flight_num = f.flight_num)
+FROM flight f
+JOIN airplane a ON a.airline_name = f.airline_name AND a.airplane_id = f.airplane_id;
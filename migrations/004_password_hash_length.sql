@@ -0,0 +1,7 @@
+-- Password columns sized for the scrypt hashes written by auth.py
+-- ("scrypt$N$r$p$salt$key", about 90 characters) instead of 32-character MD5 digests.
+-- Existing MD5 digests keep working and are upgraded on each user's next login.
+
+ALTER TABLE customer MODIFY password VARCHAR(255) NOT NULL;
+ALTER TABLE booking_agent MODIFY password VARCHAR(255) NOT NULL;
+ALTER TABLE airline_staff MODIFY password VARCHAR(255) NOT NULL;
@@ -0,0 +1,20 @@
+-- Per-customer monthly spending read by /track_spending (see spending_ledger.py).
+-- Rows are keyed by the customer and the first day of the purchase month, and are
+-- maintained on every purchase; rebuild them with
+--   flask --app app rebuild-rollups
+
+CREATE TABLE IF NOT EXISTS customer_monthly_spending (
+    customer_email VARCHAR(50) NOT NULL,
+    spending_month DATE NOT NULL,
+    tickets INT NOT NULL DEFAULT 0,
+    total_spent DECIMAL(14, 2) NOT NULL DEFAULT 0,
+    PRIMARY KEY (customer_email, spending_month)
+);
+
+-- Backfill from the purchases already made
+INSERT IGNORE INTO customer_monthly_spending (customer_email, spending_month, tickets, total_spent)
+SELECT p.customer_email, p.purchase_date - INTERVAL (DAYOFMONTH(p.purchase_date) - 1) DAY, COUNT(*), SUM(f.price)
+FROM purchases p
+JOIN ticket t ON p.ticket_id = t.ticket_id
+JOIN flight f ON t.airline_name = f.airline_name AND t.flight_num = f.flight_num
+GROUP BY p.customer_email, p.purchase_date - INTERVAL (DAYOFMONTH(p.purchase_date) - 1) DAY;
@@ -0,0 +1,44 @@
+-- Booking agent commission (see commission_ledger.py): one ledger row per ticket an
+-- agent sells, with the rate applied at sale time, plus daily totals per agent and
+-- per (agent, customer). daily_agent_commission also carries running totals, so the
+-- commission for any date range is the difference of two rows.
+-- Rows are maintained on every purchase; fill them for existing data with
+--   flask --app app rebuild-rollups
+
+CREATE TABLE IF NOT EXISTS agent_commission_ledger (
+    ticket_id INT NOT NULL,
+    booking_agent_email VARCHAR(50) NOT NULL,
+    customer_email VARCHAR(50) NOT NULL,
+    airline_name VARCHAR(50) NOT NULL,
+    flight_num INT NOT NULL,
+    sale_date DATE NOT NULL,
+    price DECIMAL(10, 2) NOT NULL,
+    commission_rate DECIMAL(5, 4) NOT NULL,
+    commission DECIMAL(10, 2) NOT NULL,
+    PRIMARY KEY (ticket_id),
+    KEY idx_commission_agent_date (booking_agent_email, sale_date)
+);
+
+CREATE TABLE IF NOT EXISTS daily_agent_commission (
+    booking_agent_email VARCHAR(50) NOT NULL,
+    sale_date DATE NOT NULL,
+    tickets INT NOT NULL DEFAULT 0,
+    total_sales DECIMAL(14, 2) NOT NULL DEFAULT 0,
+    commission DECIMAL(14, 2) NOT NULL DEFAULT 0,
+    cum_tickets INT NOT NULL DEFAULT 0,
+    cum_commission DECIMAL(16, 2) NOT NULL DEFAULT 0,
+    PRIMARY KEY (booking_agent_email, sale_date)
+);
+
+CREATE TABLE IF NOT EXISTS daily_agent_customer_commission (
+    booking_agent_email VARCHAR(50) NOT NULL,
+    customer_email VARCHAR(50) NOT NULL,
+    sale_date DATE NOT NULL,
+    tickets INT NOT NULL DEFAULT 0,
+    commission DECIMAL(14, 2) NOT NULL DEFAULT 0,
+    PRIMARY KEY (booking_agent_email, sale_date, customer_email)
+);
+
+-- Commission earned per airline, so the staff booking agent report sums recorded
+-- commission instead of applying a rate of its own
+ALTER TABLE daily_agent_rollup ADD COLUMN commission DECIMAL(14, 2) NOT NULL DEFAULT 0;
@@ -0,0 +1,12 @@
+-- Tickets per customer on each airline's flights, bucketed by departure date, for the
+-- staff frequent customer report (see sales_rollup.py and leaderboard.py).
+-- Rows are maintained on every purchase; fill them for existing data with
+--   flask --app app rebuild-rollups
+
+CREATE TABLE IF NOT EXISTS daily_customer_flights (
+    airline_name VARCHAR(50) NOT NULL,
+    departure_date DATE NOT NULL,
+    customer_email VARCHAR(50) NOT NULL,
+    tickets INT NOT NULL DEFAULT 0,
+    PRIMARY KEY (airline_name, departure_date, customer_email)
+);
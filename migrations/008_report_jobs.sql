@@ -0,0 +1,26 @@
+-- Background report refreshes (see report_jobs.py). report_job is the work queue that
+-- worker threads claim from with SELECT ... FOR UPDATE SKIP LOCKED (MySQL 8.0+);
+-- report_snapshot keeps the latest computed dataset of each report and owner.
+
+CREATE TABLE IF NOT EXISTS report_job (
+    job_id INT AUTO_INCREMENT PRIMARY KEY,
+    report VARCHAR(50) NOT NULL,
+    owner VARCHAR(50) NOT NULL,
+    status ENUM('queued', 'running', 'done', 'failed') NOT NULL DEFAULT 'queued',
+    requested_at DATETIME NOT NULL,
+    started_at DATETIME NULL,
+    finished_at DATETIME NULL,
+    worker VARCHAR(100) NULL,
+    error TEXT NULL,
+    KEY idx_report_job_status (status, job_id),
+    KEY idx_report_job_owner (owner, job_id)
+);
+
+CREATE TABLE IF NOT EXISTS report_snapshot (
+    report VARCHAR(50) NOT NULL,
+    owner VARCHAR(50) NOT NULL,
+    data MEDIUMTEXT NOT NULL,
+    computed_at DATETIME NOT NULL,
+    job_id INT NULL,
+    PRIMARY KEY (report, owner)
+);
@@ -0,0 +1,22 @@
+-- Cheapest fare and number of bookable flights per city pair and departure day, read
+-- by /fare_calendar (see fare_calendar.py). Rows are maintained when flights are
+-- created, imported or change status; rebuild them with
+--   flask --app app rebuild-fare-calendar
+
+CREATE TABLE IF NOT EXISTS fare_calendar (
+    origin_city VARCHAR(50) NOT NULL,
+    destination_city VARCHAR(50) NOT NULL,
+    departure_date DATE NOT NULL,
+    min_price DECIMAL(10, 2) NOT NULL,
+    flights INT NOT NULL DEFAULT 0,
+    PRIMARY KEY (origin_city, destination_city, departure_date)
+);
+
+-- Backfill from the flights already scheduled
+INSERT IGNORE INTO fare_calendar (origin_city, destination_city, departure_date, min_price, flights)
+SELECT o.airport_city, d.airport_city, DATE(f.departure_time), MIN(f.price), COUNT(*)
+FROM flight f
+JOIN airport o ON o.airport_name = f.departure_airport
+JOIN airport d ON d.airport_name = f.arrival_airport
+WHERE LOWER(f.status) <> 'cancelled'
+GROUP BY o.airport_city, d.airport_city, DATE(f.departure_time);
@@ -0,0 +1,5 @@
+-- The booking agent purchase form ranks an agent's own customers first (see
+-- customer_picker.py), read from purchases grouped by customer for one agent.
+-- This index covers that query, so it never touches the table rows.
+
+CREATE INDEX idx_purchases_agent_customer ON purchases (booking_agent_email, customer_email, purchase_date);
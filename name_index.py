@@ -0,0 +1,74 @@
+from bisect import bisect_left
+
+
+def trigrams(text):
+    """The three-character substrings of text."""
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+def _padded_trigrams(text):
+    # Padding gives the start and end of a name trigrams of their own, so short
+    # and misspelt terms still share some with the names they are close to
+    return trigrams(f"  {text} ")
+
+
+class NameIndex:
+    """Prefix and trigram index over short names, for typeahead and substring matching.
+
+    Names are compared casefolded. The sorted key list answers prefix
+    queries with a bisect; the trigram postings answer substring queries by
+    intersecting the postings of the term's trigrams and ranking near misses
+    for fuzzy suggestions. Built once and then only read, so readers need no
+    lock; changes build a new index.
+    """
+
+    def __init__(self, names=()):
+        self._names = {}
+        self._postings = {}
+        for name in names:
+            key = name.strip().casefold()
+            if not key or key in self._names:
+                continue
+            self._names[key] = name
+            for trigram in _padded_trigrams(key):
+                self._postings.setdefault(trigram, set()).add(key)
+        self._keys = sorted(self._names)
+
+    def __len__(self):
+        return len(self._keys)
+
+    def starting_with(self, prefix, limit=None):
+        """Names starting with prefix, in alphabetical order."""
+        prefix = prefix.strip().casefold()
+        names = []
+        for key in self._keys[bisect_left(self._keys, prefix):]:
+            if not key.startswith(prefix) or len(names) == limit:
+                break
+            names.append(self._names[key])
+        return names
+
+    def containing(self, term):
+        """Names containing term anywhere."""
+        term = term.strip().casefold()
+        if len(term) < 3:
+            return [self._names[key] for key in self._keys if term in key]
+        postings = sorted((self._postings.get(trigram, set()) for trigram in trigrams(term)), key=len)
+        candidates = set.intersection(*postings) if postings else set()
+        return [self._names[key] for key in sorted(candidates) if term in key]
+
+    def similar(self, term, limit, threshold=0.3):
+        """Up to limit names sharing the most trigrams with term, for misspelt input."""
+        term = term.strip().casefold()
+        wanted = _padded_trigrams(term)
+        shared = {}
+        for trigram in wanted:
+            for key in self._postings.get(trigram, ()):
+                shared[key] = shared.get(key, 0) + 1
+        scored = []
+        for key, count in shared.items():
+            # Share of the trigrams in either the term or the name that both have
+            score = count / (len(wanted) + len(key) + 1 - count)
+            if score >= threshold:
+                scored.append((-score, key))
+        scored.sort()
+        return [self._names[key] for _, key in scored[:limit]]
@@ -0,0 +1,129 @@
+import base64
+import json
+from datetime import date, datetime
+from decimal import Decimal
+
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+# Rows stream out of an unbuffered cursor this many at a time
+STREAM_CHUNK = 1000
+
+# Keyset order shared by every flight listing
+FLIGHT_ORDER = ('f.departure_time', 'f.airline_name', 'f.flight_num')
+
+
+def page_size(value, default=DEFAULT_PAGE_SIZE):
+    try:
+        size = int(value)
+    except (TypeError, ValueError):
+        return default
+    return max(1, min(size, MAX_PAGE_SIZE))
+
+
+def _json_default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    raise TypeError(f"Cannot serialize {type(value).__name__}")
+
+
+def encode_cursor(values):
+    """Opaque page token holding the sort key of the last row on a page."""
+    tagged = [{'$dt': value.isoformat()} if isinstance(value, datetime) else value for value in values]
+    return base64.urlsafe_b64encode(json.dumps(tagged).encode()).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    """Inverse of encode_cursor; raises ValueError for a malformed token."""
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        tagged = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return [datetime.fromisoformat(value['$dt']) if isinstance(value, dict) else value
+                for value in tagged]
+    except (ValueError, TypeError, KeyError) as e:
+        raise ValueError(f"Invalid page cursor: {e}")
+
+
+def keyset_clause(columns, values):
+    """SQL for "(columns) > (values)" expanded so MySQL can use a range scan.
+
+    (a, b, c) > (x, y, z) becomes a > x OR (a = x AND (b > y OR (b = y AND c > z))).
+    """
+    if len(columns) != len(values):
+        raise ValueError("Invalid page cursor: wrong number of values")
+    clause, params = f"{columns[-1]} > %s", [values[-1]]
+    for column, value in zip(reversed(columns[:-1]), reversed(values[:-1])):
+        clause = f"{column} > %s OR ({column} = %s AND ({clause}))"
+        params = [value, value] + params
+    return f"({clause})", params
+
+
+def _row_key(row, columns):
+    return [row[column.split('.')[-1]] for column in columns]
+
+
+def fetch_page(db, query, params, order_columns, after=None, limit=DEFAULT_PAGE_SIZE):
+    """One page of a listing as (dict rows, next_cursor).
+
+    query must end inside a WHERE clause and select every order column under
+    its bare name; the keyset condition, ORDER BY and LIMIT are appended.
+    next_cursor is None on the last page.
+    """
+    sql, sql_params = query, list(params)
+    if after:
+        clause, extra = keyset_clause(order_columns, decode_cursor(after))
+        sql += f" AND {clause}"
+        sql_params += extra
+    sql += f" ORDER BY {', '.join(order_columns)} LIMIT %s"
+    sql_params.append(limit + 1)
+
+    cursor = db.cursor(dictionary=True)
+    try:
+        cursor.execute(sql, tuple(sql_params))
+        rows = cursor.fetchall()
+    finally:
+        cursor.close()
+
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, encode_cursor(_row_key(rows[-1], order_columns))
+
+
+def page_of(items, key, after=None, limit=DEFAULT_PAGE_SIZE):
+    """fetch_page for results already in memory and sorted by key(item)."""
+    if after:
+        last = decode_cursor(after)
+        items = [item for item in items if list(key(item)) > last]
+    if len(items) <= limit:
+        return items, None
+    items = items[:limit]
+    return items, encode_cursor(list(key(items[-1])))
+
+
+def stream_jsonl(db, query, params, order_columns):
+    """Yield every row of a listing as JSON lines, reading from a server-side cursor.
+
+    The cursor is unbuffered, so rows are pulled from MySQL in chunks as the
+    response is written and memory stays flat whatever the result size.
+    """
+    sql = query + f" ORDER BY {', '.join(order_columns)}"
+    cursor = db.cursor(dictionary=True, buffered=False)
+    try:
+        cursor.execute(sql, tuple(params))
+        while True:
+            rows = cursor.fetchmany(STREAM_CHUNK)
+            if not rows:
+                break
+            yield ''.join(json.dumps(row, default=_json_default) + '\n' for row in rows)
+    finally:
+        cursor.close()
+
+
+def jsonl_lines(items):
+    """JSON lines for rows already in memory."""
+    for item in items:
+        yield json.dumps(item, default=_json_default) + '\n'
@@ -0,0 +1,222 @@
+import logging
+import re
+import threading
+import time
+from collections import Counter, deque
+
+
+# Profiler settings read from config.py, with defaults:
+#   QUERY_PROFILER_ENABLED   wrap get_db() connections and record every statement (True)
+#   SLOW_QUERY_MS            statements slower than this go to the slow-query log (200)
+#   SLOW_QUERY_LOG_FILE      also write the slow-query log to this file (None)
+#   QUERY_PROFILER_SAMPLES   latest timings kept per fingerprint for percentiles (1000)
+slow_log = logging.getLogger('slow_query')
+
+_COMMENTS = re.compile(r'/\*.*?\*/|--[^\n]*', re.S)
+_STRINGS = re.compile(r"'(?:[^'\\]|\\.)*'|\"(?:[^\"\\]|\\.)*\"")
+_PLACEHOLDERS = re.compile(r'%\(\w+\)s|%s')
+_NUMBERS = re.compile(r'\b\d+(?:\.\d+)?\b')
+_LISTS = re.compile(r'\(\s*\?(?:\s*,\s*\?)+\s*\)')
+_ROWS = re.compile(r'(\(\?\+\))(?:\s*,\s*\(\?\+\))+')
+_SPACE = re.compile(r'\s+')
+
+
+def fingerprint(statement):
+    """Statement with literals and parameters replaced, so repeated queries group together.
+
+    "WHERE a IN (%s, %s, %s)" and "WHERE a IN (%s)" both become "WHERE a IN (?+)",
+    and multi-row VALUES lists collapse to one row.
+    """
+    text = _COMMENTS.sub(' ', statement)
+    text = _STRINGS.sub('?', text)
+    text = _PLACEHOLDERS.sub('?', text)
+    text = _NUMBERS.sub('?', text)
+    text = _LISTS.sub('(?+)', text)
+    text = re.sub(r'\(\s*\?\s*\)', '(?+)', text)
+    text = _ROWS.sub(r'\1', text)
+    return _SPACE.sub(' ', text).strip()
+
+
+def _percentile(ordered, fraction):
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+class _Stats:
+    __slots__ = ('count', 'total_ms', 'max_ms', 'rows', 'samples', 'routes')
+
+    def __init__(self, samples):
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.rows = 0
+        self.samples = deque(maxlen=samples)
+        self.routes = Counter()
+
+
+class QueryProfiler:
+    """Aggregated timings per statement fingerprint, plus the slow-query log."""
+
+    def __init__(self, slow_ms=200, samples=1000):
+        self.slow_ms = slow_ms
+        self.samples = samples
+        self.enabled = True
+        self._lock = threading.Lock()
+        self._stats = {}
+
+    def configure(self, config):
+        self.enabled = config.get('QUERY_PROFILER_ENABLED', True)
+        self.slow_ms = config.get('SLOW_QUERY_MS', 200)
+        self.samples = config.get('QUERY_PROFILER_SAMPLES', 1000)
+        log_file = config.get('SLOW_QUERY_LOG_FILE')
+        if log_file:
+            handler = logging.FileHandler(log_file)
+            handler.setFormatter(logging.Formatter('%(asctime)s %(message)s'))
+            slow_log.addHandler(handler)
+
+    def record(self, statement, elapsed_ms, rows, route):
+        key = fingerprint(statement)
+        with self._lock:
+            stats = self._stats.get(key)
+            if stats is None:
+                stats = self._stats[key] = _Stats(self.samples)
+            stats.count += 1
+            stats.total_ms += elapsed_ms
+            stats.max_ms = max(stats.max_ms, elapsed_ms)
+            stats.rows += max(rows, 0)
+            stats.samples.append(elapsed_ms)
+            stats.routes[route] += 1
+
+        if elapsed_ms >= self.slow_ms:
+            slow_log.warning(f"slow query {elapsed_ms:.1f} ms rows={rows} route={route}: {key}")
+
+    def wrap(self, conn, route):
+        return ProfiledConnection(conn, self, route) if self.enabled else conn
+
+    def report(self, limit=50):
+        """Per-fingerprint stats, most total time first."""
+        with self._lock:
+            items = [(key, stats.count, stats.total_ms, stats.max_ms, stats.rows,
+                      sorted(stats.samples), stats.routes.most_common(5))
+                     for key, stats in self._stats.items()]
+        items.sort(key=lambda item: item[2], reverse=True)
+        return [{
+            'fingerprint': key,
+            'count': count,
+            'total_ms': round(total_ms, 3),
+            'avg_ms': round(total_ms / count, 3),
+            'p50_ms': round(_percentile(samples, 0.50), 3),
+            'p95_ms': round(_percentile(samples, 0.95), 3),
+            'p99_ms': round(_percentile(samples, 0.99), 3),
+            'max_ms': round(max_ms, 3),
+            'rows': rows,
+            'routes': dict(routes),
+        } for key, count, total_ms, max_ms, rows, samples, routes in items[:limit]]
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+
+
+class ProfiledCursor:
+    """Cursor wrapper timing each statement from execute() until its rows are read.
+
+    With unbuffered cursors most of the cost is in the fetches, so a
+    statement is recorded when the next one starts or the cursor closes,
+    with the time and row count of every fetch in between.
+    """
+
+    def __init__(self, cursor, profiler, route, connection=None):
+        self._cursor = cursor
+        self._profiler = profiler
+        self._route = route
+        self._connection = connection
+        self._statement = None
+        self._elapsed = 0.0
+        self._rows = 0
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def _finish(self):
+        if self._statement is not None:
+            self._profiler.record(self._statement, self._elapsed * 1000, self._rows, self._route)
+            if self._connection is not None:
+                self._connection.sql_seconds += self._elapsed
+                self._connection.statements += 1
+            self._statement = None
+
+    def _timed(self, method, *args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return method(*args, **kwargs)
+        finally:
+            self._elapsed += time.perf_counter() - started
+
+    def execute(self, operation, params=None, *args, **kwargs):
+        self._finish()
+        self._statement, self._elapsed, self._rows = operation, 0.0, 0
+        result = self._timed(self._cursor.execute, operation, params, *args, **kwargs)
+        # rowcount is known now for DML and buffered SELECTs; fetches add the rest
+        if self._cursor.rowcount > 0 and not self._cursor.with_rows:
+            self._rows = self._cursor.rowcount
+        return result
+
+    def executemany(self, operation, seq_params, *args, **kwargs):
+        self._finish()
+        self._statement, self._elapsed, self._rows = operation, 0.0, 0
+        result = self._timed(self._cursor.executemany, operation, seq_params, *args, **kwargs)
+        self._rows = max(self._cursor.rowcount, 0)
+        return result
+
+    def fetchone(self):
+        row = self._timed(self._cursor.fetchone)
+        if row is not None:
+            self._rows += 1
+        return row
+
+    def fetchmany(self, *args, **kwargs):
+        rows = self._timed(self._cursor.fetchmany, *args, **kwargs)
+        self._rows += len(rows)
+        return rows
+
+    def fetchall(self):
+        rows = self._timed(self._cursor.fetchall)
+        self._rows += len(rows)
+        return rows
+
+    def __iter__(self):
+        return iter(self.fetchone, None)
+
+    def close(self):
+        self._finish()
+        return self._cursor.close()
+
+
+class ProfiledConnection:
+    """Connection wrapper handing out ProfiledCursors; everything else is passed through."""
+
+    def __init__(self, conn, profiler, route):
+        self.raw = conn
+        self.route = route
+        self._profiler = profiler
+        self._cursors = []
+        # Totals over the connection's borrow, i.e. one request
+        self.sql_seconds = 0.0
+        self.statements = 0
+
+    def __getattr__(self, name):
+        return getattr(self.raw, name)
+
+    def cursor(self, *args, **kwargs):
+        cursor = ProfiledCursor(self.raw.cursor(*args, **kwargs), self._profiler, self.route, self)
+        self._cursors.append(cursor)
+        return cursor
+
+    def finish(self):
+        """Record the last statement of cursors the route never closed."""
+        for cursor in self._cursors:
+            cursor._finish()
+        self._cursors.clear()
+
+
+profiler = QueryProfiler()
@@ -0,0 +1,392 @@
+import json
+import logging
+import os
+import socket
+import threading
+from datetime import date, datetime
+from decimal import Decimal
+
+from mysql.connector import Error
+from mysql.connector.errors import PoolError
+
+from db_pool import ConnectionPool
+
+
+# Job runner settings read from config.py, with defaults:
+#   REPORT_JOB_WORKERS        worker threads started in each web process; 0 leaves jobs to
+#                             `flask --app app report-worker` (1)
+#   REPORT_JOB_MAX_RUNNING    jobs running at once across every process (2)
+#   REPORT_REFRESH_INTERVAL   seconds before a snapshot is refreshed, on a schedule or when read (300)
+#   REPORT_JOB_POLL_INTERVAL  seconds an idle worker waits before looking for work again (2)
+#   REPORT_JOB_TIMEOUT        running jobs older than this are marked failed (600)
+JOB_DEFAULTS = {
+    'REPORT_JOB_WORKERS': 1,
+    'REPORT_JOB_MAX_RUNNING': 2,
+    'REPORT_REFRESH_INTERVAL': 300,
+    'REPORT_JOB_POLL_INTERVAL': 2,
+    'REPORT_JOB_TIMEOUT': 600,
+}
+
+# Tables used by this module; see migrations/008_report_jobs.sql
+JOB_TABLES = ('report_job', 'report_snapshot')
+
+# MySQL named locks: one per running-job slot, and one for the process that schedules refreshes
+SLOT_LOCK = 'report_jobs:slot:{}'
+SCHEDULER_LOCK = 'report_jobs:scheduler'
+
+
+def _json_default(value):
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    raise TypeError(f"Cannot store {type(value).__name__} in a report snapshot")
+
+
+class Report:
+    """A precomputed dataset: compute(db, owner) -> JSON-serialisable data, for each of owners(db)."""
+
+    def __init__(self, name, compute, owners):
+        self.name = name
+        self.compute = compute
+        self.owners = owners
+
+
+def enqueue(db, report, owner):
+    """Queue a refresh unless one is already waiting; returns the queued job's id."""
+    cursor = db.cursor()
+    try:
+        cursor.execute("""
+            INSERT INTO report_job (report, owner, status, requested_at)
+            SELECT %s, %s, 'queued', NOW() FROM DUAL
+            WHERE NOT EXISTS (
+                SELECT 1 FROM report_job WHERE report = %s AND owner = %s AND status = 'queued'
+            )
+        """, (report, owner, report, owner))
+        job_id = cursor.lastrowid if cursor.rowcount == 1 else None
+        if job_id is None:
+            cursor.execute("""
+                SELECT job_id FROM report_job
+                WHERE report = %s AND owner = %s AND status = 'queued'
+                ORDER BY job_id LIMIT 1
+            """, (report, owner))
+            row = cursor.fetchone()
+            cursor.fetchall()
+            job_id = row[0] if row else None
+        db.commit()
+        return job_id
+    finally:
+        cursor.close()
+
+
+def latest(db, report, owner):
+    """(data, computed_at) of the newest snapshot, or None if there is none yet."""
+    cursor = db.cursor()
+    try:
+        cursor.execute("""
+            SELECT data, computed_at FROM report_snapshot WHERE report = %s AND owner = %s
+        """, (report, owner))
+        row = cursor.fetchone()
+        cursor.fetchall()
+    finally:
+        cursor.close()
+    return (json.loads(row[0]), row[1]) if row else None
+
+
+def store(db, report, owner, data, job_id=None):
+    """Save data as the report's snapshot and return its computed-at time."""
+    computed_at = datetime.now().replace(microsecond=0)
+    cursor = db.cursor()
+    try:
+        cursor.execute("""
+            INSERT INTO report_snapshot (report, owner, data, computed_at, job_id)
+            VALUES (%s, %s, %s, %s, %s)
+            ON DUPLICATE KEY UPDATE
+                data = VALUES(data), computed_at = VALUES(computed_at), job_id = VALUES(job_id)
+        """, (report, owner, json.dumps(data, default=_json_default), computed_at, job_id))
+        db.commit()
+    finally:
+        cursor.close()
+    return computed_at
+
+
+def jobs(db, owner=None, limit=50):
+    """Most recent jobs, optionally only one owner's, newest first."""
+    cursor = db.cursor(dictionary=True)
+    try:
+        cursor.execute(f"""
+            SELECT job_id, report, owner, status, requested_at, started_at, finished_at, worker, error
+            FROM report_job
+            {'WHERE owner = %s' if owner is not None else ''}
+            ORDER BY job_id DESC
+            LIMIT %s
+        """, (owner, limit) if owner is not None else (limit,))
+        return cursor.fetchall()
+    finally:
+        cursor.close()
+
+
+class JobRunner:
+    """Refreshes report snapshots in background threads, with the queue kept in MySQL.
+
+    Jobs are rows in report_job: anyone can queue one, and a worker in any
+    process claims the oldest with SELECT ... FOR UPDATE SKIP LOCKED. A worker
+    only claims a job while holding one of REPORT_JOB_MAX_RUNNING named locks,
+    so however many processes run workers, no more than that many refreshes
+    load the database at once. Workers use their own small connection pool,
+    never the request pool, so a slow refresh cannot take connections the
+    booking path needs.
+    """
+
+    def __init__(self):
+        self.reports = {}
+        self.settings = dict(JOB_DEFAULTS)
+        self.pool = None
+        self.worker_name = f"{socket.gethostname()}:{os.getpid()}"
+        self._stop = threading.Event()
+        self._threads = []
+        self._lock = threading.Lock()
+        self._running = {}
+
+    def configure(self, config):
+        self.settings = {key: config.get(key, default) for key, default in JOB_DEFAULTS.items()}
+        # One connection per worker thread, plus one for the scheduler; a
+        # report-worker process started with more threads opens the rest as overflow
+        self.pool = ConnectionPool.from_config({
+            **config, 'DB_POOL_SIZE': self.settings['REPORT_JOB_WORKERS'] + 1, 'DB_POOL_MAX_OVERFLOW': 8,
+        })
+
+    def register(self, name, compute, owners):
+        self.reports[name] = Report(name, compute, owners)
+
+    def is_stale(self, computed_at, ahead=0):
+        """Whether the snapshot is past REPORT_REFRESH_INTERVAL, or will be within `ahead` seconds."""
+        age = (datetime.now() - computed_at).total_seconds()
+        return age + ahead > self.settings['REPORT_REFRESH_INTERVAL']
+
+    def snapshot(self, db, report, owner):
+        """The latest (data, computed_at) for the report, queueing a refresh if it is stale.
+
+        Only a report that has never been computed is computed in the request.
+        db may be a read replica; the queue and snapshot writes go to the
+        primary through the runner's own pool, but only if it has a connection
+        free right away: the request never waits behind the workers, and a
+        refresh it could not queue is left to the scheduler.
+        """
+        found = latest(db, report, owner)
+        if found is not None and not self.is_stale(found[1]):
+            return found
+        try:
+            conn = self.pool.acquire(timeout=0)
+        except PoolError:
+            conn = None
+        try:
+            if found is None:
+                data = self.reports[report].compute(db, owner)
+                if conn is None:
+                    return data, datetime.now().replace(microsecond=0)
+                return data, store(conn, report, owner, data)
+            if conn is not None:
+                enqueue(conn, report, owner)
+            return found
+        finally:
+            if conn is not None:
+                self.pool.release(conn)
+
+    def ensure_started(self):
+        """Start this process's worker threads once; a no-op with REPORT_JOB_WORKERS = 0."""
+        if not self._threads and self.settings['REPORT_JOB_WORKERS']:
+            self.start(self.settings['REPORT_JOB_WORKERS'])
+
+    def start(self, threads):
+        """Start `threads` workers and the scheduler, unless already started."""
+        with self._lock:
+            if self._threads:
+                return
+            for i in range(threads):
+                self._threads.append(threading.Thread(target=self.work, name=f"report-job-{i}", daemon=True))
+            self._threads.append(threading.Thread(target=self.schedule, name="report-scheduler", daemon=True))
+            for thread in self._threads:
+                thread.start()
+
+    def join(self):
+        for thread in self._threads:
+            while thread.is_alive():
+                thread.join(1)
+
+    def stop(self):
+        self._stop.set()
+
+    def status(self):
+        with self._lock:
+            running = [{'job_id': job_id, 'report': report, 'owner': owner, 'started_at': started_at}
+                       for job_id, (report, owner, started_at) in sorted(self._running.items())]
+        return {
+            'worker': self.worker_name,
+            'threads': sum(thread.is_alive() for thread in self._threads),
+            'max_running': self.settings['REPORT_JOB_MAX_RUNNING'],
+            'running_here': running,
+            'pool': self.pool.stats() if self.pool else None,
+        }
+
+    # Worker side
+
+    def work(self):
+        """Claim and run jobs until stopped."""
+        while not self._stop.is_set():
+            try:
+                ran = self.run_one()
+            except Error as e:
+                logging.error(f"Report job worker error: {e}")
+                ran = False
+            if not ran:
+                self._stop.wait(self.settings['REPORT_JOB_POLL_INTERVAL'])
+
+    def run_one(self):
+        """Run one queued job if a slot and a job are free; returns whether one ran."""
+        conn = self.pool.acquire()
+        discard = False
+        try:
+            slot = self._take_slot(conn)
+            if slot is None:
+                return False
+            try:
+                job = self._claim(conn)
+                if job is None:
+                    return False
+                self._run(conn, *job)
+                return True
+            finally:
+                self._release_lock(conn, SLOT_LOCK.format(slot))
+        except Error:
+            discard = True
+            raise
+        finally:
+            self.pool.release(conn, discard=discard)
+
+    def _take_slot(self, conn):
+        for slot in range(self.settings['REPORT_JOB_MAX_RUNNING']):
+            if self._get_lock(conn, SLOT_LOCK.format(slot)):
+                return slot
+        return None
+
+    @staticmethod
+    def _get_lock(conn, name):
+        cursor = conn.cursor()
+        try:
+            cursor.execute("SELECT GET_LOCK(%s, 0)", (name,))
+            return cursor.fetchone()[0] == 1
+        finally:
+            cursor.close()
+
+    @staticmethod
+    def _release_lock(conn, name):
+        cursor = conn.cursor()
+        try:
+            cursor.execute("SELECT RELEASE_LOCK(%s)", (name,))
+            cursor.fetchall()
+        finally:
+            cursor.close()
+
+    def _claim(self, conn):
+        cursor = conn.cursor()
+        try:
+            conn.start_transaction()
+            cursor.execute("""
+                SELECT job_id, report, owner FROM report_job
+                WHERE status = 'queued'
+                ORDER BY job_id
+                LIMIT 1
+                FOR UPDATE SKIP LOCKED
+            """)
+            job = cursor.fetchone()
+            cursor.fetchall()
+            if job is not None:
+                cursor.execute("""
+                    UPDATE report_job SET status = 'running', started_at = NOW(), worker = %s
+                    WHERE job_id = %s
+                """, (self.worker_name, job[0]))
+            conn.commit()
+            return job
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            cursor.close()
+
+    def _run(self, conn, job_id, report, owner):
+        with self._lock:
+            self._running[job_id] = (report, owner, datetime.now().replace(microsecond=0))
+        status, error = 'done', None
+        try:
+            if report not in self.reports:
+                raise ValueError(f"Unknown report {report!r}")
+            store(conn, report, owner, self.reports[report].compute(conn, owner), job_id)
+        except Exception as e:
+            conn.rollback()
+            logging.exception(f"Report job {job_id} ({report} for {owner}) failed")
+            status, error = 'failed', str(e)[:1000]
+        finally:
+            with self._lock:
+                self._running.pop(job_id, None)
+
+        cursor = conn.cursor()
+        try:
+            cursor.execute("""
+                UPDATE report_job SET status = %s, finished_at = NOW(), error = %s WHERE job_id = %s
+            """, (status, error, job_id))
+            conn.commit()
+        finally:
+            cursor.close()
+
+    # Scheduler side
+
+    def schedule(self):
+        """Queue refreshes of stale snapshots twice per REPORT_REFRESH_INTERVAL, in one process at a time."""
+        while not self._stop.is_set():
+            try:
+                self.schedule_once()
+            except Error as e:
+                logging.error(f"Report scheduler error: {e}")
+            self._stop.wait(self.settings['REPORT_REFRESH_INTERVAL'] / 2)
+
+    def schedule_once(self):
+        conn = self.pool.acquire()
+        discard = False
+        try:
+            if not self._get_lock(conn, SCHEDULER_LOCK):
+                return
+            try:
+                self._expire(conn)
+                for report in self.reports.values():
+                    for owner in report.owners(conn):
+                        found = latest(conn, report.name, owner)
+                        # Snapshots that would go stale before the next pass are queued now, so
+                        # each is refreshed about once per interval rather than every other pass
+                        if found is None or self.is_stale(found[1], ahead=self.settings['REPORT_REFRESH_INTERVAL'] / 2):
+                            enqueue(conn, report.name, owner)
+            finally:
+                self._release_lock(conn, SCHEDULER_LOCK)
+        except Error:
+            discard = True
+            raise
+        finally:
+            self.pool.release(conn, discard=discard)
+
+    def _expire(self, conn):
+        # Jobs whose worker died mid-run, and finished jobs older than a day
+        cursor = conn.cursor()
+        try:
+            cursor.execute("""
+                UPDATE report_job SET status = 'failed', finished_at = NOW(), error = 'timed out'
+                WHERE status = 'running' AND started_at < NOW() - INTERVAL %s SECOND
+            """, (self.settings['REPORT_JOB_TIMEOUT'],))
+            cursor.execute("""
+                DELETE FROM report_job WHERE status IN ('done', 'failed') AND finished_at < NOW() - INTERVAL 1 DAY
+            """)
+            conn.commit()
+        finally:
+            cursor.close()
+
+
+runner = JobRunner()
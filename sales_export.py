@@ -0,0 +1,130 @@
+import csv
+import io
+
+
+# Rows fetched from the server-side cursor per chunk; each chunk becomes one
+# piece of the CSV response or one Parquet row group
+EXPORT_CHUNK = 10_000
+
+EXPORT_COLUMNS = ('ticket_id', 'purchase_date', 'customer_email', 'booking_agent_email', 'airline_name',
+                  'flight_num', 'departure_airport', 'departure_time', 'arrival_airport', 'arrival_time',
+                  'price', 'status')
+
+# No ORDER BY: sorting millions of rows would need the whole result at once on the
+# server before the first row could be sent
+EXPORT_QUERY = """
+    SELECT p.ticket_id, p.purchase_date, p.customer_email, p.booking_agent_email, t.airline_name,
+           t.flight_num, f.departure_airport, f.departure_time, f.arrival_airport, f.arrival_time,
+           f.price, f.status
+    FROM purchases p
+    JOIN ticket t ON p.ticket_id = t.ticket_id
+    JOIN flight f ON t.airline_name = f.airline_name AND t.flight_num = f.flight_num
+    WHERE t.airline_name = %s AND p.purchase_date BETWEEN %s AND %s
+"""
+
+FORMATS = {
+    'csv': ('text/csv', 'csv'),
+    'parquet': ('application/vnd.apache.parquet', 'parquet'),
+}
+
+
+class ExportError(ValueError):
+    """An export that cannot be produced as asked."""
+
+
+def row_chunks(db, airline_name, start, end, chunk=EXPORT_CHUNK):
+    """Lists of up to `chunk` row tuples, pulled from an unbuffered cursor as they are consumed."""
+    cursor = db.cursor(buffered=False)
+    try:
+        cursor.execute(EXPORT_QUERY, (airline_name, start, end))
+        while True:
+            rows = cursor.fetchmany(chunk)
+            if not rows:
+                break
+            yield rows
+    finally:
+        cursor.close()
+
+
+def csv_chunks(chunks):
+    """CSV text, header first, one string per chunk of rows."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator='\n')
+    writer.writerow(EXPORT_COLUMNS)
+    for rows in chunks:
+        writer.writerows(rows)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+class _ChunkSink(io.RawIOBase):
+    # Write-only file the Parquet writer writes into; bytes are handed on and dropped
+    def __init__(self):
+        self._chunks = []
+        self._position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def _pyarrow():
+    # pyarrow is only needed for Parquet exports, so it is imported on first use
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError:
+        raise ExportError("Parquet export needs the pyarrow package; use format=csv instead")
+    return pyarrow, pyarrow.parquet
+
+
+def parquet_chunks(chunks):
+    """Parquet file bytes, one row group per chunk of rows. Needs pyarrow."""
+    pa, pq = _pyarrow()
+    schema = pa.schema([
+        ('ticket_id', pa.int64()), ('purchase_date', pa.date32()), ('customer_email', pa.string()),
+        ('booking_agent_email', pa.string()), ('airline_name', pa.string()), ('flight_num', pa.int64()),
+        ('departure_airport', pa.string()), ('departure_time', pa.timestamp('s')),
+        ('arrival_airport', pa.string()), ('arrival_time', pa.timestamp('s')),
+        ('price', pa.decimal128(10, 2)), ('status', pa.string()),
+    ])
+    sink = _ChunkSink()
+    writer = pq.ParquetWriter(sink, schema)
+    try:
+        for rows in chunks:
+            columns = list(zip(*rows))
+            writer.write_table(pa.Table.from_arrays(
+                [pa.array(column, type=field.type) for column, field in zip(columns, schema)], schema=schema))
+            yield sink.drain()
+    finally:
+        writer.close()
+    # The footer, written by close()
+    yield sink.drain()
+
+
+def export(db, airline_name, start, end, output='csv'):
+    """(content type, file extension, iterator of str or bytes chunks) for the sales in [start, end]."""
+    if output not in FORMATS:
+        raise ExportError(f"Unknown export format {output!r}; use {' or '.join(FORMATS)}")
+    if output == 'parquet':
+        # Fail before the response starts rather than part way through it
+        _pyarrow()
+    chunks = row_chunks(db, airline_name, start, end)
+    body = csv_chunks(chunks) if output == 'csv' else parquet_chunks(chunks)
+    content_type, extension = FORMATS[output]
+    return content_type, extension, body
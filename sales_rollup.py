@@ -0,0 +1,196 @@
+import logging
+
+
+# Tables maintained by this module; see migrations/002_sales_rollups.sql and
+# 007_daily_customer_flights.sql. All but the last are keyed by sale date.
+ROLLUP_TABLES = ('daily_sales_rollup', 'daily_destination_rollup', 'daily_agent_rollup', 'daily_customer_flights')
+
+# Shared FROM clause for rebuilding rollups from the raw purchase data
+PURCHASE_JOIN = """
+    FROM purchases p
+    JOIN ticket t ON p.ticket_id = t.ticket_id
+    JOIN flight f ON t.airline_name = f.airline_name AND t.flight_num = f.flight_num
+"""
+
+
+def record_purchase(cursor, airline_name, price, arrival_airport, tickets, sale_date, booking_agent_email=None,
+                    commission=0):
+    """Add tickets sold on one flight, and any agent commission on them, to the daily rollups.
+
+    price and arrival_airport are the flight's, as the purchase already read
+    them. Runs on the caller's cursor so the rollup update commits or rolls
+    back together with the purchase itself.
+    """
+    revenue = price * tickets
+
+    cursor.execute("""
+        INSERT INTO daily_sales_rollup (airline_name, sale_date, tickets_sold, direct_revenue, indirect_revenue)
+        VALUES (%s, %s, %s, %s, %s)
+        ON DUPLICATE KEY UPDATE
+            tickets_sold = tickets_sold + VALUES(tickets_sold),
+            direct_revenue = direct_revenue + VALUES(direct_revenue),
+            indirect_revenue = indirect_revenue + VALUES(indirect_revenue)
+    """, (airline_name, sale_date, tickets,
+          0 if booking_agent_email else revenue,
+          revenue if booking_agent_email else 0))
+
+    cursor.execute("""
+        INSERT INTO daily_destination_rollup (airline_name, sale_date, arrival_airport, tickets_sold)
+        VALUES (%s, %s, %s, %s)
+        ON DUPLICATE KEY UPDATE tickets_sold = tickets_sold + VALUES(tickets_sold)
+    """, (airline_name, sale_date, arrival_airport, tickets))
+
+    if booking_agent_email:
+        cursor.execute("""
+            INSERT INTO daily_agent_rollup (airline_name, sale_date, booking_agent_email, tickets_sold, total_sales,
+                                            commission)
+            VALUES (%s, %s, %s, %s, %s, %s)
+            ON DUPLICATE KEY UPDATE
+                tickets_sold = tickets_sold + VALUES(tickets_sold),
+                total_sales = total_sales + VALUES(total_sales),
+                commission = commission + VALUES(commission)
+        """, (airline_name, sale_date, booking_agent_email, tickets, revenue, commission))
+
+
+def record_customer_flights(cursor, flights):
+    """Add {(airline_name, departure_date, customer_email): tickets} to the customer flight counts."""
+    # Sorted so concurrent group bookings lock the rows in the same sequence
+    rows = [key + (tickets,) for key, tickets in sorted(flights.items())]
+    if not rows:
+        return
+    cursor.execute(f"""
+        INSERT INTO daily_customer_flights (airline_name, departure_date, customer_email, tickets)
+        VALUES {", ".join(["(%s, %s, %s, %s)"] * len(rows))}
+        ON DUPLICATE KEY UPDATE tickets = tickets + VALUES(tickets)
+    """, tuple(value for row in rows for value in row))
+
+
+def date_filter(column, start, end):
+    # " AND column >= %s AND column <= %s" for whichever bounds are given; shared with commission_ledger
+    clause, params = "", []
+    if start:
+        clause += f" AND {column} >= %s"
+        params.append(start)
+    if end:
+        clause += f" AND {column} <= %s"
+        params.append(end)
+    return clause, tuple(params)
+
+
+def rebuild(db, start=None, end=None):
+    """Recompute the rollups from purchases, optionally only for [start, end] purchase dates.
+
+    Customer flight counts are bucketed by departure, so for them the range
+    selects departure dates.
+    """
+    cursor = db.cursor()
+    try:
+        for table in ROLLUP_TABLES[:-1]:
+            clause, params = date_filter('sale_date', start, end)
+            cursor.execute(f"DELETE FROM {table} WHERE 1=1{clause}", params)
+
+        clause, params = date_filter('p.purchase_date', start, end)
+        cursor.execute(f"""
+            INSERT INTO daily_sales_rollup (airline_name, sale_date, tickets_sold, direct_revenue, indirect_revenue)
+            SELECT t.airline_name, DATE(p.purchase_date), COUNT(*),
+                   SUM(IF(p.booking_agent_email IS NULL, f.price, 0)),
+                   SUM(IF(p.booking_agent_email IS NULL, 0, f.price))
+            {PURCHASE_JOIN}
+            WHERE 1=1{clause}
+            GROUP BY t.airline_name, DATE(p.purchase_date)
+        """, params)
+        cursor.execute(f"""
+            INSERT INTO daily_destination_rollup (airline_name, sale_date, arrival_airport, tickets_sold)
+            SELECT t.airline_name, DATE(p.purchase_date), f.arrival_airport, COUNT(*)
+            {PURCHASE_JOIN}
+            WHERE 1=1{clause}
+            GROUP BY t.airline_name, DATE(p.purchase_date), f.arrival_airport
+        """, params)
+        cursor.execute(f"""
+            INSERT INTO daily_agent_rollup (airline_name, sale_date, booking_agent_email, tickets_sold, total_sales,
+                                            commission)
+            SELECT t.airline_name, DATE(p.purchase_date), p.booking_agent_email, COUNT(*), SUM(f.price),
+                   COALESCE(SUM(c.commission), 0)
+            {PURCHASE_JOIN}
+            LEFT JOIN agent_commission_ledger c ON c.ticket_id = p.ticket_id
+            WHERE p.booking_agent_email IS NOT NULL{clause}
+            GROUP BY t.airline_name, DATE(p.purchase_date), p.booking_agent_email
+        """, params)
+
+        clause, params = date_filter('departure_date', start, end)
+        cursor.execute(f"DELETE FROM daily_customer_flights WHERE 1=1{clause}", params)
+        clause, params = date_filter('f.departure_time', start, end and f"{end} 23:59:59")
+        cursor.execute(f"""
+            INSERT INTO daily_customer_flights (airline_name, departure_date, customer_email, tickets)
+            SELECT t.airline_name, DATE(f.departure_time), p.customer_email, COUNT(*)
+            {PURCHASE_JOIN}
+            WHERE 1=1{clause}
+            GROUP BY t.airline_name, DATE(f.departure_time), p.customer_email
+        """, params)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        cursor.close()
+    logging.info(f"Rebuilt sales rollups for {start or 'the beginning'} to {end or 'today'}")
+
+
+def _fetch(db, query, params):
+    cursor = db.cursor(dictionary=True)
+    try:
+        cursor.execute(query, params)
+        return cursor.fetchall()
+    finally:
+        cursor.close()
+
+
+def tickets_by_day(db, airline_name, start, end):
+    return _fetch(db, """
+        SELECT sale_date, tickets_sold
+        FROM daily_sales_rollup
+        WHERE airline_name = %s AND sale_date BETWEEN %s AND %s
+        ORDER BY sale_date
+    """, (airline_name, start, end))
+
+
+def tickets_by_month(db, airline_name, months):
+    return _fetch(db, """
+        SELECT DATE_FORMAT(sale_date, '%%Y-%%m') AS month, SUM(tickets_sold) AS tickets_sold
+        FROM daily_sales_rollup
+        WHERE airline_name = %s AND sale_date >= DATE_SUB(CURDATE(), INTERVAL %s MONTH)
+        GROUP BY month
+        ORDER BY month
+    """, (airline_name, months))
+
+
+def revenue_split(db, airline_name, months):
+    """Direct vs indirect revenue as [{'sale_type': ..., 'revenue': ...}] rows."""
+    rows = _fetch(db, """
+        SELECT SUM(direct_revenue) AS direct_revenue, SUM(indirect_revenue) AS indirect_revenue
+        FROM daily_sales_rollup
+        WHERE airline_name = %s AND sale_date >= DATE_SUB(CURDATE(), INTERVAL %s MONTH)
+    """, (airline_name, months))
+    totals = rows[0] if rows else {}
+    return [
+        {'sale_type': 'Direct Sales', 'revenue': totals.get('direct_revenue') or 0},
+        {'sale_type': 'Indirect Sales', 'revenue': totals.get('indirect_revenue') or 0},
+    ]
+
+
+def airlines(db):
+    cursor = db.cursor()
+    try:
+        cursor.execute("SELECT airline_name FROM airline ORDER BY airline_name")
+        return [row[0] for row in cursor.fetchall()]
+    finally:
+        cursor.close()
+
+
+def staff_report(db, airline_name):
+    """The default /view_reports datasets, precomputed by report_jobs."""
+    return {
+        'tickets_sold_data': tickets_by_month(db, airline_name, months=12),
+        'last_month_revenue': revenue_split(db, airline_name, months=1),
+        'last_year_revenue': revenue_split(db, airline_name, months=12),
+    }
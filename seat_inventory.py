@@ -0,0 +1,142 @@
+import threading
+import time
+
+
+# Counter rows per multi-row INSERT in create_new
+INSERT_BATCH = 1000
+
+# Inserts the counter row for a flight from its airplane's capacity and the tickets
+# already sold; INSERT IGNORE makes it a no-op if the row exists
+CREATE_INVENTORY = """
+    INSERT IGNORE INTO flight_seat_inventory (airline_name, flight_num, seats_total, seats_sold)
+    SELECT f.airline_name, f.flight_num, a.seats,
+           (SELECT COUNT(*) FROM ticket t WHERE t.airline_name = f.airline_name AND t.flight_num = f.flight_num)
+    FROM flight f
+    JOIN airplane a ON a.airline_name = f.airline_name AND a.airplane_id = f.airplane_id
+    WHERE f.airline_name = %s AND f.flight_num = %s
+"""
+
+
+class SeatsUnavailable(ValueError):
+    """Not enough seats left on a flight to complete a purchase."""
+
+    def __init__(self, airline_name, flight_num, requested):
+        super().__init__(f"Not enough seats left on {airline_name} flight {flight_num} "
+                         f"for {requested} ticket(s)")
+        self.airline_name = airline_name
+        self.flight_num = flight_num
+        self.requested = requested
+
+
+class FlightNotFound(LookupError):
+    """A purchase named a flight that does not exist."""
+
+    def __init__(self, airline_name, flight_num):
+        super().__init__(f"{airline_name} flight {flight_num} does not exist")
+        self.airline_name = airline_name
+        self.flight_num = flight_num
+
+
+def create(cursor, airline_name, flight_num):
+    """Create the seat counter for a new flight; call in the same transaction as the INSERT."""
+    cursor.execute(CREATE_INVENTORY, (airline_name, flight_num))
+
+
+def create_new(cursor, flights):
+    """Create seat counters for just-inserted flights given as (airline_name, flight_num, seats).
+
+    New flights have no tickets, so the rows are written directly instead of
+    being derived from the flight and airplane tables one flight at a time.
+    """
+    for offset in range(0, len(flights), INSERT_BATCH):
+        batch = flights[offset:offset + INSERT_BATCH]
+        cursor.execute(f"""
+            INSERT IGNORE INTO flight_seat_inventory (airline_name, flight_num, seats_total, seats_sold)
+            VALUES {', '.join(['(%s, %s, %s, 0)'] * len(batch))}
+        """, tuple(value for flight in batch for value in flight))
+
+
+def reserve(cursor, airline_name, flight_num, seats):
+    """Take seats on a flight or raise SeatsUnavailable (FlightNotFound if there is no such flight).
+
+    The capacity check and the increment are one guarded UPDATE, so the row
+    lock InnoDB takes for it is the only synchronisation needed: a concurrent
+    buyer either sees the new seats_sold or waits for this transaction to end.
+    """
+    query = """
+        UPDATE flight_seat_inventory
+        SET seats_sold = seats_sold + %s, version = version + 1
+        WHERE airline_name = %s AND flight_num = %s AND seats_sold + %s <= seats_total
+    """
+    params = (seats, airline_name, flight_num, seats)
+    cursor.execute(query, params)
+    if cursor.rowcount == 1:
+        return
+
+    # No row yet (flight predates the inventory table) or the flight is full
+    create(cursor, airline_name, flight_num)
+    if cursor.rowcount == 1:
+        cursor.execute(query, params)
+        if cursor.rowcount == 1:
+            return
+    else:
+        # Nothing created: either the counter exists and the flight is full, or there is no flight
+        cursor.execute("SELECT 1 FROM flight WHERE airline_name = %s AND flight_num = %s",
+                       (airline_name, flight_num))
+        exists = cursor.fetchone() is not None
+        cursor.fetchall()
+        if not exists:
+            raise FlightNotFound(airline_name, flight_num)
+    raise SeatsUnavailable(airline_name, flight_num, seats)
+
+
+class SeatAvailability:
+    """Short-lived cache of seats remaining per flight, for search results.
+
+    Values may be a few seconds stale; the authoritative check is reserve().
+    """
+
+    def __init__(self, ttl=5):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._remaining = {}
+
+    def invalidate(self, airline_name, flight_num):
+        with self._lock:
+            self._remaining.pop((airline_name, int(flight_num)), None)
+
+    def remaining(self, db, keys):
+        """{(airline_name, flight_num): seats left} for the given flights."""
+        now = time.monotonic()
+        result = {}
+        missing = []
+        with self._lock:
+            for key in keys:
+                cached = self._remaining.get(key)
+                if cached is not None and now - cached[1] <= self.ttl:
+                    result[key] = cached[0]
+                else:
+                    missing.append(key)
+        if not missing:
+            return result
+
+        cursor = db.cursor()
+        try:
+            for offset in range(0, len(missing), 500):
+                batch = missing[offset:offset + 500]
+                cursor.execute(f"""
+                    SELECT airline_name, flight_num, seats_total - seats_sold
+                    FROM flight_seat_inventory
+                    WHERE (airline_name, flight_num) IN ({', '.join(['(%s, %s)'] * len(batch))})
+                """, tuple(value for key in batch for value in key))
+                fetched = {(row[0], row[1]): max(row[2], 0) for row in cursor.fetchall()}
+                result.update(fetched)
+                with self._lock:
+                    for key, seats_left in fetched.items():
+                        self._remaining[key] = (seats_left, now)
+        finally:
+            cursor.close()
+        return result
+
+
+availability = SeatAvailability()
@@ -0,0 +1,142 @@
+import logging
+from collections import defaultdict
+from datetime import date, timedelta
+
+
+# Table maintained by this module; see migrations/005_customer_spending_ledger.sql
+LEDGER_TABLE = 'customer_monthly_spending'
+
+# Default /track_spending range: this month and the eleven before it
+DEFAULT_MONTHS = 12
+
+# First day of the purchase's month, without DATE_FORMAT's % patterns
+PURCHASE_MONTH = "p.purchase_date - INTERVAL (DAYOFMONTH(p.purchase_date) - 1) DAY"
+
+
+def month_start(day):
+    return day.replace(day=1)
+
+
+def add_months(day, months):
+    """First day of the month `months` after (or before, if negative) day's month."""
+    index = day.year * 12 + day.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def record_purchases(cursor, lines, prices, purchase_date):
+    """Add the cost of lines of (customer, airline, flight_num, count) to the ledger.
+
+    prices maps (airline_name, flight_num) to the ticket price. Runs on the
+    caller's cursor so the ledger commits or rolls back together with the
+    purchase. Each customer's row is upserted once, in email order, so
+    concurrent group bookings lock ledger rows in the same sequence.
+    """
+    totals = defaultdict(lambda: [0, 0])
+    for customer_email, airline_name, flight_num, count in lines:
+        price = prices.get((airline_name, flight_num))
+        if price is None:
+            continue
+        totals[customer_email][0] += count
+        totals[customer_email][1] += price * count
+    if not totals:
+        return
+
+    month = month_start(purchase_date)
+    rows = [(customer_email, month, tickets, spent)
+            for customer_email, (tickets, spent) in sorted(totals.items())]
+    cursor.execute(f"""
+        INSERT INTO {LEDGER_TABLE} (customer_email, spending_month, tickets, total_spent)
+        VALUES {", ".join(["(%s, %s, %s, %s)"] * len(rows))}
+        ON DUPLICATE KEY UPDATE
+            tickets = tickets + VALUES(tickets),
+            total_spent = total_spent + VALUES(total_spent)
+    """, tuple(value for row in rows for value in row))
+
+
+def _month_filter(column, start, end):
+    clause, params = "", []
+    if start:
+        clause += f" AND {column} >= %s"
+        params.append(month_start(start))
+    if end:
+        clause += f" AND {column} < %s"
+        params.append(add_months(end, 1))
+    return clause, params
+
+
+def rebuild(db, start=None, end=None):
+    """Recompute the ledger from purchases, for whole months covering [start, end]."""
+    cursor = db.cursor()
+    try:
+        clause, params = _month_filter('spending_month', start, end)
+        cursor.execute(f"DELETE FROM {LEDGER_TABLE} WHERE 1=1{clause}", tuple(params))
+
+        clause, params = _month_filter('p.purchase_date', start, end)
+        cursor.execute(f"""
+            INSERT INTO {LEDGER_TABLE} (customer_email, spending_month, tickets, total_spent)
+            SELECT p.customer_email, {PURCHASE_MONTH}, COUNT(*), SUM(f.price)
+            FROM purchases p
+            JOIN ticket t ON p.ticket_id = t.ticket_id
+            JOIN flight f ON t.airline_name = f.airline_name AND t.flight_num = f.flight_num
+            WHERE 1=1{clause}
+            GROUP BY p.customer_email, {PURCHASE_MONTH}
+        """, tuple(params))
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        cursor.close()
+    logging.info(f"Rebuilt the spending ledger for {start or 'the beginning'} to {end or 'today'}")
+
+
+def _partial_month(cursor, customer_email, start, end):
+    # Tickets and spend for part of a month, from the purchases themselves
+    cursor.execute("""
+        SELECT COUNT(*), COALESCE(SUM(f.price), 0)
+        FROM purchases p
+        JOIN ticket t ON p.ticket_id = t.ticket_id
+        JOIN flight f ON t.airline_name = f.airline_name AND t.flight_num = f.flight_num
+        WHERE p.customer_email = %s AND p.purchase_date BETWEEN %s AND %s
+    """, (customer_email, start, end))
+    row = cursor.fetchone()
+    cursor.fetchall()
+    return row[0], row[1]
+
+
+def monthly_spending(db, customer_email, start, end, today=None):
+    """One row per month overlapping [start, end]: {'month': 'YYYY-MM', 'tickets', 'total_spent'}.
+
+    Whole months are read straight from the ledger. A month the range only
+    partly covers is summed from that customer's purchases for those days; a
+    range ending today counts as covering the rest of the month, since there
+    are no purchases after today.
+    """
+    today = today or date.today()
+    first_month, last_month = month_start(start), month_start(end)
+    partial = {}
+    if start != first_month:
+        partial[first_month] = (start, min(end, add_months(start, 1) - timedelta(days=1)))
+    if end < add_months(end, 1) - timedelta(days=1) and end < today:
+        partial[last_month] = (max(start, last_month), end)
+
+    cursor = db.cursor()
+    try:
+        cursor.execute(f"""
+            SELECT spending_month, tickets, total_spent
+            FROM {LEDGER_TABLE}
+            WHERE customer_email = %s AND spending_month BETWEEN %s AND %s
+        """, (customer_email, first_month, last_month))
+        ledger = {row[0]: (row[1], row[2]) for row in cursor.fetchall()}
+        for month, (day_from, day_to) in partial.items():
+            ledger[month] = _partial_month(cursor, customer_email, day_from, day_to)
+    finally:
+        cursor.close()
+
+    rows = []
+    month = first_month
+    while month <= last_month:
+        tickets, spent = ledger.get(month, (0, 0))
+        rows.append({'month': month.strftime('%Y-%m'), 'tickets': tickets, 'total_spent': spent})
+        month = add_months(month, 1)
+    return rows
@@ -0,0 +1,52 @@
+// Airport and city suggestions from /autocomplete for inputs with a
+// data-autocomplete attribute holding the endpoint URL
+document.querySelectorAll('input[data-autocomplete]').forEach(function (input) {
+    var list = document.createElement('datalist');
+    list.id = input.id + '-suggestions';
+    input.setAttribute('list', list.id);
+    input.setAttribute('autocomplete', 'off');
+    input.parentNode.insertBefore(list, input.nextSibling);
+
+    var timer = null;
+    var lastTerm = null;
+    // Bumped per request so a slow response for an older term is dropped
+    var sequence = 0;
+    input.addEventListener('input', function () {
+        clearTimeout(timer);
+        // Wait for a pause in typing rather than asking on every keystroke
+        timer = setTimeout(function () {
+            var term = input.value.trim();
+            if (!term || term === lastTerm) {
+                return;
+            }
+            var request = ++sequence;
+            var separator = input.dataset.autocomplete.indexOf('?') === -1 ? '?' : '&';
+            fetch(input.dataset.autocomplete + separator + 'q=' + encodeURIComponent(term))
+                .then(function (response) {
+                    if (!response.ok) {
+                        throw new Error(response.statusText);
+                    }
+                    return response.json();
+                })
+                .then(function (suggestions) {
+                    if (request !== sequence) {
+                        return;
+                    }
+                    // Only a successful lookup is remembered, so failures are retried
+                    lastTerm = term;
+                    list.innerHTML = '';
+                    suggestions.forEach(function (suggestion) {
+                        var option = document.createElement('option');
+                        option.value = suggestion.name;
+                        option.label = suggestion.type === 'city'
+                            ? 'City'
+                            : 'Airport' + (suggestion.city ? ', ' + suggestion.city : '');
+                        list.appendChild(option);
+                    });
+                })
+                .catch(function () {
+                    // Keep the current suggestions; the next pause in typing asks again
+                });
+        }, 150);
+    });
+});
@@ -0,0 +1,111 @@
+import hashlib
+import json
+import threading
+import time
+
+
+class StatusCache:
+    """Short-lived cache of /flight_status lookups keyed by (flight_num, date).
+
+    Entries hold the lookup result (a flight dict, or None for "not found")
+    and an ETag derived from it, so a client polling with If-None-Match can
+    be answered with a 304 without touching MySQL. Concurrent misses on the
+    same key share one lookup, which keeps a polling storm on an expired
+    entry down to a single query.
+
+    Lookups behind it read MySQL directly, never the per-process flight
+    catalog. change_flight_status and create_flight invalidate a flight
+    number explicitly; the TTL bounds staleness in other worker processes,
+    whose caches those calls cannot reach.
+    """
+
+    def __init__(self, ttl=10, max_entries=50000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.enabled = True
+        self._lock = threading.Lock()
+        self._entries = {}
+        self._loading = {}
+        self._generations = {}
+
+    def configure(self, ttl=10, enabled=True):
+        self.ttl = ttl
+        self.enabled = enabled
+        self.clear()
+
+    @staticmethod
+    def _flight_key(flight_num):
+        flight_num = str(flight_num).strip()
+        return str(int(flight_num)) if flight_num.isdigit() else flight_num
+
+    @staticmethod
+    def etag_for(value):
+        body = json.dumps(value, sort_keys=True, default=str)
+        return hashlib.sha1(body.encode()).hexdigest()[:20]
+
+    def peek(self, flight_num, date):
+        """(value, etag) if a fresh entry is cached, else None."""
+        entry = self._entries.get((self._flight_key(flight_num), date))
+        if entry is None or time.monotonic() - entry[2] > self.ttl:
+            return None
+        return entry[0], entry[1]
+
+    def get(self, flight_num, date, load):
+        """(value, etag) for the key, calling load() on a miss."""
+        if not self.enabled:
+            value = load()
+            return value, self.etag_for(value)
+
+        cached = self.peek(flight_num, date)
+        if cached is not None:
+            return cached
+
+        flight_key = self._flight_key(flight_num)
+        key = (flight_key, date)
+        with self._lock:
+            key_lock = self._loading.setdefault(key, threading.Lock())
+        with key_lock:
+            # Another thread may have loaded the key while this one waited
+            cached = self.peek(flight_num, date)
+            if cached is not None:
+                return cached
+
+            generation = self._generations.get(flight_key, 0)
+            try:
+                value = load()
+                etag = self.etag_for(value)
+                with self._lock:
+                    # Skip the store if the flight was invalidated during the lookup
+                    if self._generations.get(flight_key, 0) == generation:
+                        self._store(key, (value, etag, time.monotonic()))
+            finally:
+                with self._lock:
+                    self._loading.pop(key, None)
+        return value, etag
+
+    def _store(self, key, entry):
+        # Called with the lock held
+        self._entries.pop(key, None)
+        self._entries[key] = entry
+        if len(self._entries) > self.max_entries:
+            now = time.monotonic()
+            for stale in [k for k, e in self._entries.items() if now - e[2] > self.ttl]:
+                del self._entries[stale]
+            # Still full: drop the oldest entries (dicts keep insertion order)
+            while len(self._entries) > self.max_entries:
+                del self._entries[next(iter(self._entries))]
+
+    def invalidate(self, flight_num):
+        """Drop every cached date for a flight number."""
+        flight_key = self._flight_key(flight_num)
+        with self._lock:
+            self._generations[flight_key] = self._generations.get(flight_key, 0) + 1
+            for key in [key for key in self._entries if key[0] == flight_key]:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+flight_status_cache = StatusCache()
@@ -0,0 +1,90 @@
+import pytest
+
+import bulk_purchase
+from bulk_purchase import PurchaseError
+
+
+def test_parse_lines():
+    payload = {'lines': [
+        {'customer_email': 'a@x.com', 'airline_name': 'Air', 'flight_num': '12', 'count': 2},
+        {'customer_email': 'b@x.com', 'airline_name': 'Air', 'flight_num': 13},
+    ]}
+    assert bulk_purchase.parse_lines(payload, 10) == [('a@x.com', 'Air', 12, 2), ('b@x.com', 'Air', 13, 1)]
+
+
+@pytest.mark.parametrize('payload', [
+    None,
+    [],
+    {'lines': []},
+    {'lines': 'a@x.com'},
+    {'lines': [{'airline_name': 'Air', 'flight_num': 1}]},
+    {'lines': [{'customer_email': 'a@x.com', 'airline_name': 'Air', 'flight_num': 'one'}]},
+    {'lines': [{'customer_email': 'a@x.com', 'airline_name': 'Air', 'flight_num': 1, 'count': 'x'}]},
+    {'lines': [{'customer_email': 'a@x.com', 'airline_name': 'Air', 'flight_num': 1, 'count': 0}]},
+    {'lines': [{'customer_email': 'a@x.com', 'airline_name': 'Air', 'flight_num': 1, 'count': -3}]},
+])
+def test_parse_lines_rejects(payload):
+    with pytest.raises(PurchaseError):
+        bulk_purchase.parse_lines(payload, 10)
+
+
+def test_parse_lines_limits_total_tickets():
+    line = {'customer_email': 'a@x.com', 'airline_name': 'Air', 'flight_num': 1, 'count': 6}
+    assert len(bulk_purchase.parse_lines({'lines': [line]}, 10)) == 1
+    with pytest.raises(PurchaseError, match='At most 10'):
+        bulk_purchase.parse_lines({'lines': [line, line]}, 10)
+
+
+def test_purchase_without_tickets():
+    with pytest.raises(PurchaseError):
+        bulk_purchase.purchase_tickets(None, [])
+    with pytest.raises(PurchaseError):
+        bulk_purchase.purchase_tickets(None, [('a@x.com', 'Air', 1, 0)])
+
+
+class TicketCursor:
+    # Hands out AUTO_INCREMENT ids the way InnoDB does for a given auto_increment_increment
+
+    def __init__(self, increment):
+        self.increment = increment
+        self.next_id = 100
+        self.statements = []
+
+    def execute(self, query, params=()):
+        self.statements.append(query)
+        if query.startswith("SELECT @@auto_increment_increment"):
+            self.rows = [(self.increment,)]
+            return
+        rows = len(params) // 2
+        self.lastrowid = self.next_id
+        self.rowcount = rows
+        self.next_id += rows * self.increment
+
+    def fetchone(self):
+        return self.rows.pop(0)
+
+    def fetchall(self):
+        rows, self.rows = self.rows, []
+        return rows
+
+
+@pytest.fixture(autouse=True)
+def server_settings(monkeypatch):
+    monkeypatch.setattr(bulk_purchase, '_server_settings', {})
+
+
+def test_insert_tickets_in_one_statement():
+    cursor = TicketCursor(increment=1)
+    flights = [('Air', 1), ('Air', 1), ('Air', 2)]
+    assert bulk_purchase._insert_tickets(cursor, flights) == [100, 101, 102]
+    assert len(cursor.statements) == 2
+    # The increment is read once, not on every purchase
+    assert bulk_purchase._insert_tickets(cursor, flights[:1]) == [103]
+    assert len(cursor.statements) == 3
+
+
+def test_insert_tickets_with_stepped_ids():
+    cursor = TicketCursor(increment=3)
+    flights = [('Air', 1), ('Air', 1), ('Air', 2)]
+    assert bulk_purchase._insert_tickets(cursor, flights) == [100, 103, 106]
+    assert len(cursor.statements) == 4
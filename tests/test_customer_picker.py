@@ -0,0 +1,101 @@
+from datetime import date
+
+import pytest
+
+import pagination
+from customer_picker import CustomerPicker
+
+
+CUSTOMERS = sorted(f"{letter}{i:03d}@x.com" for letter in 'ab' for i in range(40))
+# The agent's own customers: (email, last purchase, tickets)
+SERVED = [('a005@x.com', date(2030, 1, 1), 2), ('a010@x.com', date(2030, 3, 1), 1),
+          ('b001@x.com', date(2030, 2, 1), 5)]
+
+
+class PickerCursor:
+    def __init__(self, db):
+        self.db = db
+
+    def execute(self, query, params):
+        if 'FROM purchases' in query:
+            self.db.served_loads += 1
+            self.rows = list(SERVED)
+        elif 'IN (' in query:
+            self.rows = [(email, email.upper()) for email in params]
+        else:
+            # Keyset page of customers by email: LIKE prefix, email > last, LIMIT
+            like, last_email, limit = params
+            prefix = like[:-1].replace('\\', '')
+            self.rows = [(email, email.upper()) for email in CUSTOMERS
+                         if email.startswith(prefix) and email > last_email][:limit]
+
+    def fetchall(self):
+        return self.rows
+
+    def close(self):
+        pass
+
+
+class PickerDB:
+    def __init__(self):
+        self.served_loads = 0
+
+    def cursor(self):
+        return PickerCursor(self)
+
+
+def every_page(picker, db, prefix, limit):
+    customers, cursor = [], None
+    while True:
+        page, cursor = picker.search(db, 'agent@x.com', prefix, after=cursor, limit=limit)
+        assert len(page) <= limit
+        customers += page
+        if cursor is None:
+            return customers
+
+
+@pytest.mark.parametrize('prefix', ['', 'a', 'A01', 'b', 'zz'])
+@pytest.mark.parametrize('limit', [1, 2, 3, 7, 100])
+def test_served_customers_first_then_everyone_else(prefix, limit):
+    served = [email for email in ('a010@x.com', 'b001@x.com', 'a005@x.com') if email.startswith(prefix.lower())]
+    others = [email for email in CUSTOMERS if email.startswith(prefix.lower()) and email not in served]
+
+    customers = every_page(CustomerPicker(), PickerDB(), prefix, limit)
+    assert [customer['email'] for customer in customers] == served + others
+    assert all(customer['served'] == (customer['email'] in served) for customer in customers)
+    assert all(customer['name'] == customer['email'].upper() for customer in customers)
+
+
+def test_cursor_phases():
+    picker, db = CustomerPicker(), PickerDB()
+    page, cursor = picker.search(db, 'agent@x.com', 'a', limit=1)
+    assert [customer['email'] for customer in page] == ['a010@x.com']
+    assert pagination.decode_cursor(cursor) == ['served', 1]
+
+    page, cursor = picker.search(db, 'agent@x.com', 'a', after=cursor, limit=1)
+    assert [customer['email'] for customer in page] == ['a005@x.com']
+    # The agent's customers fill the page, so the others start from the beginning
+    assert pagination.decode_cursor(cursor) == ['others', '']
+
+    page, cursor = picker.search(db, 'agent@x.com', 'a', after=cursor, limit=2)
+    assert [customer['email'] for customer in page] == ['a000@x.com', 'a001@x.com']
+    assert pagination.decode_cursor(cursor) == ['others', 'a001@x.com']
+
+
+@pytest.mark.parametrize('cursor', ['garbage', pagination.encode_cursor(['served', -1]),
+                                    pagination.encode_cursor(['others', 3]), pagination.encode_cursor(['x', 0])])
+def test_invalid_cursor(cursor):
+    with pytest.raises(ValueError):
+        CustomerPicker().search(PickerDB(), 'agent@x.com', '', after=cursor)
+
+
+def test_served_customers_are_cached_and_reranked_by_purchases():
+    picker, db = CustomerPicker(ttl=3600), PickerDB()
+    picker.search(db, 'agent@x.com', 'b', limit=1)
+    picker.record_purchase('agent@x.com', {'b020@x.com': 2, 'a005@x.com': 1}, date(2030, 4, 1))
+
+    page, _ = picker.search(db, 'agent@x.com', '', limit=4)
+    assert [customer['email'] for customer in page] == ['a005@x.com', 'b020@x.com', 'a010@x.com', 'b001@x.com']
+    assert page[0]['tickets'] == 3 and page[0]['last_purchase'] == '2030-04-01'
+    # The agent's customers were read once and then kept up to date in memory
+    assert db.served_loads == 1
@@ -0,0 +1,161 @@
+import io
+import json
+import time
+from datetime import date, datetime
+
+import pytest
+
+import flight_import
+from flight_import import ScheduleFileError
+from flight_search import AirportDirectory
+
+
+@pytest.fixture(autouse=True)
+def directories(monkeypatch):
+    # Airports and airplanes as if already read from the database
+    directory = AirportDirectory(ttl=3600)
+    directory._build([('JFK', 'New York'), ('LGA', 'New York'), ('PVG', 'Shanghai')])
+    directory._loaded_at = time.monotonic()
+    monkeypatch.setattr(flight_import, 'airports', directory)
+
+    fleet = flight_import.AirplaneDirectory(ttl=3600)
+    fleet._by_airline['Air'] = (time.monotonic(), {'7': (7, 150)})
+    monkeypatch.setattr(flight_import, 'airplanes', fleet)
+
+
+class ImportCursor:
+    def __init__(self, db):
+        self.db = db
+        self.rows = []
+
+    def execute(self, query, params=()):
+        if 'BETWEEN' in query:
+            low, high = params[1:]
+            self.rows = [(number,) for number in self.db.existing if low <= number <= high]
+        elif 'COALESCE(MAX(flight_num)' in query:
+            self.rows = [(max(self.db.existing, default=0),)]
+        else:
+            self.db.statements.append(query)
+
+    def executemany(self, query, rows):
+        self.db.inserted += rows
+
+    def fetchone(self):
+        return self.rows.pop(0)
+
+    def fetchall(self):
+        rows, self.rows = self.rows, []
+        return rows
+
+    def close(self):
+        pass
+
+
+class ImportDB:
+    def __init__(self, existing=()):
+        self.existing = set(existing)
+        self.inserted = []
+        self.statements = []
+        self.committed = False
+
+    def cursor(self):
+        return ImportCursor(self)
+
+    def commit(self):
+        self.committed = True
+
+    def rollback(self):
+        pass
+
+
+def row(**fields):
+    base = {'departure_airport': 'jfk', 'departure_time': '2030-03-02 08:00', 'arrival_airport': 'PVG',
+            'arrival_time': '2030-03-02 22:30', 'price': '499.99', 'airplane_id': '7'}
+    return {**base, **fields}
+
+
+def test_read_rows():
+    csv_file = io.BytesIO(b'\xef\xbb\xbfflight_num,price\n1,10\n')
+    assert flight_import.read_rows(csv_file, 'csv') == [{'flight_num': '1', 'price': '10'}]
+    json_file = io.BytesIO(json.dumps({'flights': [{'flight_num': 1}]}).encode())
+    assert flight_import.read_rows(json_file, 'json') == [{'flight_num': 1}]
+
+
+@pytest.mark.parametrize('content, file_format', [
+    (b'{"flights": {}}', 'json'),
+    (b'[1, 2]', 'json'),
+    (b'not json', 'json'),
+    (b'', 'xml'),
+])
+def test_read_rows_rejects(content, file_format):
+    with pytest.raises(ScheduleFileError):
+        flight_import.read_rows(io.BytesIO(content), file_format)
+
+
+def test_weekly_schedule():
+    # 2030-03-04 is a Monday; the overnight duration carries over to every flight
+    times = flight_import._occurrences(datetime(2030, 3, 4, 23), datetime(2030, 3, 5, 1), date(2030, 3, 17),
+                                       flight_import._weekdays('mon, Fri'))
+    assert times == [
+        (datetime(2030, 3, 4, 23), datetime(2030, 3, 5, 1)),
+        (datetime(2030, 3, 8, 23), datetime(2030, 3, 9, 1)),
+        (datetime(2030, 3, 11, 23), datetime(2030, 3, 12, 1)),
+        (datetime(2030, 3, 15, 23), datetime(2030, 3, 16, 1)),
+    ]
+    with pytest.raises(ValueError):
+        flight_import._weekdays('mon,someday')
+
+
+def test_import_numbers_and_expands_rows():
+    db = ImportDB(existing={1, 2, 40})
+    rows = [
+        row(flight_num='10', repeat_until='2030-03-04'),
+        row(departure_airport='LGA', status='delayed'),
+    ]
+    report, records = flight_import.import_flights(db, 'Air', rows)
+
+    assert report == {'rows': 2, 'flights': 4, 'imported': True, 'errors': []}
+    assert db.committed
+    assert [(record.flight_num, record.departure_time.day) for record in records] == [
+        (10, 2), (11, 3), (12, 4), (41, 2)]
+    # Airport names are stored as the directory spells them, with their cities
+    assert records[0].departure_airport == 'JFK' and records[0].departure_city == 'New York'
+    assert records[3].status == 'delayed' and records[0].status == flight_import.DEFAULT_STATUS
+    assert len(db.inserted) == 4
+
+
+def test_import_reports_every_invalid_row():
+    db = ImportDB(existing={5})
+    rows = [
+        row(flight_num='5'),
+        row(flight_num='20', repeat_until='2030-03-03'),
+        row(flight_num='21'),
+        row(arrival_airport='JFK'),
+        row(price='free'),
+        row(airplane_id='8'),
+        row(arrival_time='2030-03-02 07:00'),
+        row(departure_airport=''),
+        row(days='mon'),
+        row(),
+    ]
+    report, records = flight_import.import_flights(db, 'Air', rows)
+
+    assert not report['imported'] and records == [] and not db.committed
+    assert {error['row']: error['error'] for error in report['errors']} == {
+        1: "Flight 5 already exists",
+        3: "Flight 21 is also in row 2",
+        4: "The departure and arrival airports are the same",
+        5: "price must be a number, not 'free'",
+        6: "Air has no airplane '8'",
+        7: "arrival_time must be after departure_time",
+        8: "Missing departure_airport",
+        9: "days needs repeat_until",
+    }
+
+
+def test_import_skipping_invalid_rows():
+    db = ImportDB()
+    report, records = flight_import.import_flights(db, 'Air', [row(airplane_id='8'), row()], skip_invalid=True)
+    assert report['imported'] and report['flights'] == 1
+    assert [error['row'] for error in report['errors']] == [1]
+    assert [record.flight_num for record in records] == [1]
@@ -0,0 +1,112 @@
+import random
+import time
+from datetime import date, datetime, timedelta
+
+import pytest
+
+import itinerary_search
+from flight_catalog import FlightCatalog, FlightRecord, _Indexes
+from itinerary_search import MAX_DURATION, find_itineraries
+
+
+DAY = date(2030, 5, 1)
+AIRPORTS = [f"AP{i}" for i in range(8)]
+
+
+def make_catalog(flights):
+    catalog = FlightCatalog(ttl=3600)
+    catalog._indexes = _Indexes()
+    for flight in flights:
+        catalog._indexes.add(flight)
+    catalog._loaded_at = time.monotonic()
+    return catalog
+
+
+def random_flights(seed, count=400):
+    rng = random.Random(seed)
+    start = datetime.combine(DAY, datetime.min.time()) - timedelta(hours=12)
+    flights = []
+    for number in range(1, count + 1):
+        origin, destination = rng.sample(AIRPORTS, 2)
+        departure = start + timedelta(minutes=15 * rng.randrange(4 * 24 * 3))
+        arrival = departure + timedelta(minutes=30 * rng.randint(1, 16))
+        status = 'Cancelled' if rng.random() < 0.1 else 'Upcoming'
+        flights.append(FlightRecord('Air', number, origin, departure, destination, arrival,
+                                    rng.randint(50, 500), status, 1))
+    return flights
+
+
+def brute_force(flights, origins, destinations, max_stops, min_layover, max_layover):
+    # Every chain of up to max_stops + 1 flights, checked leg by leg
+    start = datetime.combine(DAY, datetime.min.time())
+    flights = [flight for flight in flights if flight.status.lower() != 'cancelled']
+    endpoints = origins | destinations
+    found = []
+
+    def extend(legs):
+        last = legs[-1]
+        if last.arrival_airport in destinations:
+            if legs[-1].arrival_time - legs[0].departure_time <= MAX_DURATION:
+                found.append(tuple(leg.key for leg in legs))
+            return
+        if len(legs) > max_stops or last.arrival_airport in endpoints:
+            return
+        for flight in flights:
+            if (flight.departure_airport == last.arrival_airport
+                    and min_layover <= flight.departure_time - last.arrival_time <= max_layover):
+                extend(legs + [flight])
+
+    for flight in flights:
+        if flight.departure_airport in origins and start <= flight.departure_time < start + timedelta(days=1):
+            extend([flight])
+    return found
+
+
+@pytest.mark.parametrize('seed', range(5))
+@pytest.mark.parametrize('max_stops', [0, 1, 2])
+def test_matches_brute_force(monkeypatch, seed, max_stops):
+    flights = random_flights(seed)
+    monkeypatch.setattr(itinerary_search, 'catalog', make_catalog(flights))
+    origins, destinations = {'AP0', 'AP1'}, {'AP5'}
+    min_layover, max_layover = timedelta(minutes=45), timedelta(hours=5)
+
+    expected = brute_force(flights, origins, destinations, max_stops, min_layover, max_layover)
+    found = find_itineraries(origins, destinations, DAY, max_stops=max_stops, min_layover=min_layover,
+                             max_layover=max_layover, limit=len(expected) + 10)
+    assert sorted(tuple(leg.key for leg in itinerary.legs) for itinerary in found) == sorted(expected)
+    if max_stops == 2:
+        assert any(itinerary.stops == 2 for itinerary in found)
+
+
+@pytest.mark.parametrize('seed', [11, 12, 13])
+@pytest.mark.parametrize('limit', [1, 3, 8])
+@pytest.mark.parametrize('sort', sorted(itinerary_search.SORT_ORDERS))
+def test_returns_the_best_by_sort_order(monkeypatch, seed, limit, sort):
+    # A small limit prunes partial itineraries; the kept ones must still be the best
+    flights = random_flights(seed, count=800)
+    monkeypatch.setattr(itinerary_search, 'catalog', make_catalog(flights))
+    origins, destinations = {'AP0', 'AP1'}, {'AP5'}
+    expected = brute_force(flights, origins, destinations, 2, itinerary_search.DEFAULT_MIN_LAYOVER,
+                           itinerary_search.DEFAULT_MAX_LAYOVER)
+    best = find_itineraries(origins, destinations, DAY, sort=sort, limit=limit)
+
+    order = itinerary_search.SORT_ORDERS[sort]
+    by_key = {tuple(leg.key for leg in itinerary.legs): itinerary
+              for itinerary in find_itineraries(origins, destinations, DAY, sort=sort, limit=len(expected))}
+    assert len(by_key) == len(expected)
+    assert [order(itinerary) for itinerary in best] == sorted(map(order, by_key.values()))[:limit]
+
+
+def test_cancelled_flights_are_not_legs(monkeypatch):
+    morning = datetime.combine(DAY, datetime.min.time()) + timedelta(hours=8)
+    flights = [
+        FlightRecord('Air', 1, 'AP0', morning, 'AP1', morning + timedelta(hours=2), 100, 'Upcoming', 1),
+        FlightRecord('Air', 2, 'AP1', morning + timedelta(hours=4), 'AP2', morning + timedelta(hours=6), 100,
+                     'Upcoming', 1),
+        FlightRecord('Air', 3, 'AP0', morning, 'AP2', morning + timedelta(hours=3), 100, 'Cancelled', 1),
+        FlightRecord('Air', 4, 'AP1', morning + timedelta(hours=3), 'AP2', morning + timedelta(hours=5), 100,
+                     'cancelled', 1),
+    ]
+    monkeypatch.setattr(itinerary_search, 'catalog', make_catalog(flights))
+    found = find_itineraries({'AP0'}, {'AP2'}, DAY)
+    assert [[leg.flight_num for leg in itinerary.legs] for itinerary in found] == [[1, 2]]
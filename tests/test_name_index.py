@@ -0,0 +1,88 @@
+import random
+import string
+import time
+
+import pytest
+
+from flight_search import AirportDirectory
+from name_index import NameIndex, trigrams
+
+
+NAMES = ['JFK', 'LaGuardia', 'Newark Liberty', 'Shanghai Pudong', 'Shanghai Hongqiao', 'Beijing Capital',
+         'Chicago O\'Hare', 'Chicago Midway', 'Nice']
+
+
+def test_trigrams():
+    assert trigrams('abcd') == {'abc', 'bcd'}
+    assert trigrams('ab') == set()
+
+
+def test_names_are_stored_once_as_first_spelt():
+    index = NameIndex(['JFK', 'jfk ', '', '  '])
+    assert len(index) == 1
+    assert index.starting_with('j') == ['JFK']
+
+
+def test_starting_with():
+    index = NameIndex(NAMES)
+    assert index.starting_with('shang') == ['Shanghai Hongqiao', 'Shanghai Pudong']
+    assert index.starting_with('CHICAGO', limit=1) == ["Chicago Midway"]
+    assert index.starting_with('x') == []
+    assert len(index.starting_with('')) == len(NAMES)
+
+
+@pytest.mark.parametrize('term', ['a', 'ai', 'hai', 'CAGO', 'ng Cap', "o'h", 'zzz', 'Newark Liberty'])
+def test_containing_matches_a_substring_scan(term):
+    index = NameIndex(NAMES)
+    expected = sorted((name for name in NAMES if term.casefold() in name.casefold()), key=str.casefold)
+    assert index.containing(term) == expected
+
+
+def test_containing_on_random_names():
+    rng = random.Random(3)
+    names = {''.join(rng.choices(string.ascii_lowercase[:6], k=rng.randint(3, 9))) for _ in range(300)}
+    index = NameIndex(names)
+    for _ in range(200):
+        term = ''.join(rng.choices(string.ascii_lowercase[:6], k=rng.randint(1, 5)))
+        assert index.containing(term) == sorted(name for name in names if term in name)
+
+
+def test_similar_finds_misspellings():
+    index = NameIndex(NAMES)
+    assert index.similar('Shanghia Pudong', 1) == ['Shanghai Pudong']
+    assert index.similar('laguardai', 3)[0] == 'LaGuardia'
+    assert index.similar('qqqq', 3) == []
+
+
+@pytest.fixture
+def directory():
+    directory = AirportDirectory(ttl=3600)
+    directory._build([('JFK', 'New York'), ('LGA', 'New York'), ('PVG', 'Shanghai'), ('SHA', 'Shanghai'),
+                      ('NCE', 'Nice')])
+    directory._loaded_at = time.monotonic()
+    return directory
+
+
+def test_directory_lookups(directory):
+    assert directory.airports_in_city(None, ' new york ') == {'JFK', 'LGA'}
+    assert directory.canonical_name(None, 'pvg') == 'PVG'
+    assert directory.resolve(None, 'Shanghai') == {'PVG', 'SHA'}
+    assert directory.resolve(None, 'sha') == {'SHA'}
+    assert directory.match(None, 'g') == {'LGA', 'PVG'}
+
+
+def test_directory_suggestions(directory):
+    suggestions = directory.suggest(None, 'n', limit=4)
+    assert suggestions == [
+        {'type': 'city', 'name': 'New York', 'city': 'New York'},
+        {'type': 'city', 'name': 'Nice', 'city': 'Nice'},
+        {'type': 'airport', 'name': 'NCE', 'city': 'Nice'},
+        {'type': 'city', 'name': 'Shanghai', 'city': 'Shanghai'},
+    ]
+    assert [suggestion['name'] for suggestion in directory.suggest(None, 'shangai', kinds=('city',))] == ['Shanghai']
+
+
+def test_directory_add(directory):
+    directory.add('HND', 'Tokyo')
+    assert directory.airports_in_city(None, 'tokyo') == {'HND'}
+    assert directory.suggest(None, 'tok', kinds=('city',))[0]['name'] == 'Tokyo'
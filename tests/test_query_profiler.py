@@ -0,0 +1,27 @@
+import pytest
+
+from query_profiler import fingerprint
+
+
+@pytest.mark.parametrize('statement, expected', [
+    ("SELECT * FROM flight WHERE flight_num = %s", "SELECT * FROM flight WHERE flight_num = ?"),
+    ("SELECT * FROM flight WHERE airline_name = 'Air' AND price > 99.5",
+     "SELECT * FROM flight WHERE airline_name = ? AND price > ?"),
+    ('SELECT * FROM t2 WHERE col1 = "it\\"s"', "SELECT * FROM t2 WHERE col1 = ?"),
+    ("SELECT email FROM customer WHERE email = %(email)s", "SELECT email FROM customer WHERE email = ?"),
+    ("/* report */ SELECT  a\n  FROM t -- trailing\n WHERE b = 1", "SELECT a FROM t WHERE b = ?"),
+])
+def test_literals_and_parameters(statement, expected):
+    assert fingerprint(statement) == expected
+
+
+def test_in_lists_of_any_length_group_together():
+    one = fingerprint("SELECT * FROM airport WHERE airport_name IN (%s)")
+    three = fingerprint("SELECT * FROM airport WHERE airport_name IN (%s, %s, %s)")
+    assert one == three == "SELECT * FROM airport WHERE airport_name IN (?+)"
+
+
+def test_multi_row_inserts_collapse_to_one_row():
+    single = fingerprint("INSERT INTO ticket (airline_name, flight_num) VALUES (%s, %s)")
+    batch = fingerprint("INSERT INTO ticket (airline_name, flight_num) VALUES (%s, %s), (%s, %s), (%s, %s)")
+    assert single == batch == "INSERT INTO ticket (airline_name, flight_num) VALUES (?+)"